@@ -0,0 +1,170 @@
+"""
+benchmark of the vcnl4020_switch dimmer: render cost and sample-to-pixel latency
+
+The main loop of the dimmer mode takes a proximity sample, passes it
+to follow() and calls render() once per sample period. The render cost is
+measured on the fake NeoPixel from fakes.py. The latency is simulated with
+a fake clock: after a step of the hand distance, the frames are counted until
+the brightness written to the strip covers 10 %, 50 % and 90 % of the step
+and until it settles. The first frame after a long pause (the sleep while
+waiting for the hand) is reported separately, as its step is bounded only
+by the clamp of the frame time.
+
+Usage:
+    python bench/bench_dimmer.py -n 10000 --pixels 60 --neopixel 0.002
+"""
+
+import itertools
+
+from benchutil import add_project, measure, parse_args, report
+from fakes import Latencies, NeoPixel
+
+add_project("vcnl4020_switch")
+
+# pylint: disable=wrong-import-position
+import dimmer as dimmer_module  # noqa: E402
+from dimmer import Dimmer  # noqa: E402
+
+COLOR = (255, 100, 0)
+FAR = 3000  # the on threshold, i.e. the minimum brightness
+NEAR = 20000
+# steps of the proximity: name, start, end
+STEPS = (
+    ("far to near", FAR, NEAR),
+    ("near to far", NEAR, FAR),
+    ("to half", FAR, (FAR + NEAR) // 2),
+)
+FRACTIONS = (0.1, 0.5, 0.9)
+FRAMES_MAX = 10_000
+
+
+class Clock:
+    """
+    milliseconds for ticks_ms(), advanced by the simulated frames
+    """
+
+    def __init__(self):
+        self.now = 0
+
+    def ticks_ms(self):
+        """
+        :return: the simulated time
+        """
+        return self.now
+
+
+def settle(dimmer, clock, proximity, period_ms):
+    """
+    Run frames until the level stops moving.
+    """
+    for _ in range(FRAMES_MAX):
+        clock.now += period_ms
+        dimmer.follow(proximity, FAR)
+        if not dimmer.render() and not dimmer.busy:
+            return
+
+
+def response(pixels, clock, start, end, period_ms):
+    """
+    :return: dictionary of the latencies in milliseconds from the sample
+    with the new proximity to the frames reaching the fractions of the step
+    """
+    dimmer = Dimmer(pixels, COLOR, near=NEAR)
+    settle(dimmer, clock, start, period_ms)
+    begin = dimmer.level
+    dimmer.follow(end, FAR)
+    goal = dimmer.target
+
+    latencies = {}
+    for frame in range(FRAMES_MAX):
+        # The sample is taken at the start of the frame, render() follows.
+        dimmer.follow(end, FAR)
+        dimmer.render()
+        covered = (dimmer.level - begin) / (goal - begin)
+        for fraction in FRACTIONS:
+            key = f"to_{int(fraction * 100)}%"
+            if key not in latencies and covered >= fraction:
+                latencies[key] = frame * period_ms
+        if not dimmer.busy:
+            latencies["settled"] = frame * period_ms
+            break
+        clock.now += period_ms
+    return latencies
+
+
+def first_frame_after(pixels, clock, pause_ms, period_ms):
+    """
+    :return: brightness change of the first frame after the pause
+    """
+    dimmer = Dimmer(pixels, COLOR, near=NEAR)
+    settle(dimmer, clock, FAR, period_ms)
+    before = dimmer.level
+    clock.now += pause_ms
+    dimmer.follow(NEAR, FAR)
+    dimmer.render()
+    return dimmer.level - before
+
+
+def add_arguments(parser):
+    """
+    add the strip and frame settings to the parser
+    """
+    parser.add_argument("--pixels", type=int, default=60, help="number of pixels")
+    parser.add_argument(
+        "--period",
+        type=float,
+        default=0.02,
+        help="sample period in seconds (default 0.02)",
+    )
+    parser.add_argument(
+        "--neopixel",
+        type=float,
+        default=0,
+        help="latency of the strip write in seconds (default 0)",
+    )
+
+
+def main():
+    """
+    measure the render cost and simulate the responses
+    """
+    args = parse_args(
+        "Measure the dimmer render cost and sample-to-pixel latency.",
+        iterations=10000,
+        add_arguments=add_arguments,
+    )
+    latencies = Latencies(neopixel=args.neopixel)
+    period_ms = int(args.period * 1000)
+
+    # real clock: each call follows the alternating hand, so each frame is written
+    pixels = NeoPixel(latencies, None, args.pixels, auto_write=False)
+    dimmer = Dimmer(pixels, COLOR, near=NEAR, max_rate=10**6, smoothing=1)
+    hands = itertools.cycle((FAR, NEAR))
+
+    def frame():
+        dimmer.follow(next(hands), FAR)
+        dimmer.render()
+
+    results = {"follow + render": measure(frame, args.iterations)}
+
+    # simulated clock
+    clock = Clock()
+    real_ticks_ms = dimmer_module.ticks_ms
+    dimmer_module.ticks_ms = clock.ticks_ms
+    try:
+        pixels = NeoPixel(Latencies(), None, args.pixels, auto_write=False)
+        results["follow + render"]["response_ms"] = {
+            name: response(pixels, clock, start, end, period_ms)
+            for name, start, end in STEPS
+        }
+        results["follow + render"]["first_step_after_10s_pause"] = first_frame_after(
+            pixels, clock, 10_000, period_ms
+        )
+    finally:
+        dimmer_module.ticks_ms = real_ticks_ms
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,351 @@
+"""
+benchmark of the main loops of the projects, run with fake hardware
+
+The code.py of each project is loaded with the CircuitPython modules replaced
+by the fakes from fakes.py and its main loop is driven for given number
+of iterations. An iteration is marked by a call the loop makes exactly once
+per pass, e.g. feeding the watchdog or the frame sleep. The sleeps are
+skipped so that the numbers reflect the work done by the loop,
+including the simulated bus latencies.
+
+The birdLED tasks are driven in asyncio event loop, one iteration being
+a frame written to the pixels. The sleeps of the tasks are replaced
+by yielding once per frame period, so the tasks keep their relative cadence.
+Only the local tasks (sensor, display) are run; the network side is exercised
+by the load test in bench_mqtt_load.py.
+
+Usage:
+    python bench/bench_loops.py -n 1000 --i2c 0.0005 -o loops.json
+    python bench/bench_loops.py -p cherry_lamp -p vcnl4020_switch
+"""
+
+import asyncio
+import contextlib
+import importlib.util
+import os
+import sys
+import time
+import tracemalloc
+import types
+
+from benchutil import ROOT_DIR, parse_args, percentile, report
+from fakes import (
+    I2C,
+    LATENCY_DEFAULTS,
+    RFM69,
+    SPI,
+    FakeHardware,
+    Latencies,
+    NeoKey1x4,
+    Watchdog,
+)
+
+WARMUP = 10
+
+
+class BenchmarkDone(BaseException):
+    """
+    Raised by the marker to stop the main loop. Derived from BaseException
+    so that it passes through the exception handlers of the loop.
+    """
+
+
+class Marker:
+    """
+    Called once per iteration of the loop, records the time stamps
+    or the allocations and stops the loop after the warmup and the measured
+    iterations.
+    """
+
+    def __init__(self, iterations, warmup=WARMUP, tracing=False):
+        self.iterations = iterations
+        self.warmup = warmup
+        self.tracing = tracing
+        self.count = 0
+        self.stamps = []
+        self.churn = 0
+        self.retained = 0
+        self._base = 0
+        self._current = 0
+
+    def __call__(self):
+        self.count += 1
+        if self.tracing:
+            current, peak = tracemalloc.get_traced_memory()
+            if self.count > self.warmup:
+                self.churn += peak - self._current
+            elif self.count == self.warmup:
+                self._base = current
+            self.retained = current - self._base
+            self._current = current
+            tracemalloc.reset_peak()
+        elif self.count >= self.warmup:
+            self.stamps.append(time.perf_counter_ns())
+
+        if self.count >= self.warmup + self.iterations:
+            raise BenchmarkDone()
+
+
+@contextlib.contextmanager
+def hooked(owner, name, marker, every=1):
+    """
+    Replace the function or method of the module or class with wrapper
+    that calls the marker on every given number of calls.
+    """
+    original = getattr(owner, name)
+    calls = 0
+
+    def hook(*args, **kwargs):
+        nonlocal calls
+        calls += 1
+        if calls % every == 0:
+            marker()
+        return original(*args, **kwargs)
+
+    setattr(owner, name, hook)
+    try:
+        yield
+    finally:
+        setattr(owner, name, original)
+
+
+def time_shim(sleep):
+    """
+    :return: copy of the time module with the sleep function replaced
+    """
+    shim = types.ModuleType("time")
+    shim.__dict__.update(time.__dict__)
+    shim.sleep = sleep
+    return shim
+
+
+def no_sleep(seconds):
+    """
+    sleep replacement that returns right away
+    """
+
+
+@contextlib.contextmanager
+def project(name, hardware):
+    """
+    Install the fakes, make the modules of the project importable and load
+    its code.py. Afterwards, the modules and the path are restored so that
+    the same named modules of other projects can be loaded.
+    """
+    path = os.path.join(ROOT_DIR, name)
+    modules = set(sys.modules)
+    # Appended rather than prepended as code.py would shadow the code module
+    # of the standard library.
+    sys.path.append(path)
+    hardware.install()
+    try:
+        spec = importlib.util.spec_from_file_location(
+            f"{name}_code", os.path.join(path, "code.py")
+        )
+        code = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(code)
+        yield code
+    finally:
+        hardware.uninstall()
+        sys.path.remove(path)
+        for module in set(sys.modules) - modules:
+            sys.modules.pop(module, None)
+
+
+def run_birdled(hardware, marker):
+    """
+    Run the sensor and display tasks.
+    """
+    with project("birdLED", hardware) as code:
+        # pylint: disable=import-outside-toplevel,import-error
+        import configutil
+
+        values = {entry[0]: entry[4] for entry in configutil.SCHEMA}
+        values.update(
+            log_level="info",
+            ssid="bench",
+            password="bench",
+            broker="127.0.0.1",
+            broker_port=1883,
+            mqtt_topic="bench",
+            brightness_range=(0.05, 0.9),
+            light_range=(10, 50),
+            hours_range=(0, 23),
+        )
+        errors = []
+        configutil.check_values(values, errors)
+        assert not errors, errors
+        config = configutil.Config(values)
+
+        async def sleep(delay):
+            for _ in range(max(1, round(delay / code.FRAME_PERIOD))):
+                await asyncio.sleep(0)
+
+        code.asyncio = types.SimpleNamespace(sleep=sleep)
+        frames = code.FrameCache(
+            (255, 100, 0), 5 * 5, levels=code.RAMP_LEVELS, gamma=code.GAMMA
+        )
+        veml7700 = code.adafruit_veml7700.VEML7700(code.board.STEMMA_I2C())
+        state = code.State(config.brightness_min)
+        pin = code.digitalio.DigitalInOut(code.board.A3)
+
+        async def tasks():
+            await asyncio.gather(
+                code.sample_light(veml7700, state, config),
+                code.display_pixels(pin, frames, state, config.brightness_min),
+            )
+
+        with hooked(code, "neopixel_write", marker):
+            asyncio.run(tasks())
+
+
+def run_cherry_lamp(hardware, marker):
+    """
+    The main loop feeds the watchdog once per iteration.
+    """
+    with project("cherry_lamp", hardware) as code, hooked(Watchdog, "feed", marker):
+        code.main()
+
+
+def run_vcnl4020_switch(hardware, marker):
+    """
+    The main loop sleeps once per frame, the wait for the hand polls the sensor.
+    """
+    with project("vcnl4020_switch", hardware) as code:
+        code.time = time_shim(lambda seconds: marker())
+        sys.modules["proximity"].time = time_shim(no_sleep)
+        sys.modules["calibration"].time = time_shim(no_sleep)
+        code.main()
+
+
+def run_segment_led(hardware, marker):
+    """
+    The main loop sleeps once per character.
+    """
+    with project("segment_led", hardware) as code:
+        code.time = time_shim(lambda seconds: marker())
+        code.main()
+
+
+def run_rfm69_receiver(hardware, marker):
+    """
+    The main loop waits for a packet once per iteration.
+    """
+    with project("rfm69_receiver", hardware) as code, hooked(RFM69, "receive", marker):
+        code.main()
+
+
+def run_macrokeys(hardware, marker):
+    """
+    The main loop reads each of the 4 keys twice per iteration.
+    """
+    with project("macrokeys", hardware) as code, hooked(
+        NeoKey1x4, "__getitem__", marker, every=8
+    ):
+        code.time = time_shim(no_sleep)
+        code.main()
+
+
+PROJECTS = {
+    "birdLED": run_birdled,
+    "cherry_lamp": run_cherry_lamp,
+    "vcnl4020_switch": run_vcnl4020_switch,
+    "segment_led": run_segment_led,
+    "rfm69_receiver": run_rfm69_receiver,
+    "macrokeys": run_macrokeys,
+}
+
+
+def drive(run, latencies, marker):
+    """
+    Run the loop until the marker stops it, with the output of the loop discarded.
+    :return: the fake hardware used for the run
+    """
+    hardware = FakeHardware(latencies)
+    with open(os.devnull, "w", encoding="utf-8") as devnull, contextlib.redirect_stdout(
+        devnull
+    ):
+        try:
+            run(hardware, marker)
+        except BenchmarkDone:
+            pass
+    return hardware
+
+
+def measure_loop(run, latencies, iterations):
+    """
+    Drive the loop twice, once to collect the iteration times
+    and once with tracemalloc to collect the allocations.
+    :return: dictionary with the statistics in the format of benchutil.measure()
+    """
+    timing = Marker(iterations)
+    hardware = drive(run, latencies, timing)
+    durations = [
+        (end - start) / 1000 for start, end in zip(timing.stamps, timing.stamps[1:])
+    ]
+    total = (timing.stamps[-1] - timing.stamps[0]) / 1e9
+    transactions = sum(
+        bus.transactions for bus in hardware.find(I2C) + hardware.find(SPI)
+    )
+
+    tracing = Marker(iterations, tracing=True)
+    tracemalloc.start()
+    try:
+        drive(run, latencies, tracing)
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "iterations_per_s": iterations / total if total else None,
+        "latency_us": {
+            "mean": sum(durations) / iterations,
+            "p50": percentile(durations, 0.5),
+            "p99": percentile(durations, 0.99),
+            "max": max(durations),
+        },
+        "alloc_bytes_per_call": tracing.churn / iterations,
+        "retained_bytes": tracing.retained,
+        "bus_transactions_per_iteration": transactions / timing.count,
+    }
+
+
+def add_arguments(parser):
+    """
+    add the project selection and the latencies to the parser
+    """
+    parser.add_argument(
+        "-p",
+        "--project",
+        action="append",
+        choices=PROJECTS,
+        help="project to run, can be repeated (default all)",
+    )
+    for name, default in LATENCY_DEFAULTS.items():
+        parser.add_argument(
+            f"--{name}",
+            type=float,
+            default=default,
+            help=f"latency of {name} transaction in seconds (default {default})",
+        )
+
+
+def main():
+    """
+    measure the loop of each project
+    """
+    args = parse_args(
+        "Drive the main loops of the projects with fake hardware.",
+        iterations=1000,
+        add_arguments=add_arguments,
+    )
+    latencies = Latencies(**{name: getattr(args, name) for name in LATENCY_DEFAULTS})
+
+    results = {}
+    for name in args.project or PROJECTS:
+        results[name] = measure_loop(PROJECTS[name], latencies, args.iterations)
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
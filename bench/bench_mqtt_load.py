@@ -0,0 +1,426 @@
+"""
+load test of the birdLED publish/reconnect path against a local broker stand-in
+
+Each simulated device runs the publish_data(), maintain_connection()
+and mqtt_loop() tasks of birdLED code.py in its own thread and event loop,
+with its own MiniMQTT client and ConnectionManager. The client talks
+to the broker stand-in from birdLED/tools over a CPython shim of the socketpool
+module which, like the CircuitPython one, signals the socket timeouts
+with OSError(ETIMEDOUT) and can delay each send. The light is varied
+so that each device publishes a record every sample period.
+
+The broker can be restarted periodically (the outage drops all the sessions)
+and can delay its responses. The records are matched with the messages received
+by the broker to compute the end-to-end latency (from the sample
+to the receipt, including the time spent in the queue during outages).
+
+Usage:
+    python bench/bench_mqtt_load.py -c 50 -d 60 --restart-every 20 --outage 5
+    python bench/bench_mqtt_load.py -c 20 --broker-latency 0.2 -o load.json
+"""
+
+import argparse
+import asyncio
+import collections
+import errno
+import json
+import os
+import random
+import socket
+import ssl
+import threading
+import time
+import types
+
+import adafruit_minimqtt.adafruit_minimqtt as MQTT
+
+from bench_loops import project
+from benchutil import add_project, percentile
+from fakes import FakeHardware
+
+add_project(os.path.join("birdLED", "tools"))
+
+# pylint: disable=wrong-import-position
+from mqttbroker import BrokerThread  # noqa: E402
+
+
+class Socket:
+    """
+    CPython socket behaving like socketpool.Socket: timeouts raise
+    OSError(ETIMEDOUT) and each send can be delayed to simulate slow network.
+    """
+
+    def __init__(self, sock, latency):
+        self._sock = sock
+        self._latency = latency
+
+    def settimeout(self, timeout):
+        """
+        set the timeout of the blocking operations
+        """
+        self._sock.settimeout(timeout)
+
+    def connect(self, address):
+        """
+        connect to the address
+        """
+        try:
+            self._sock.connect(address)
+        except socket.timeout as exc:
+            raise OSError(errno.ETIMEDOUT, "timed out") from exc
+
+    def send(self, data):
+        """
+        :return: number of bytes sent
+        """
+        if self._latency:
+            time.sleep(self._latency)
+        return self._sock.send(data)
+
+    def recv_into(self, buffer, nbytes=0):
+        """
+        :return: number of bytes received
+        """
+        try:
+            return self._sock.recv_into(buffer, nbytes)
+        except socket.timeout as exc:
+            raise OSError(errno.ETIMEDOUT, "timed out") from exc
+
+    def close(self):
+        """
+        close the socket
+        """
+        self._sock.close()
+
+
+class SocketPool:
+    """
+    socketpool.SocketPool shim. Each device has its own pool
+    as the MiniMQTT connection manager is shared per pool.
+    """
+
+    AF_INET = socket.AF_INET
+    SOCK_STREAM = socket.SOCK_STREAM
+
+    def __init__(self, radio, latency=0):
+        self.radio = radio
+        self.latency = latency
+
+    @staticmethod
+    def getaddrinfo(host, port, family=0, socktype=0):
+        """
+        :return: list of address tuples
+        """
+        return socket.getaddrinfo(host, port, family, socktype)
+
+    def socket(self, family=AF_INET, kind=SOCK_STREAM):
+        """
+        :return: new socket
+        """
+        return Socket(socket.socket(family, kind), self.latency)
+
+
+# pylint: disable=too-many-instance-attributes
+class Device:
+    """
+    Simulated birdLED device running the network tasks of code.py.
+    """
+
+    def __init__(self, code, index, broker_port, args, created):
+        """
+        :param code: the loaded code.py module
+        :param index: number of the device, used in the client id and topic
+        :param broker_port: port of the broker stand-in
+        :param args: command line arguments
+        :param created: dictionary of payload to deque of creation times
+        shared by all the devices
+        """
+        self.code = code
+        self.client_id = f"birdled-{index}"
+        self.topic = f"{args.topic}/{index}"
+        self.broker_port = broker_port
+        self.args = args
+        self.created = created
+        self.lock = threading.Lock()
+        self.records = 0
+        self.resets = 0
+        self.dropped = 0
+        self.queued = 0
+        self.error = None
+
+    def encode(self, encoder, *values):
+        """
+        Encode the record and remember its creation time.
+        """
+        record = encoder.encode(*values)
+        payload = record.encode("utf-8") if isinstance(record, str) else bytes(record)
+        with self.lock:
+            self.created.setdefault(payload, collections.deque()).append(time.time())
+        self.records += 1
+        return record
+
+    async def vary_light(self, state):
+        """
+        Change the light by more than the deadband every sample period.
+        """
+        while True:
+            state.light = random.randint(10, 100)
+            state.lux = state.light * 0.0576
+            await asyncio.sleep(self.args.sample_period)
+
+    def boot(self):
+        """
+        :return: tuple of the connection manager and the telemetry queue
+        of freshly started device, the tasks as coroutines
+        """
+        code = self.code
+        args = self.args
+        radio = types.SimpleNamespace(connected=True, ap_info=None)
+        mqtt_client = MQTT.MQTT(
+            broker="127.0.0.1",
+            port=self.broker_port,
+            client_id=self.client_id,
+            socket_pool=SocketPool(radio, args.net_latency),
+            ssl_context=ssl.create_default_context(),
+            recv_timeout=args.recv_timeout,
+            keep_alive=args.keep_alive,
+            socket_timeout=args.socket_timeout,
+            connect_retries=1,
+        )
+        manager = code.ConnectionManager(radio, "ssid", "password", mqtt_client)
+        state = code.State(0.5)
+        queue = code.TelemetryQueue(code.QUEUE_BYTES)
+        real_encoder = code.Encoder(args.format)
+        encoder = types.SimpleNamespace(
+            encode=lambda *values: self.encode(real_encoder, *values)
+        )
+        clock = types.SimpleNamespace(timestamp=lambda: int(time.time()))
+        deadband = code.Deadband(args.deadband, 300)
+        coroutines = (
+            self.vary_light(state),
+            code.publish_data(
+                manager, self.topic, state, clock, queue, encoder, deadband
+            ),
+            code.maintain_connection(manager, self.topic, clock, time.monotonic()),
+            code.mqtt_loop(manager),
+        )
+        return manager, queue, coroutines
+
+    async def run(self, deadline):
+        """
+        Run the tasks until the deadline. ConnectionError raised after too many
+        failed connection attempts means hard reset on the device,
+        so the device is booted again and the queued records are lost.
+        """
+        while time.monotonic() < deadline:
+            manager, queue, coroutines = self.boot()
+            tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+            try:
+                await asyncio.wait_for(
+                    asyncio.gather(*tasks), deadline - time.monotonic()
+                )
+            except asyncio.TimeoutError:
+                self.queued += len(queue)
+                self.dropped += queue.dropped
+                manager.disconnect()
+                return
+            except ConnectionError:
+                self.resets += 1
+                self.dropped += queue.dropped + len(queue)
+                for task in tasks:
+                    task.cancel()
+
+    def start(self, deadline):
+        """
+        :return: started thread running the device
+        """
+
+        def target():
+            try:
+                asyncio.run(self.run(deadline))
+            except Exception as exc:  # pylint: disable=broad-except
+                self.error = repr(exc)
+
+        thread = threading.Thread(target=target, name=self.client_id, daemon=True)
+        thread.start()
+        return thread
+
+
+def inject_restarts(broker, deadline, every, outage):
+    """
+    Restart the broker every given number of seconds until the deadline.
+    :return: list of the times (time.time()) when the broker was started again
+    """
+    restarts = []
+    while every and time.monotonic() + every < deadline:
+        time.sleep(every)
+        broker.stop()
+        time.sleep(outage)
+        broker.start()
+        restarts.append(time.time())
+    return restarts
+
+
+def storm_stats(connections, restarts, clients):
+    """
+    :return: dictionary with the peak rate of connects in 1 second window
+    and the times it took all the clients to reconnect after each restart
+    """
+    stamps = sorted(stamp for stamp, _ in connections)
+    peak = 0
+    start = 0
+    for end, stamp in enumerate(stamps):
+        while stamps[start] <= stamp - 1:
+            start += 1
+        peak = max(peak, end - start + 1)
+
+    recovery = []
+    for restart in restarts:
+        seen = set()
+        for stamp, client_id in connections:
+            if stamp >= restart:
+                seen.add(client_id)
+                if len(seen) == clients:
+                    recovery.append(stamp - restart)
+                    break
+        else:
+            recovery.append(None)
+
+    return {
+        "connects": len(connections),
+        "peak_connects_per_s": peak,
+        "recovery_s": recovery,
+    }
+
+
+def latency_stats(messages, created):
+    """
+    Match the received messages with the created records.
+    :return: tuple of the number of matched messages and dictionary
+    of the latency percentiles in milliseconds
+    """
+    latencies = []
+    for received, _, _, payload in messages:
+        stamps = created.get(payload)
+        if stamps:
+            latencies.append((received - stamps.popleft()) * 1000)
+    if not latencies:
+        return 0, {}
+    return len(latencies), {
+        "p50": percentile(latencies, 0.5),
+        "p90": percentile(latencies, 0.9),
+        "p99": percentile(latencies, 0.99),
+        "max": max(latencies),
+    }
+
+
+def run(args):
+    """
+    Run the load test.
+    :return: dictionary with the results
+    """
+    created = {}
+    with project("birdLED", FakeHardware()) as code, BrokerThread(
+        latency=args.broker_latency
+    ) as broker:
+        code.configure(code.get_log_level(args.log_level), code.logging.StreamHandler())
+        deadline = time.monotonic() + args.duration
+        devices = [
+            Device(code, index, broker.port, args, created)
+            for index in range(args.clients)
+        ]
+        start = time.time()
+        threads = [device.start(deadline) for device in devices]
+        restarts = inject_restarts(broker, deadline, args.restart_every, args.outage)
+        for thread in threads:
+            thread.join()
+        elapsed = time.time() - start
+        # The reset journal published after the first connect is left out.
+        topics = {device.topic for device in devices}
+        messages = [message for message in broker.messages if message[2] in topics]
+        connections = list(broker.connections)
+        pings = broker.pings
+
+    delivered, latency = latency_stats(messages, created)
+    records = sum(device.records for device in devices)
+    return {
+        "clients": args.clients,
+        "duration_s": elapsed,
+        "records": records,
+        "delivered": delivered,
+        "queued_at_end": sum(device.queued for device in devices),
+        "dropped": sum(device.dropped for device in devices),
+        "throughput_per_s": len(messages) / elapsed,
+        "latency_ms": latency,
+        "restarts": len(restarts),
+        "resets": sum(device.resets for device in devices),
+        "pings": pings,
+        "errors": [device.error for device in devices if device.error],
+        **storm_stats(connections, restarts, args.clients),
+    }
+
+
+def parse_args():
+    """
+    :return: parsed command line arguments
+    """
+    parser = argparse.ArgumentParser(
+        description="Run simulated birdLED devices against a local MQTT broker."
+    )
+    parser.add_argument("-c", "--clients", type=int, default=20)
+    parser.add_argument("-d", "--duration", type=float, default=30, help="seconds")
+    parser.add_argument(
+        "--sample-period",
+        type=float,
+        default=1,
+        help="seconds between the light changes, i.e. the records",
+    )
+    parser.add_argument("--deadband", type=int, default=2)
+    parser.add_argument("--format", default="json", help="telemetry format")
+    parser.add_argument("--topic", default="loadtest")
+    parser.add_argument(
+        "--restart-every",
+        type=float,
+        default=0,
+        help="restart the broker every this many seconds, 0 to disable",
+    )
+    parser.add_argument(
+        "--outage", type=float, default=2, help="seconds the broker stays down"
+    )
+    parser.add_argument(
+        "--broker-latency",
+        type=float,
+        default=0,
+        help="seconds the broker delays each response",
+    )
+    parser.add_argument(
+        "--net-latency",
+        type=float,
+        default=0,
+        help="seconds each send of the clients is delayed",
+    )
+    # The MiniMQTT settings of birdLED main()
+    parser.add_argument("--recv-timeout", type=float, default=5)
+    parser.add_argument("--socket-timeout", type=float, default=0.01)
+    parser.add_argument("--keep-alive", type=int, default=60)
+    parser.add_argument("--log-level", default="error")
+    parser.add_argument("-o", "--output", help="save the results to JSON file")
+    return parser.parse_args()
+
+
+def main():
+    """
+    run the load test and report the results
+    """
+    args = parse_args()
+    results = run(args)
+    for key, value in results.items():
+        print(f"{key:22} {value}")
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file_obj:
+            json.dump(results, file_obj, indent=2)
+        print(f"saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
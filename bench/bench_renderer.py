@@ -0,0 +1,103 @@
+"""
+benchmark of the cherry_lamp renderer against the set_color() it replaced
+
+The old set_color() assigned the colorwheel value pixel by pixel and wrote
+the strip once per color change. The renderer fills the pixel buffer in bulk,
+but spreads each change over a crossfade of fade_time / frame_period frames.
+Both are run on the fake NeoPixel from fakes.py, the latency of the strip write
+is set with --neopixel. The print() of the old function is left out.
+
+Usage:
+    python bench/bench_renderer.py -n 10000 --pixels 30 --neopixel 0.001
+"""
+
+from benchutil import add_project, measure, parse_args, report
+from fakes import FakeHardware, Latencies
+
+add_project("cherry_lamp")
+
+FADE_TIME = 0.3
+FRAME_PERIOD = 0.02
+
+
+def old_set_color(pixels, color, colorwheel):
+    """
+    set_color() of cherry_lamp code.py before the renderer, without the print()
+    """
+    for pixel in range(len(pixels)):  # pylint: disable=consider-using-enumerate
+        pixels[pixel] = colorwheel(color)
+
+    pixels.show()
+
+
+def add_arguments(parser):
+    """
+    add the strip length and write latency to the parser
+    """
+    parser.add_argument("--pixels", type=int, default=30, help="number of pixels")
+    parser.add_argument(
+        "--neopixel",
+        type=float,
+        default=0,
+        help="latency of the strip write in seconds (default 0)",
+    )
+
+
+def main():
+    """
+    measure the color change with both and the renderer frames
+    """
+    args = parse_args(
+        "Compare the cherry_lamp renderer with the old set_color().",
+        iterations=10000,
+        add_arguments=add_arguments,
+    )
+    hardware = FakeHardware(Latencies(neopixel=args.neopixel))
+    hardware.install()
+    try:
+        # pylint: disable=import-outside-toplevel,import-error
+        import neopixel
+        from rainbowio import colorwheel
+        from renderer import Renderer
+
+        def strip():
+            return neopixel.NeoPixel(None, args.pixels, auto_write=False)
+
+        results = {}
+        pixels = strip()
+        colors = iter(range(2**62))
+        results["old set_color"] = measure(
+            lambda: old_set_color(pixels, next(colors) % 256, colorwheel),
+            args.iterations,
+        )
+
+        # Without the crossfade, each change is rendered as single frame.
+        renderer = Renderer(strip(), 0, 0.5, fade_time=0, frame_period=0)
+
+        def change():
+            renderer.set_color(next(colors))
+            renderer.update()
+
+        results["renderer change, no fade"] = measure(change, args.iterations)
+
+        # The crossfade never ends, so each update renders a frame.
+        renderer = Renderer(strip(), 0, 0.5, fade_time=2**20, frame_period=0)
+        renderer.set_color(128)
+        result = measure(renderer.update, args.iterations)
+        frames = round(FADE_TIME / FRAME_PERIOD)
+        result["frames_per_change"] = frames
+        result["change_us"] = result["latency_us"]["mean"] * frames
+        results["renderer crossfade frame"] = result
+
+        # The main loop calls update() on each pass, mostly with nothing to do.
+        renderer = Renderer(strip(), 0, 0.5, fade_time=0, frame_period=0)
+        renderer.update()
+        results["renderer idle update"] = measure(renderer.update, args.iterations)
+    finally:
+        hardware.uninstall()
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
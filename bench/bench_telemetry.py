@@ -0,0 +1,43 @@
+"""
+benchmark of the birdLED telemetry formats: encode time, heap churn and payload size
+
+Usage:
+    python bench/bench_telemetry.py -n 10000 -o telemetry.json
+"""
+
+from benchutil import add_project, measure, parse_args, report
+
+add_project("birdLED")
+
+# pylint: disable=wrong-import-position
+from telemetryformat import FORMATS, Encoder, decode  # noqa: E402
+
+SAMPLE = (23, 1.3248, 0.6135, 41.7, 1_760_000_000)
+
+
+def main():
+    """
+    measure each format
+    """
+    args = parse_args("Compare the telemetry record formats.", iterations=10000)
+
+    results = {}
+    for fmt in FORMATS:
+        encoder = Encoder(fmt)
+        payload = encoder.encode(*SAMPLE)
+        result = measure(
+            lambda encoder=encoder: encoder.encode(*SAMPLE), args.iterations
+        )
+        result["payload_bytes"] = len(payload)
+        results[f"encode {fmt}"] = result
+
+        payload = bytes(payload) if isinstance(payload, bytearray) else payload
+        result = measure(lambda payload=payload: decode(payload), args.iterations)
+        result["payload_bytes"] = len(payload)
+        results[f"decode {fmt}"] = result
+
+    report(results, args.output)
+
+
+if __name__ == "__main__":
+    main()
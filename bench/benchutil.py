@@ -0,0 +1,137 @@
+"""
+helpers for the host benchmarks: timing, allocation tracking and JSON reports
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def add_project(name):
+    """
+    Make the modules of the project importable. The directory is appended
+    rather than prepended as code.py would shadow the code module
+    of the standard library.
+    """
+    path = os.path.join(ROOT_DIR, name)
+    if path not in sys.path:
+        sys.path.append(path)
+
+
+def percentile(values, fraction):
+    """
+    :return: the value at given fraction (0 to 1) of the sorted values
+    """
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(func, iterations, warmup=10):
+    """
+    Call the function repeatedly and collect the latency of each call.
+    The allocations are measured in separate pass with tracemalloc,
+    as the tracing slows down the calls.
+    :param func: function without arguments
+    :param iterations: number of the measured calls
+    :param warmup: number of calls before the measurement
+    :return: dictionary with the statistics, times in microseconds
+    """
+    for _ in range(warmup):
+        func()
+
+    latencies = []
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        call_start = time.perf_counter_ns()
+        func()
+        latencies.append((time.perf_counter_ns() - call_start) / 1000)
+    total = (time.perf_counter_ns() - start) / 1e9
+
+    # Both the memory retained by the call and the peak of the temporary
+    # allocations (i.e. the heap churn) are of interest.
+    churn = 0
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for _ in range(iterations):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            func()
+            churn += tracemalloc.get_traced_memory()[1] - current
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "iterations": iterations,
+        "iterations_per_s": iterations / total if total else None,
+        "latency_us": {
+            "mean": sum(latencies) / iterations,
+            "p50": percentile(latencies, 0.5),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies),
+        },
+        "alloc_bytes_per_call": churn / iterations,
+        "retained_bytes": retained,
+    }
+
+
+def parse_args(description, iterations=1000, add_arguments=None):
+    """
+    :param add_arguments: function adding benchmark specific arguments
+    to the parser
+    :return: parsed command line arguments common to the benchmarks
+    """
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument(
+        "-n",
+        "--iterations",
+        type=int,
+        default=iterations,
+        help=f"number of measured iterations (default {iterations})",
+    )
+    parser.add_argument("-o", "--output", help="save the results to JSON file")
+    if add_arguments is not None:
+        add_arguments(parser)
+    return parser.parse_args()
+
+
+def report(results, output=None):
+    """
+    Print the results as table and optionally save them as JSON.
+    :param results: dictionary of case name to dictionary returned by measure(),
+    possibly with extra keys
+    :param output: JSON file name or None
+    """
+    print(f"{'case':30} {'iter/s':>12} {'mean us':>10} {'p99 us':>10} {'alloc B':>10}")
+    for name, result in results.items():
+        print(
+            f"{name:30} {result['iterations_per_s']:12.0f} "
+            f"{result['latency_us']['mean']:10.2f} "
+            f"{result['latency_us']['p99']:10.2f} "
+            f"{result['alloc_bytes_per_call']:10.1f}"
+        )
+        extra = {
+            key: value
+            for key, value in result.items()
+            if key
+            not in (
+                "iterations",
+                "iterations_per_s",
+                "latency_us",
+                "alloc_bytes_per_call",
+                "retained_bytes",
+            )
+        }
+        if extra:
+            print(f"{'':30} {extra}")
+
+    if output:
+        with open(output, "w", encoding="utf-8") as file_obj:
+            json.dump(results, file_obj, indent=2)
+        print(f"saved to {output}")
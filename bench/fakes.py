@@ -0,0 +1,695 @@
+"""
+fake CircuitPython hardware modules for running the projects on the host
+
+The fakes implement just the parts of the APIs used by the projects.
+Each bus transaction (I2C, SPI, NeoPixel show, USB HID report) takes
+configurable time, simulated by busy waiting as the real transactions
+block the microcontroller too.
+
+Usage:
+    latencies = Latencies(i2c=0.0005)
+    hardware = FakeHardware(latencies)
+    hardware.install()  # puts the fakes to sys.modules
+    ...
+    hardware.uninstall()
+"""
+
+import sys
+import time
+import types
+
+# names of the latencies and their defaults in seconds
+LATENCY_DEFAULTS = {
+    # single I2C register read or write
+    "i2c": 0.0,
+    # SPI transaction
+    "spi": 0.0,
+    # NeoPixel show() or neopixel_write(), for the whole strip
+    "neopixel": 0.0,
+    # USB HID report
+    "hid": 0.0,
+    # radio receive() call
+    "radio": 0.0,
+}
+
+
+class Latencies(dict):
+    """
+    Latencies of the simulated transactions, in seconds.
+    """
+
+    def __init__(self, **latencies):
+        unknown = set(latencies) - set(LATENCY_DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown latencies: {unknown}")
+        super().__init__(LATENCY_DEFAULTS)
+        self.update(latencies)
+
+    def wait(self, name):
+        """
+        Busy wait for the latency of given transaction.
+        """
+        latency = self[name]
+        if latency > 0:
+            deadline = time.perf_counter() + latency
+            while time.perf_counter() < deadline:
+                pass
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+class Pin:
+    """
+    board pin
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return f"board.{self.name}"
+
+
+class DigitalInOut:
+    """
+    digitalio.DigitalInOut, reads as high (i.e. inactive open drain output)
+    """
+
+    def __init__(self, pin):
+        self.pin = pin
+        self.direction = None
+        self.pull = None
+        self.value = True
+
+    def deinit(self):
+        """
+        release the pin
+        """
+
+
+class I2C:
+    """
+    busio.I2C or board.I2C()
+    """
+
+    def __init__(self, latencies, *args, **kwargs):
+        self.latencies = latencies
+        self.transactions = 0
+
+    def transaction(self):
+        """
+        one register access
+        """
+        self.transactions += 1
+        self.latencies.wait("i2c")
+
+
+class SPI:
+    """
+    busio.SPI
+    """
+
+    def __init__(self, latencies, *args, **kwargs):
+        self.latencies = latencies
+        self.transactions = 0
+
+    def transaction(self):
+        """
+        one transfer
+        """
+        self.transactions += 1
+        self.latencies.wait("spi")
+
+
+class NeoPixel:
+    """
+    neopixel.NeoPixel
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        latencies,
+        pin,
+        n,
+        brightness=1.0,
+        auto_write=True,
+        pixel_order=None,
+    ):
+        self.latencies = latencies
+        self.pin = pin
+        self.n = n
+        self._brightness = brightness
+        self.auto_write = auto_write
+        self.pixel_order = pixel_order
+        self.buffer = [(0, 0, 0)] * n
+        self.shows = 0
+
+    def __len__(self):
+        return self.n
+
+    def __setitem__(self, index, value):
+        self.buffer[index] = value
+        if self.auto_write:
+            self.show()
+
+    def __getitem__(self, index):
+        return self.buffer[index]
+
+    @property
+    def brightness(self):
+        """
+        brightness of the strip
+        """
+        return self._brightness
+
+    @brightness.setter
+    def brightness(self, brightness):
+        self._brightness = brightness
+        if self.auto_write:
+            self.show()
+
+    def fill(self, color):
+        """
+        set all the pixels to the color
+        """
+        self.buffer[:] = [color] * self.n
+        if self.auto_write:
+            self.show()
+
+    def show(self):
+        """
+        write the pixels to the strip
+        """
+        self.shows += 1
+        self.latencies.wait("neopixel")
+
+
+class Watchdog:
+    """
+    microcontroller.watchdog
+    """
+
+    def __init__(self):
+        self.timeout = None
+        self.mode = None
+        self.feeds = 0
+
+    def feed(self):
+        """
+        feed the watchdog
+        """
+        self.feeds += 1
+
+
+class Seesaw:
+    """
+    adafruit_seesaw.seesaw.Seesaw of rotary encoder board. The encoder turns
+    by one detent every rotate_period position reads and the button
+    is pressed every press_period reads, for press_length reads.
+    """
+
+    INPUT_PULLUP = 2
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, i2c, addr=0x49, rotate_period=50, press_period=500):
+        self.i2c = i2c
+        self.addr = addr
+        self.rotate_period = rotate_period
+        self.press_period = press_period
+        self.press_length = 20
+        self._position_reads = 0
+        self._button_reads = 0
+
+    def pin_mode(self, pin, mode):
+        """
+        configure the pin
+        """
+        self.i2c.transaction()
+
+    def digital_read(self, pin):
+        """
+        :return: the button state, low when pressed
+        """
+        self.i2c.transaction()
+        self._button_reads += 1
+        return self._button_reads % self.press_period >= self.press_length
+
+    def encoder_position(self, encoder=0):
+        """
+        :return: the encoder position
+        """
+        self.i2c.transaction()
+        self._position_reads += 1
+        return self._position_reads // self.rotate_period
+
+    def get_GPIO_interrupt_flag(self):  # pylint: disable=invalid-name
+        """
+        read (and clear) the interrupt flags
+        """
+        self.i2c.transaction()
+        return 0
+
+    def enable_encoder_interrupt(self, encoder=0):
+        """
+        enable the encoder interrupt
+        """
+        self.i2c.transaction()
+
+    def set_GPIO_interrupts(self, pins, enabled):  # pylint: disable=invalid-name
+        """
+        enable the pin interrupts
+        """
+        self.i2c.transaction()
+
+
+class SeesawDigitalIO:
+    """
+    adafruit_seesaw.digitalio.DigitalIO
+    """
+
+    def __init__(self, seesaw, pin):
+        self.seesaw = seesaw
+        self.pin = pin
+
+    @property
+    def value(self):
+        """
+        pin value
+        """
+        return self.seesaw.digital_read(self.pin)
+
+
+class IncrementalEncoder:
+    """
+    adafruit_seesaw.rotaryio.IncrementalEncoder
+    """
+
+    def __init__(self, seesaw, encoder=0):
+        self.seesaw = seesaw
+        self.encoder = encoder
+
+    @property
+    def position(self):
+        """
+        encoder position
+        """
+        return self.seesaw.encoder_position(self.encoder)
+
+
+class VEML7700:
+    """
+    adafruit_veml7700.VEML7700 with slowly changing light
+    """
+
+    ALS_GAIN_1 = 0
+    ALS_GAIN_2 = 1
+
+    def __init__(self, i2c):
+        self.i2c = i2c
+        self.light_gain = self.ALS_GAIN_1
+        self._reads = 0
+
+    @property
+    def light(self):
+        """
+        raw light value
+        """
+        self.i2c.transaction()
+        self._reads += 1
+        return 20 + (self._reads // 10) % 20
+
+    def resolution(self):
+        """
+        lux per light count
+        """
+        self.i2c.transaction()
+        return 0.0576
+
+
+# pylint: disable=too-many-instance-attributes
+class VCNL4020:
+    """
+    adafruit_vcnl4020.Adafruit_VCNL4020. The hand comes every hand_period
+    reads and stays for hand_length reads.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, i2c, baseline=2000, hand=15000, hand_period=200, hand_length=40):
+        self.i2c = i2c
+        self.baseline = baseline
+        self.hand = hand
+        self.hand_period = hand_period
+        self.hand_length = hand_length
+        self.led_current = 200
+        self.proximity_rate = 1.95
+        self.interrupt_count = 1
+        self.low_threshold = (0,)
+        self.high_threshold = (0,)
+        self.low_threshold_interrupt = False
+        self.high_threshold_interrupt = False
+        self._reads = 0
+
+    @property
+    def proximity(self):
+        """
+        proximity reading
+        """
+        self.i2c.transaction()
+        self._reads += 1
+        noise = (self._reads * 7919) % 21 - 10
+        if self._reads % self.hand_period < self.hand_length:
+            return self.hand + noise
+        return self.baseline + noise
+
+    @property
+    def clear_interrupts(self):
+        """
+        read and clear the interrupt flags
+        """
+        self.i2c.transaction()
+        return 0
+
+
+class Seg14x4:
+    """
+    adafruit_ht16k33.segments.Seg14x4
+    """
+
+    def __init__(self, i2c, address=0x70):
+        self.i2c = i2c
+        self.address = address
+        self.text = ""
+
+    def fill(self, color):
+        """
+        set all the segments
+        """
+
+    def print(self, text):
+        """
+        set the text
+        """
+        self.text = text
+
+    def show(self):
+        """
+        write the segments to the display
+        """
+        self.i2c.transaction()
+
+
+class RFM69:
+    """
+    adafruit_rfm69.RFM69, receives a packet every packet_period calls
+    """
+
+    temperature = 21
+    frequency_mhz = 433.0
+    bitrate = 250000
+    frequency_deviation = 250000
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, spi, cs, reset, frequency, packet_period=10):
+        self.spi = spi
+        self.frequency = frequency
+        self.packet_period = packet_period
+        self.calls = 0
+
+    def receive(self, timeout=0.5):
+        """
+        :return: the packet or None
+        """
+        self.spi.transaction()
+        self.spi.latencies.wait("radio")
+        self.calls += 1
+        if self.calls % self.packet_period == 0:
+            return b"\x01\x02hello"
+        return None
+
+
+class NeoKey1x4:
+    """
+    adafruit_neokey.neokey1x4.NeoKey1x4. Each key is pressed every press_period
+    scans of the keys (8 reads) for press_length scans, the keys in turn.
+    """
+
+    def __init__(self, i2c, addr=0x30, press_period=200, press_length=20):
+        self.i2c = i2c
+        self.addr = addr
+        self.press_period = press_period
+        self.press_length = press_length
+        self.pixels = [0] * 4
+        self.reads = 0
+
+    def __getitem__(self, index):
+        self.i2c.transaction()
+        self.reads += 1
+        phase = (self.reads // 8 + index * self.press_period // 4) % self.press_period
+        return phase < self.press_length
+
+
+class Keyboard:
+    """
+    adafruit_hid.keyboard.Keyboard
+    """
+
+    def __init__(self, devices, latencies=None):
+        self.devices = devices
+        self.latencies = latencies
+        self.reports = 0
+
+    def send(self, *keycodes):
+        """
+        press and release the keys
+        """
+        self.reports += 2
+        self.latencies.wait("hid")
+        self.latencies.wait("hid")
+
+
+class Keycode:
+    """
+    adafruit_hid.keycode.Keycode
+    """
+
+    SHIFT = 0xE1
+    CONTROL = 0xE0
+    ENTER = 0x28
+    SPACE = 0x2C
+    SEMICOLON = 0x33
+    EQUALS = 0x2E
+    QUOTE = 0x34
+
+
+for _i, _letter in enumerate("ABCDEFGHIJKLMNOPQRSTUVWXYZ"):
+    setattr(Keycode, _letter, 0x04 + _i)
+
+
+def colorwheel(pos):
+    """
+    rainbowio.colorwheel
+    """
+    pos = int(pos) % 256
+    if pos < 85:
+        return ((255 - pos * 3) << 16) | ((pos * 3) << 8)
+    if pos < 170:
+        pos -= 85
+        return ((255 - pos * 3) << 8) | (pos * 3)
+    pos -= 170
+    return ((pos * 3) << 16) | (255 - pos * 3)
+
+
+class FakeHardware:
+    """
+    Set of the fake modules sharing the latencies.
+    """
+
+    # names of the pins used by the projects
+    PINS = (
+        "A0",
+        "A3",
+        "D0",
+        "D1",
+        "D5",
+        "D6",
+        "SCK",
+        "MOSI",
+        "MISO",
+        "SCL1",
+        "SDA1",
+        "NEOPIXEL",
+    )
+
+    def __init__(self, latencies=None):
+        self.latencies = latencies if latencies is not None else Latencies()
+        self.watchdog = Watchdog()
+        self.nvm = bytearray(8192)
+        self.strip_writes = 0
+        self.devices = []
+        self._saved = {}
+        self.modules = self._make_modules()
+
+    def _device(self, factory):
+        """
+        wrap the constructor so that the created devices are recorded
+        """
+
+        def create(*args, **kwargs):
+            device = factory(*args, **kwargs)
+            self.devices.append(device)
+            return device
+
+        return create
+
+    def find(self, kind):
+        """
+        :return: the created devices of given class
+        """
+        return [device for device in self.devices if isinstance(device, kind)]
+
+    def _make_modules(self):
+        latencies = self.latencies
+
+        def neopixel_write(pin, buf):
+            self.strip_writes += 1
+            latencies.wait("neopixel")
+
+        board = _module(
+            "board",
+            I2C=self._device(lambda: I2C(latencies)),
+            STEMMA_I2C=self._device(lambda: I2C(latencies)),
+            **{name: Pin(name) for name in self.PINS},
+        )
+        digitalio = _module(
+            "digitalio",
+            DigitalInOut=DigitalInOut,
+            Direction=types.SimpleNamespace(INPUT="input", OUTPUT="output"),
+            Pull=types.SimpleNamespace(UP="up", DOWN="down"),
+        )
+        busio = _module(
+            "busio",
+            I2C=self._device(lambda *args, **kwargs: I2C(latencies)),
+            SPI=self._device(lambda *args, **kwargs: SPI(latencies)),
+        )
+        microcontroller = _module(
+            "microcontroller",
+            nvm=self.nvm,
+            watchdog=self.watchdog,
+            cpu=types.SimpleNamespace(temperature=42.0),
+            reset=lambda: None,
+        )
+        watchdog = _module(
+            "watchdog",
+            WatchDogMode=types.SimpleNamespace(RAISE="raise", RESET="reset"),
+            WatchDogTimeout=type("WatchDogTimeout", (Exception,), {}),
+        )
+        alarm = _module(
+            "alarm",
+            pin=types.SimpleNamespace(PinAlarm=lambda *args, **kwargs: None),
+            time=types.SimpleNamespace(TimeAlarm=lambda *args, **kwargs: None),
+            light_sleep_until_alarms=lambda *alarms: None,
+            exit_and_deep_sleep_until_alarms=lambda *alarms: None,
+        )
+        radio = types.SimpleNamespace(
+            enabled=True,
+            connected=False,
+            ap_info=None,
+            ipv4_address="127.0.0.1",
+            connect=lambda ssid, password, timeout=None: None,
+        )
+
+        seesaw_package = _module("adafruit_seesaw")
+        seesaw_package.seesaw = _module(
+            "adafruit_seesaw.seesaw", Seesaw=self._device(Seesaw)
+        )
+        seesaw_package.digitalio = _module(
+            "adafruit_seesaw.digitalio", DigitalIO=SeesawDigitalIO
+        )
+        seesaw_package.rotaryio = _module(
+            "adafruit_seesaw.rotaryio", IncrementalEncoder=IncrementalEncoder
+        )
+        ht16k33_package = _module("adafruit_ht16k33")
+        ht16k33_package.segments = _module(
+            "adafruit_ht16k33.segments", Seg14x4=self._device(Seg14x4)
+        )
+        neokey_package = _module("adafruit_neokey")
+        neokey_package.neokey1x4 = _module(
+            "adafruit_neokey.neokey1x4", NeoKey1x4=self._device(NeoKey1x4)
+        )
+        hid_package = _module("adafruit_hid")
+        hid_package.keyboard = _module(
+            "adafruit_hid.keyboard",
+            Keyboard=self._device(lambda devices: Keyboard(devices, latencies)),
+        )
+        hid_package.keycode = _module("adafruit_hid.keycode", Keycode=Keycode)
+
+        modules = {
+            "board": board,
+            "digitalio": digitalio,
+            "busio": busio,
+            "microcontroller": microcontroller,
+            "watchdog": watchdog,
+            "alarm": alarm,
+            "supervisor": _module(
+                "supervisor",
+                reload=lambda: None,
+                runtime=types.SimpleNamespace(safe_mode_reason=None),
+            ),
+            "wifi": _module("wifi", radio=radio),
+            "socketpool": _module(
+                "socketpool", SocketPool=lambda radio: types.SimpleNamespace()
+            ),
+            "neopixel": _module(
+                "neopixel",
+                NeoPixel=self._device(
+                    lambda *args, **kwargs: NeoPixel(latencies, *args, **kwargs)
+                ),
+            ),
+            "neopixel_write": _module("neopixel_write", neopixel_write=neopixel_write),
+            "rainbowio": _module("rainbowio", colorwheel=colorwheel),
+            "adafruit_veml7700": _module(
+                "adafruit_veml7700", VEML7700=self._device(VEML7700)
+            ),
+            "adafruit_vcnl4020": _module(
+                "adafruit_vcnl4020", Adafruit_VCNL4020=self._device(VCNL4020)
+            ),
+            "adafruit_rfm69": _module("adafruit_rfm69", RFM69=self._device(RFM69)),
+            "adafruit_ntp": _module("adafruit_ntp", NTP=lambda *args, **kwargs: None),
+            "usb_hid": _module("usb_hid", devices=()),
+            "adafruit_seesaw": seesaw_package,
+            "adafruit_seesaw.seesaw": seesaw_package.seesaw,
+            "adafruit_seesaw.digitalio": seesaw_package.digitalio,
+            "adafruit_seesaw.rotaryio": seesaw_package.rotaryio,
+            "adafruit_ht16k33": ht16k33_package,
+            "adafruit_ht16k33.segments": ht16k33_package.segments,
+            "adafruit_neokey": neokey_package,
+            "adafruit_neokey.neokey1x4": neokey_package.neokey1x4,
+            "adafruit_hid": hid_package,
+            "adafruit_hid.keyboard": hid_package.keyboard,
+            "adafruit_hid.keycode": hid_package.keycode,
+        }
+        return modules
+
+    def install(self):
+        """
+        Put the fakes to sys.modules, remembering the replaced modules.
+        """
+        for name, module in self.modules.items():
+            self._saved[name] = sys.modules.get(name)
+            sys.modules[name] = module
+
+    def uninstall(self):
+        """
+        Restore the modules replaced by install().
+        """
+        for name, module in self._saved.items():
+            if module is None:
+                sys.modules.pop(name, None)
+            else:
+                sys.modules[name] = module
+        self._saved = {}
@@ -1,10 +1,12 @@
 """
 Remix of https://learn.adafruit.com/canary-nightlight
 
-Instead of making the LED light based on time, use the VEML7700 light sensor.
+In addition to making the LED light based on time, use the VEML7700 light sensor.
 Publish the data contiguously to MQTT topic.
+Outside of the active hours the device sleeps.
 """
 
+import asyncio
 import json
 import ssl
 import time
@@ -12,10 +14,14 @@ import traceback
 
 import adafruit_logging as logging
 import adafruit_minimqtt.adafruit_minimqtt as MQTT
+import adafruit_ntp
 import adafruit_veml7700
+
+# pylint: disable=import-error
+import alarm
 import board
+import digitalio
 import microcontroller
-import neopixel
 
 # pylint: disable=import-error
 import socketpool
@@ -25,249 +31,643 @@ import supervisor
 
 # pylint: disable=import-error
 import wifi
+from adafruit_ticks import ticks_diff, ticks_ms
 
 # pylint: disable=no-name-in-module
 from microcontroller import watchdog
+from neopixel_write import neopixel_write
 from watchdog import WatchDogMode, WatchDogTimeout
 
-from configutil import (
-    BRIGHTNESS_RANGE,
-    BROKER,
-    BROKER_PORT,
-    LIGHT_RANGE,
-    LIGHT_GAIN,
-    LOG_LEVEL,
-    MQTT_TOPIC,
-    PASSWORD,
-    SSID,
-    SecretsException,
-    check_tunables,
+from configutil import SecretsException, load_config
+from connmanager import ConnectionManager
+from framecache import FrameCache
+from heartbeat import TaskSupervisor
+from logutil import (
+    RingBufferHandler,
+    clear_tail,
+    configure,
+    get_log_level,
+    get_logger,
+    load_tail,
 )
-from logutil import get_log_level
-
-try:
-    from secrets import secrets
-except ImportError:
-    print(
-        "WiFi credentials and configuration are kept in secrets.py, please add them there!"
-    )
-    raise
+from profiler import Profiler
+from resetjournal import (
+    JOURNAL_SIZE,
+    REASON_CONNECTION,
+    REASON_EXCEPTION,
+    REASON_MEMORY,
+    REASON_NAMES,
+    REASON_WATCHDOG,
+    ResetJournal,
+)
+from scheduler import Scheduler
+from sensorfilter import AdaptivePeriod, Deadband, LightFilter
+from telemetryformat import Encoder
+from telemetryqueue import TelemetryQueue
+from timeutil import Clock
+
+# Number of brightness levels of the ramp.
+RAMP_LEVELS = 256
+# Gamma correction of the ramp. Note that with values greater than 1
+# the brightness_range needs to be adjusted.
+GAMMA = 1.0
+
+# Periods (in seconds) of the tasks.
+FRAME_PERIOD = 0.04
+SAMPLE_PERIOD_MIN = 0.5
+SAMPLE_PERIOD_MAX = 8
+PUBLISH_PERIOD = 1
+MQTT_LOOP_PERIOD = 0.5
+# How long (in seconds) single MQTT loop waits for incoming messages.
+MQTT_LOOP_TIMEOUT = 0.01
+WATCHDOG_PERIOD = 0.2
+WATCHDOG_TIMEOUT = 1
+# The WiFi connect (up to 10 seconds) and the MQTT connect (up to the receive
+# timeout, at most 10 seconds) are done in separate steps, each under this timeout.
+RECONNECT_WATCHDOG_TIMEOUT = 16
+CONNECTION_CHECK_PERIOD = 1
+SCHEDULE_PERIOD = 60
+CLOCK_SYNC_INTERVAL = 3600
+
+# Seconds of running with the connection up after which the count of consecutive
+# failures in the reset journal is cleared.
+STABLE_TIME = 60
+
+# Inactivity longer than this (in seconds) is spent in deep sleep.
+LIGHT_SLEEP_MAX = 30 * 60
+
+# Relative change of the light that resets the sampling period to the minimum.
+SAMPLE_CHANGE = 0.05
+
+# Number of the most recent log records kept in memory. On crash, the newest
+# of them are saved to the NVM area right after the reset journal.
+LOG_RING_SIZE = 32
+LOG_TAIL_OFFSET = JOURNAL_SIZE
+LOG_TAIL_SIZE = 1024
+
+# Names of the profiled stages.
+STAGE_SENSOR = "sensor"
+STAGE_PUBLISH = "publish"
+STAGE_DISPLAY = "display"
+STAGE_MQTT = "mqtt"
+
+# Names of the supervised tasks. Each task has to send heartbeat within
+# its period plus the slack (in seconds), otherwise the watchdog is not fed.
+TASK_SENSOR = "sensor"
+TASK_PUBLISH = "publish"
+TASK_DISPLAY = "display"
+TASK_MQTT = "mqtt"
+TASK_CONNECTION = "connection"
+TASK_SCHEDULE = "schedule"
+TASK_PROFILE = "profile"
+DEADLINE_SLACK = 1
+
+# Byte budget of the queue of records that failed to be published.
+QUEUE_BYTES = 4096
+# Maximum number of queued records to publish at once.
+PUBLISH_BATCH = 8
+
+
+log_ring = RingBufferHandler(LOG_RING_SIZE)
+journal = ResetJournal(microcontroller.nvm)  # pylint: disable=no-member
+profiler = Profiler(
+    (STAGE_SENSOR, STAGE_PUBLISH, STAGE_DISPLAY, STAGE_MQTT), enabled=False
+)
+task_supervisor = TaskSupervisor()
 
 
-# simple inverted range mapper, like Arduino map() but inverted
-def map_range_cap_inv(s, a1, a2, b1, b2):
+# pylint: disable=too-few-public-methods
+class State:
     """
-    constrain the s value into a1,a2 range first, then map it to the range b1,b2 inverted
-    based on https://learn.adafruit.com/todbot-circuitpython-tricks/more-esoteric-tasks
+    state shared between the tasks
     """
-    s = max(s, a1)
-    s = min(s, a2)
-    return b2 - ((s - a1) * (b2 - b1) / (a2 - a1))
+
+    def __init__(self, brightness_max):
+        self.light = None
+        self.lux = None
+        self.brightness_max = brightness_max
 
 
 def main():
     """
-    main loop
+    set up the hardware and run the tasks
     """
-    check_tunables()
+    config = load_config()
 
-    log_level = get_log_level(secrets[LOG_LEVEL])
-    logger = logging.getLogger(__name__)
-    logger.setLevel(log_level)
+    # The level and handlers apply to the loggers of all the modules.
+    configure(get_log_level(config.log_level), logging.StreamHandler(), log_ring)
+    logger = get_logger(__name__)
 
     logger.info("Running")
-
-    logger.info(f"Connecting to wifi {secrets[SSID]}")
-    wifi.radio.connect(secrets[SSID], secrets[PASSWORD], timeout=10)
-    logger.info(f"Connected to {secrets[SSID]}")
-    logger.debug(f"IP: {wifi.radio.ipv4_address}")
-
-    # The initialization code below should not take long,
-    # however the light changes in the endless loop takes couple of seconds,
-    # so the watchdog timeout should be more than that.
-    # Also, placed after the wifi connect it does not have to account
-    # for the wifi connect timeout.
-    watchdog.timeout = 16
-    watchdog.mode = WatchDogMode.RAISE
+    # pylint: disable=no-member
+    for record in load_tail(microcontroller.nvm, LOG_TAIL_OFFSET, LOG_TAIL_SIZE):
+        logger.warning("Before reset: %s", record)
+
+    # Avoid draining power in a reset loop.
+    delay = journal.backoff()
+    if delay:
+        logger.warning(
+            "%d consecutive failures, waiting %d seconds", journal.failures, delay
+        )
+        time.sleep(delay)
+    start_stamp = time.monotonic()
 
     # Assumes Adafruit 5x5 NeoPixel Grid BFF
-    pixels = neopixel.NeoPixel(
-        board.A3, 5 * 5, brightness=secrets.get(BRIGHTNESS_RANGE)[0], auto_write=False
-    )
+    pin = digitalio.DigitalInOut(board.A3)
+    pin.direction = digitalio.Direction.OUTPUT
+    # TODO: make the color tunable
+    frames = FrameCache((255, 100, 0), 5 * 5, levels=RAMP_LEVELS, gamma=GAMMA)
 
     # pylint: disable=no-member
     i2c = board.STEMMA_I2C()
     veml7700 = adafruit_veml7700.VEML7700(i2c)
-    light_gain = secrets.get(LIGHT_GAIN)
-    if light_gain is not None:
-        logger.info(f"Setting light gain to {light_gain}")
-        if light_gain == 1:
-            light_gain = adafruit_veml7700.VEML7700.ALS_GAIN_1
-        elif light_gain == 2:
-            light_gain = adafruit_veml7700.VEML7700.ALS_GAIN_2
+    if config.light_gain is not None:
+        logger.info("Setting light gain to %s", config.light_gain)
+        if config.light_gain == 1:
+            veml7700.light_gain = adafruit_veml7700.VEML7700.ALS_GAIN_1
         else:
-            raise ValueError(f"invalid light gain value: {light_gain}")
-        veml7700.light_gain = light_gain
+            veml7700.light_gain = adafruit_veml7700.VEML7700.ALS_GAIN_2
 
+    # The socket pool, SSL context and the MQTT client are reused across reconnects.
     pool = socketpool.SocketPool(wifi.radio)
 
     mqtt_client = MQTT.MQTT(
-        broker=secrets[BROKER],
-        port=secrets[BROKER_PORT],
+        broker=config.broker,
+        port=config.broker_port,
         socket_pool=pool,
         ssl_context=ssl.create_default_context(),
-        recv_timeout=5,
+        recv_timeout=config.mqtt_recv_timeout,
+        keep_alive=config.mqtt_keep_alive,
         socket_timeout=0.01,
+        connect_retries=1,
     )
 
-    logger.info("Connecting to MQTT broker")
-    mqtt_client.connect()
+    # The connection is brought up by the maintain_connection() task,
+    # so the pixels follow the light right from the start.
+    manager = ConnectionManager(wifi.radio, config.ssid, config.password, mqtt_client)
+
+    ntp = adafruit_ntp.NTP(pool)
+    clock = Clock(ntp, tz_offset=config.tz_offset, sync_interval=CLOCK_SYNC_INTERVAL)
+    scheduler = Scheduler(clock, config.hours_range)
+
+    # initialize the pixels with given color and minimal brightness
+    neopixel_write(pin, frames.get(frames.level(config.brightness_min)))
+
+    # None of the tasks blocks for long, so the watchdog can be kept tight.
+    # It is relaxed around the wifi/MQTT connects done by maintain_connection().
+    # The task supervisor detects the tasks that stop sending heartbeats while
+    # the event loop keeps running. A task that blocks the event loop triggers
+    # the watchdog instead and is identified as the one that sent the last heartbeat,
+    # as each task sends it when it resumes.
+    task_supervisor.register(TASK_SENSOR, SAMPLE_PERIOD_MAX + DEADLINE_SLACK)
+    task_supervisor.register(TASK_PUBLISH, PUBLISH_PERIOD + DEADLINE_SLACK)
+    task_supervisor.register(TASK_DISPLAY, FRAME_PERIOD + DEADLINE_SLACK)
+    task_supervisor.register(TASK_MQTT, MQTT_LOOP_PERIOD + DEADLINE_SLACK)
+    task_supervisor.register(TASK_CONNECTION, CONNECTION_CHECK_PERIOD + DEADLINE_SLACK)
+    task_supervisor.register(TASK_SCHEDULE, SCHEDULE_PERIOD + DEADLINE_SLACK)
+    set_watchdog(WATCHDOG_TIMEOUT)
+
+    state = State(config.brightness_min)
+    queue = TelemetryQueue(QUEUE_BYTES)
+    encoder = Encoder(config.telemetry_format)
+    deadband = Deadband(config.publish_deadband, config.publish_max_interval)
+    tasks = [
+        asyncio.create_task(feed_watchdog()),
+        asyncio.create_task(sample_light(veml7700, state, config)),
+        asyncio.create_task(
+            publish_data(
+                manager, config.mqtt_topic, state, clock, queue, encoder, deadband
+            )
+        ),
+        asyncio.create_task(
+            maintain_connection(manager, config.mqtt_topic, clock, start_stamp)
+        ),
+        asyncio.create_task(mqtt_loop(manager)),
+        asyncio.create_task(schedule(scheduler, pin, frames, manager)),
+        asyncio.create_task(display_pixels(pin, frames, state, config.brightness_min)),
+    ]
+    if config.profile_period > 0:
+        profiler.enabled = True
+        task_supervisor.register(TASK_PROFILE, config.profile_period + DEADLINE_SLACK)
+        tasks.append(
+            asyncio.create_task(
+                report_profile(
+                    manager, config.mqtt_topic + "/profile", config.profile_period
+                )
+            )
+        )
+    asyncio.run(asyncio.gather(*tasks))
+
+
+def upload_journal(manager, topic):
+    """
+    Publish the reset journal and the log records saved before the last crash
+    to subtopics of the MQTT topic.
+    :return: True on success
+    """
+    logger = get_logger(__name__)
 
-    # initialize the pixels with given color and 0 brightness
-    pixels.fill((255, 100, 0))  # TODO: make the color this tunable
-    pixels.show()
-    publish_stamp = 0
+    entries = [
+        {"reason": REASON_NAMES.get(reason, reason), "uptime": uptime, "name": name}
+        for reason, uptime, name in journal.entries()
+    ]
+    logger.debug("Reset journal: %s", entries)
+    # pylint: disable=no-member
+    records = load_tail(microcontroller.nvm, LOG_TAIL_OFFSET, LOG_TAIL_SIZE)
+    try:
+        manager.mqtt_client.publish(topic + "/journal", json.dumps(entries))
+        if records:
+            manager.mqtt_client.publish(topic + "/crash_log", "\n".join(records))
+    except (OSError, MQTT.MMQTTException) as pub_exc:
+        logger.warning("failed to publish reset journal: %s", pub_exc)
+        manager.lost(pub_exc)
+        return False
+
+    if records:
+        clear_tail(microcontroller.nvm, LOG_TAIL_OFFSET)
+    return True
+
+
+def save_log():
+    """
+    Save the newest log records to NVM so that they survive the reset
+    and print all of them to the console.
+    """
+    # pylint: disable=no-member
+    log_ring.save(microcontroller.nvm, LOG_TAIL_OFFSET, LOG_TAIL_SIZE)
+    log_ring.dump()
+
+
+async def feed_watchdog():
+    """
+    Feed the watchdog periodically. If any of the other tasks misses its deadline,
+    the watchdog is not fed. If it blocks the event loop for too long, this task
+    cannot run, so the watchdog fires without the late tasks being logged.
+    """
+    logger = get_logger(__name__)
+
+    reported = ()
     while True:
-        watchdog.feed()
+        late = task_supervisor.feed(watchdog)
+        if late and late != reported:
+            # The log is saved to NVM once the watchdog fires.
+            logger.error("Tasks missed their deadline: %s", ", ".join(late))
+        reported = late
+        await asyncio.sleep(WATCHDOG_PERIOD)
 
-        light = veml7700.light
-        lux = veml7700.lux
-        logger.debug(f"Ambient light: {light}")
-        logger.debug(f"Lux: {lux}")
 
-        brightness_max = get_brightness(light)
+async def sample_light(veml7700, state, config):
+    """
+    Read the light sensor, filter the value and recompute the maximum brightness.
+    The sampling period backs off while the light is stable.
+    """
+    logger = get_logger(__name__)
 
-        data = {}
-        if light is not None:
-            data["light"] = light
-        if lux is not None:
-            data["lux"] = lux
-        data["brightness_max"] = brightness_max
-        # pylint: disable=no-member
-        data["cpu_temp"] = microcontroller.cpu.temperature
+    # The lux value is computed from the light value using the resolution
+    # determined by the gain and integration time which do not change
+    # after the setup, so one I2C transaction per sample is enough.
+    resolution = veml7700.resolution()
+    light_filter = LightFilter()
+    sampling = AdaptivePeriod(SAMPLE_PERIOD_MIN, SAMPLE_PERIOD_MAX, SAMPLE_CHANGE)
 
-        publish_stamp = publish_data(mqtt_client, publish_stamp, data)
+    while True:
+        task_supervisor.beat(TASK_SENSOR)
+        start = profiler.start()
+        light = light_filter.update(veml7700.light)
+        state.light = int(light + 0.5)
+        state.lux = light * resolution
+        logger.debug("Ambient light: %s", state.light)
+        logger.debug("Lux: %s", state.lux)
 
-        display_pixels(pixels, brightness_max)
+        state.brightness_max = get_brightness(light, config)
+        profiler.stop(STAGE_SENSOR, start)
+
+        await asyncio.sleep(sampling.update(light))
 
-        # To handle MQTT ping. Also used not to loop too quickly.
-        try:
-            mqtt_client.loop(0.01)
-        except (OSError, MQTT.MMQTTException) as loop_exc:
-            logger.error(f"failed to publish: {loop_exc}")
-            # If the reconnect fails with another exception, it is time to reload
-            # via the generic exception handling code around main().
-            mqtt_client.reconnect()
+
+def set_watchdog(timeout):
+    """
+    Reinitialize the watchdog with given timeout. This is done around the code
+    that blocks the event loop, so the heartbeats of the tasks are refreshed.
+    """
+    watchdog.mode = None
+    watchdog.timeout = timeout
+    watchdog.mode = WatchDogMode.RAISE
+    task_supervisor.beat_all()
+
+
+async def maintain_connection(manager, topic, clock, start_stamp):
+    """
+    Establish the WiFi/MQTT connection, reestablish it when lost
+    and check the WiFi link quality. After the first connect, the reset journal
+    is uploaded and the clock is synchronized unless it was already.
+    Once the code runs with the connection up for long enough, the count
+    of consecutive failures is cleared. Clearing it right after the connect
+    would defeat the backoff for failures that happen shortly afterwards.
+    """
+    logger = get_logger(__name__)
+
+    uploaded = False
+    while True:
+        task_supervisor.beat(TASK_CONNECTION)
+        if (
+            journal.failures
+            and manager.connected
+            and time.monotonic() - start_stamp > STABLE_TIME
+        ):
+            journal.clear_failures()
+        manager.check_link()
+        if not manager.connected and manager.delay() == 0:
+            # The connect can block for up to the WiFi or MQTT connect timeout.
+            set_watchdog(RECONNECT_WATCHDOG_TIMEOUT)
+            try:
+                if manager.step() and not uploaded:
+                    logger.debug("IP: %s", wifi.radio.ipv4_address)
+                    uploaded = upload_journal(manager, topic)
+                    if clock.timestamp() is None:
+                        clock.sync()
+            finally:
+                set_watchdog(WATCHDOG_TIMEOUT)
+
+        await asyncio.sleep(CONNECTION_CHECK_PERIOD)
+
+
+async def schedule(scheduler, pin, frames, manager):
+    """
+    Put the device to sleep with the pixels and WiFi off outside of the active hours.
+
+    Shorter periods of inactivity are spent in light sleep after which
+    the WiFi and MQTT connections are resumed. Longer periods are spent
+    in deep sleep which restarts the code on wakeup.
+    The connection is reestablished by the maintain_connection() task.
+    """
+    logger = get_logger(__name__)
+
+    while True:
+        task_supervisor.beat(TASK_SCHEDULE)
+        # The clock might need to synchronize with NTP.
+        set_watchdog(RECONNECT_WATCHDOG_TIMEOUT)
+        duration = scheduler.sleep_duration()
+        set_watchdog(WATCHDOG_TIMEOUT)
+
+        if duration > 0:
+            logger.info("Outside of active hours, sleeping for %d seconds", duration)
+            neopixel_write(pin, frames.get(0))
+            manager.disconnect()
+            wifi.radio.enabled = False
+
+            watchdog.mode = None
+            time_alarm = alarm.time.TimeAlarm(
+                monotonic_time=time.monotonic() + duration
+            )
+            if duration > LIGHT_SLEEP_MAX:
+                alarm.exit_and_deep_sleep_until_alarms(time_alarm)
+            alarm.light_sleep_until_alarms(time_alarm)
+
+            logger.info("Woke up, resuming")
+            wifi.radio.enabled = True
+            set_watchdog(WATCHDOG_TIMEOUT)
+
+        await asyncio.sleep(SCHEDULE_PERIOD)
+
+
+async def report_profile(manager, topic, period):
+    """
+    Periodically log the profiling statistics and publish them to MQTT topic.
+    """
+    logger = get_logger(__name__)
+
+    while True:
+        await asyncio.sleep(period)
+        task_supervisor.beat(TASK_PROFILE)
+
+        summary = profiler.summary()
+        logger.info("Profile: %s", summary)
+        if manager.connected:
+            try:
+                manager.mqtt_client.publish(topic, json.dumps(summary))
+            except (OSError, MQTT.MMQTTException) as pub_exc:
+                logger.warning("failed to publish profile: %s", pub_exc)
+                manager.lost(pub_exc)
+        profiler.reset()
+
+
+def ping_due(mqtt_client):
+    """
+    :return: whether the keep alive period of the MQTT client elapses
+    within the next loop() call, i.e. the call sends PINGREQ and waits for PINGRESP
+    """
+    # pylint: disable=protected-access
+    idle = ticks_diff(ticks_ms(), mqtt_client._last_msg_sent_timestamp) / 1000
+    return idle + MQTT_LOOP_TIMEOUT >= mqtt_client.keep_alive
+
+
+async def mqtt_loop(manager):
+    """
+    Handle MQTT ping and incoming traffic.
+
+    Once the keep alive period elapses, loop() sends PINGREQ and blocks
+    until PINGRESP arrives, for up to the keep alive period. The watchdog
+    is relaxed for such call so that slow broker does not trigger reset.
+    """
+    logger = get_logger(__name__)
+
+    while True:
+        task_supervisor.beat(TASK_MQTT)
+        if manager.connected:
+            mqtt_client = manager.mqtt_client
+            ping = ping_due(mqtt_client)
+            if ping:
+                set_watchdog(mqtt_client.keep_alive + DEADLINE_SLACK)
+            start = profiler.start()
+            try:
+                mqtt_client.loop(MQTT_LOOP_TIMEOUT)
+                profiler.stop(STAGE_MQTT, start)
+            except (OSError, MQTT.MMQTTException) as loop_exc:
+                logger.error("failed to loop: %s", loop_exc)
+                manager.lost(loop_exc)
+            finally:
+                if ping:
+                    set_watchdog(WATCHDOG_TIMEOUT)
+
+        await asyncio.sleep(MQTT_LOOP_PERIOD)
 
 
 # pylint: disable=too-many-arguments
-def publish_data(mqtt_client, publish_stamp, data):
+async def publish_data(manager, topic, state, clock, queue, encoder, deadband):
     """
-    Publish metrics to MQTT topic.
+    Publish metrics to MQTT topic. The records are stamped with the time
+    of the sample so that the queued records can be placed in time.
 
-    Do this only once in a while in order not to spam the MQTT topic too much.
+    To avoid spamming the MQTT topic, the data is published only when
+    the light changes by more than the deadband or when the maximum silence
+    interval elapses.
 
-    Return the time of publish (which may be the original time passed in).
+    If the publish fails or the connection is down, the record is queued
+    and the queued records are published in batches once the broker
+    is reachable again.
     """
-    logger = logging.getLogger(__name__)
+    logger = get_logger(__name__)
+
+    def publish(record):
+        # MiniMQTT accepts bytes but not bytearray (the binary encoder buffer).
+        if isinstance(record, bytearray):
+            record = bytes(record)
+        manager.mqtt_client.publish(topic, record)
+
+    while True:
+        task_supervisor.beat(TASK_PUBLISH)
+        record = None
+        if state.light is not None and deadband.check(state.light, time.monotonic()):
+            record = encoder.encode(
+                state.light,
+                state.lux,
+                state.brightness_max,
+                microcontroller.cpu.temperature,  # pylint: disable=no-member
+                clock.timestamp(),
+            )
 
-    logger.debug(f"publish stamp: {publish_stamp}")
-    # TODO: use adafruit time diff library
-    if (
-        publish_stamp < time.monotonic_ns() // 1_000_000_000 - 10
-    ):  # TODO: make this configurable
         # TODO: monitor the temperature and scale the brightness down if too hot
+        if record is None and len(queue) == 0:
+            await asyncio.sleep(PUBLISH_PERIOD)
+            continue
+
+        # Keep the records in order: if there is a backlog, append to it.
+        queued = len(queue) > 0
+        if (queued or not manager.connected) and record is not None:
+            queue.put(record)
+        if not manager.connected:
+            await asyncio.sleep(PUBLISH_PERIOD)
+            continue
+
+        start = profiler.start()
         try:
-            logger.debug(f"Publishing to MQTT: {data}")
-            mqtt_client.publish(
-                secrets[MQTT_TOPIC],
-                json.dumps(data),
-            )
-            publish_stamp = time.monotonic_ns() // 1_000_000_000
+            if queued:
+                count = queue.drain(publish, PUBLISH_BATCH)
+                logger.info(
+                    "Replayed %d records, %d records (%d bytes) still queued, "
+                    "%d replayed and %d dropped in total",
+                    count,
+                    len(queue),
+                    queue.size,
+                    queue.replayed,
+                    queue.dropped,
+                )
+            else:
+                logger.debug("Publishing to MQTT: %s", record)
+                publish(record)
+            profiler.stop(STAGE_PUBLISH, start)
         except (OSError, MQTT.MMQTTException) as pub_exc:
-            logger.error(f"failed to publish: {pub_exc}")
-            # If the reconnect fails with another exception, it is time to reload
-            # via the generic exception handling code around main().
-            mqtt_client.reconnect()
+            logger.error("failed to publish: %s", pub_exc)
+            if not queued:
+                queue.put(record)
+            manager.lost(pub_exc)
 
-    return publish_stamp
+        await asyncio.sleep(PUBLISH_PERIOD)
 
 
-def display_pixels(pixels, brightness_max, brightness_min=0.1):
+async def display_pixels(pin, frames, state, brightness_min):
     """
-    Change pixels in a complete round of iterations for given brightness level.
+    Ramp the brightness of the pixels up to the maximum brightness and back down,
+    one brightness level per frame. The frames are assembled by the frame cache
+    from precomputed pixel values, so each step merely copies bytes
+    and writes the buffer to the strip.
 
-    This function takes around 8 seconds to complete.
-    The watchdog timeout in the main() has to be set accordingly.
+    The maximum brightness is read from the shared state on every frame
+    so that changes of the ambient light are reflected right away.
 
     The minimal brightness level is stricly greater than zero otherwise this
-    would create unwelcome effect of darkness blip in between the function call.
+    would create unwelcome effect of darkness blip in between the cycles.
     """
-    logger = logging.getLogger(__name__)
-
-    sleep_duration = 0.1
-    brightness = brightness_min
-
-    logger.debug("brightness cycle start")
-    while brightness <= brightness_max:
-        pixels.brightness = brightness
-        pixels.show()
-        time.sleep(sleep_duration)
-        brightness += 0.01
-    brightness = brightness_max
-    while brightness >= brightness_min:
-        pixels.brightness = brightness
-        pixels.show()
-        time.sleep(sleep_duration)
-        brightness -= 0.01
-    # TODO: report duration
-    logger.debug("brightness cycle end")
-
-
-def get_brightness(light):
+    logger = get_logger(__name__)
+
+    level_min = frames.level(brightness_min)
+    level = level_min
+    brightness_max = None
+    level_max = level_min
+    direction = 1
+    while True:
+        task_supervisor.beat(TASK_DISPLAY)
+        if state.brightness_max != brightness_max:
+            brightness_max = state.brightness_max
+            level_max = frames.level(brightness_max)
+
+        if direction > 0 and level >= level_max:
+            level = level_max
+            direction = -1
+        elif direction < 0 and level <= level_min:
+            level = level_min
+            direction = 1
+            logger.debug("brightness cycle end")
+
+        start = profiler.start()
+        neopixel_write(pin, frames.get(level))
+        profiler.stop(STAGE_DISPLAY, start)
+        level += direction
+
+        await asyncio.sleep(FRAME_PERIOD)
+
+
+def get_brightness(light, config):
     """
-    Get maximum brightness based on current light level.
+    Get maximum brightness based on current light level
+    using linear interpolation in the lookup table.
     """
-    logger = logging.getLogger(__name__)
-
-    # Map the light value contiguously into the brightness range.
-    brightness = map_range_cap_inv(
-        light,
-        secrets.get(LIGHT_RANGE)[0],
-        secrets.get(LIGHT_RANGE)[1],
-        secrets.get(BRIGHTNESS_RANGE)[0],
-        secrets.get(BRIGHTNESS_RANGE)[1],
-    )
-
-    logger.debug(f"brightness = {brightness}")
+    logger = get_logger(__name__)
+
+    lut = config.lut
+    light = min(max(light, config.light_min), config.light_max)
+    position = (light - config.light_min) * config.lut_scale
+    index = int(position)
+    if index >= len(lut) - 1:
+        brightness = lut[-1]
+    else:
+        brightness = lut[index] + (lut[index + 1] - lut[index]) * (position - index)
+
+    logger.debug("brightness = %s", brightness)
     return brightness
 
 
-try:
-    main()
-except SecretsException as e:
-    print(f"secrets error: {e}")
-except ConnectionError as e:
-    # When this happens, it usually means that the microcontroller's wifi/networking is botched.
-    # The only way to recover is to perform hard reset.
-    print(f"Performing hard reset: {e}")
-    microcontroller.reset()  # pylint: disable=no-member
-except MemoryError as e:
-    # This is usually the case of delayed exception from the 'import wifi' statement,
-    # possibly caused by a bug (resource leak) in CircuitPython that manifests
-    # after a sequence of ConnectionError exceptions thrown from withing the wifi module.
-    # Should not happen given the above 'except ConnectionError',
-    # however adding that here just in case.
-    print(f"Performing hard reset: {e}")
-    microcontroller.reset()  # pylint: disable=no-member
-except Exception as e:  # pylint: disable=broad-except
-    # This assumes that such exceptions are quite rare.
-    # Otherwise, this would drain the battery quickly by restarting
-    # over and over in a quick succession.
-    print("Code stopped by unhandled exception:")
-    print(traceback.format_exception(None, e, e.__traceback__))
-    print("Performing code reload")
-    supervisor.reload()
-except WatchDogTimeout as e:
-    print(f"Performing hard reset: {e}")
-    microcontroller.reset()  # pylint: disable=no-member
+if __name__ == "__main__":
+    try:
+        main()
+    except SecretsException as e:
+        print(f"configuration error: {e}")
+    except ConnectionError as e:
+        # When this happens, the connection manager gave up after many failed attempts
+        # which usually means that the microcontroller's wifi/networking is botched.
+        # The only way to recover is to perform hard reset.
+        journal.record(REASON_CONNECTION, time.monotonic(), type(e).__name__)
+        save_log()
+        print(f"Performing hard reset: {e}")
+        microcontroller.reset()  # pylint: disable=no-member
+    except MemoryError as e:
+        # This is usually the case of delayed exception from the 'import wifi' statement,
+        # possibly caused by a bug (resource leak) in CircuitPython that manifests
+        # after a sequence of ConnectionError exceptions thrown from withing the wifi module.
+        # Should not happen given the above 'except ConnectionError',
+        # however adding that here just in case.
+        journal.record(REASON_MEMORY, time.monotonic(), type(e).__name__)
+        save_log()
+        print(f"Performing hard reset: {e}")
+        microcontroller.reset()  # pylint: disable=no-member
+    except WatchDogTimeout as e:
+        # Derived from Exception, so it has to be caught first.
+        # The task that blocked is the one that sent the last heartbeat.
+        get_logger(__name__).error("Watchdog fired in task %s", task_supervisor.last)
+        journal.record(
+            REASON_WATCHDOG, time.monotonic(), task_supervisor.last or type(e).__name__
+        )
+        save_log()
+        print(f"Performing hard reset: {e}")
+        microcontroller.reset()  # pylint: disable=no-member
+    except Exception as e:  # pylint: disable=broad-except
+        # This assumes that such exceptions are quite rare.
+        # Otherwise, this would drain the battery quickly by restarting
+        # over and over in a quick succession.
+        print("Code stopped by unhandled exception:")
+        print(traceback.format_exception(None, e, e.__traceback__))
+        journal.record(REASON_EXCEPTION, time.monotonic(), type(e).__name__)
+        save_log()
+        print("Performing code reload")
+        supervisor.reload()
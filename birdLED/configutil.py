@@ -1,14 +1,19 @@
 """
 functions for handling configuration
+
+The configuration is read from secrets.py and/or settings.toml,
+validated against the schema once and compiled into immutable Config object.
 """
 
+from os import getenv
+
+from telemetryformat import FORMAT_JSON, FORMATS
+
 try:
     from secrets import secrets
 except ImportError:
-    print(
-        "WiFi credentials and configuration are kept in secrets.py, please add them there!"
-    )
-    raise
+    # The configuration can be stored in settings.toml instead.
+    secrets = {}
 
 
 # tunables
@@ -22,6 +27,39 @@ BRIGHTNESS_RANGE = "brightness_range"
 LIGHT_RANGE = "light_range"
 LIGHT_GAIN = "light_gain"
 HOURS_RANGE = "hours_range"
+TELEMETRY_FORMAT = "telemetry_format"
+PUBLISH_DEADBAND = "publish_deadband"
+PUBLISH_MAX_INTERVAL = "publish_max_interval"
+TZ_OFFSET = "tz_offset"
+PROFILE_PERIOD = "profile_period"
+MQTT_RECV_TIMEOUT = "mqtt_recv_timeout"
+MQTT_KEEP_ALIVE = "mqtt_keep_alive"
+BRIGHTNESS_LUT = "brightness_lut"
+
+# Maximum number of entries of the brightness lookup table.
+LUT_SIZE_MAX = 64
+
+# The schema of the tunables: name, type, item type (for tuples), mandatory, default
+SCHEMA = (
+    (LOG_LEVEL, str, None, True, None),
+    (SSID, str, None, True, None),
+    (PASSWORD, str, None, True, None),
+    (BROKER, str, None, True, None),
+    (BROKER_PORT, int, None, True, None),
+    (MQTT_TOPIC, str, None, True, None),
+    (MQTT_RECV_TIMEOUT, int, None, False, 5),
+    (MQTT_KEEP_ALIVE, int, None, False, 60),
+    (BRIGHTNESS_RANGE, tuple, float, True, None),
+    (LIGHT_RANGE, tuple, int, True, None),
+    (BRIGHTNESS_LUT, tuple, float, False, None),
+    (LIGHT_GAIN, int, None, False, None),
+    (HOURS_RANGE, tuple, int, True, None),
+    (TZ_OFFSET, int, None, False, 1),
+    (TELEMETRY_FORMAT, str, None, False, FORMAT_JSON),
+    (PUBLISH_DEADBAND, int, None, False, 2),
+    (PUBLISH_MAX_INTERVAL, int, None, False, 300),
+    (PROFILE_PERIOD, int, None, False, 0),
+)
 
 
 class SecretsException(Exception):
@@ -37,84 +75,177 @@ def bail(message):
     raise SecretsException(message)
 
 
-def check_string(name, mandatory=True):
+def lookup(name):
     """
-    Check is string with given name is present in secrets.
+    Look up the value in secrets, then in settings.toml (in upper case).
     """
     value = secrets.get(name)
-    if value is None and mandatory:
-        bail(f"{name} is missing")
-
-    if value and not isinstance(value, str):
-        bail(f"not a string value for {name}: {value}")
+    if value is None:
+        value = getenv(name.upper())
+    return value
 
 
-def check_int(name, mandatory=True):
+def convert(name, value, kind, item_kind, errors):
     """
-    Check is integer with given name is present in secrets.
+    Check the type of the value and convert it if needed.
+    The values from settings.toml can only be strings or integers,
+    so the tuples are expected to be stored as comma separated strings there.
+    :return: the converted value or None on error (the error is recorded)
     """
-    value = secrets.get(name)
-    if value is None and mandatory:
-        bail(f"{name} is missing")
-
-    if value and not isinstance(value, int):
-        bail(f"not a integer value for {name}: {value}")
-
-
-def check_tuple(name, mandatory=True, numitems=2):
+    if kind is tuple:
+        if isinstance(value, str):
+            try:
+                value = tuple(item_kind(item.strip()) for item in value.split(","))
+            except ValueError:
+                errors.append(
+                    f"not a tuple of {item_kind.__name__} for {name}: {value}"
+                )
+                return None
+        if not isinstance(value, tuple):
+            errors.append(f"not a tuple value for {name}: {value}")
+            return None
+        # The lookup table has variable size, checked with the other values.
+        if name != BRIGHTNESS_LUT and len(value) != 2:
+            errors.append(f"tuple must have 2 items: {value}")
+            return None
+        for item in value:
+            if not isinstance(item, item_kind):
+                errors.append(f"{name}: {item} must be {item_kind.__name__}")
+                return None
+        return value
+
+    if kind is int and isinstance(value, str):
+        try:
+            value = int(value)
+        except ValueError:
+            pass
+    if not isinstance(value, kind):
+        errors.append(f"not a {kind.__name__} value for {name}: {value}")
+        return None
+
+    return value
+
+
+def check_values(values, errors):
     """
-    Check is tuple with given name is present in secrets.
+    Check the ranges of the values that passed the type checks.
     """
-    value = secrets.get(name)
-    if value is None and mandatory:
-        bail(f"{name} is missing")
-
-    if value and not isinstance(value, tuple):
-        bail(f"not a integer value for {name}: {value}")
-
-    if len(value) != numitems:
-        bail(f"tuple must have {numitems} items: {value}")
-
-
-def check_tunables():
+    brightness_range = values.get(BRIGHTNESS_RANGE)
+    if brightness_range:
+        # Brightness must be between 0.0 and 1.0, where 0.0 is off, and 1.0 is max.
+        for value in brightness_range:
+            if value < 0 or value > 1:
+                errors.append(f"{BRIGHTNESS_RANGE}: {value} must be between 0 and 1")
+        if brightness_range[0] > brightness_range[1]:
+            errors.append(f"{BRIGHTNESS_RANGE} must be ascending: {brightness_range}")
+
+    brightness_lut = values.get(BRIGHTNESS_LUT)
+    if brightness_lut:
+        if len(brightness_lut) < 2 or len(brightness_lut) > LUT_SIZE_MAX:
+            errors.append(
+                f"{BRIGHTNESS_LUT} must have between 2 and {LUT_SIZE_MAX} items"
+            )
+        for value in brightness_lut:
+            if value < 0 or value > 1:
+                errors.append(f"{BRIGHTNESS_LUT}: {value} must be between 0 and 1")
+
+    light_range = values.get(LIGHT_RANGE)
+    if light_range:
+        for value in light_range:
+            if value < 0:
+                errors.append(f"{LIGHT_RANGE}: {value} must be positive integer")
+        if light_range[0] >= light_range[1]:
+            errors.append(f"{LIGHT_RANGE} must be ascending: {light_range}")
+
+    hours_range = values.get(HOURS_RANGE)
+    if hours_range:
+        for value in hours_range:
+            if value < 0 or value > 24:
+                errors.append(
+                    f"{HOURS_RANGE}: {value} must be positive integer and less than 24"
+                )
+
+    # The MQTT connect waits for CONNACK for up to the receive timeout. It is done
+    # in its own step under the watchdog relaxed to 16 seconds, apart from the WiFi
+    # connect which takes up to 10 seconds.
+    recv_timeout = values.get(MQTT_RECV_TIMEOUT)
+    if recv_timeout is not None and (recv_timeout < 1 or recv_timeout > 10):
+        errors.append(f"{MQTT_RECV_TIMEOUT} must be between 1 and 10: {recv_timeout}")
+
+    keep_alive = values.get(MQTT_KEEP_ALIVE)
+    if keep_alive is not None and keep_alive <= 0:
+        errors.append(f"{MQTT_KEEP_ALIVE} must be positive: {keep_alive}")
+
+    light_gain = values.get(LIGHT_GAIN)
+    if light_gain is not None and light_gain not in (1, 2):
+        errors.append(f"invalid {LIGHT_GAIN} value: {light_gain}")
+
+    telemetry_format = values.get(TELEMETRY_FORMAT)
+    if telemetry_format is not None and telemetry_format not in FORMATS:
+        errors.append(
+            f"{TELEMETRY_FORMAT} must be one of {FORMATS}: {telemetry_format}"
+        )
+
+
+# pylint: disable=too-many-instance-attributes,too-few-public-methods
+class Config:
     """
-    Check that mandatory tunables are present and of correct type.
-    Will exit the program on error.
+    Immutable configuration object. Besides the tunables it holds constants
+    derived from them so that these do not have to be computed in the main loop.
     """
-    check_string(LOG_LEVEL)
-    check_string(SSID)
-    check_string(PASSWORD)
-    check_string(BROKER)
-    check_string(MQTT_TOPIC)
 
-    check_int(BROKER_PORT)
-
-    check_tuple(BRIGHTNESS_RANGE)
-    check_tuple(LIGHT_RANGE)
-    check_int(LIGHT_GAIN, mandatory=False)
-    check_tuple(HOURS_RANGE)
+    __slots__ = tuple(entry[0] for entry in SCHEMA) + (
+        "light_min",
+        "light_max",
+        "brightness_min",
+        "brightness_max",
+        "lut",
+        "lut_scale",
+        "_frozen",
+    )
 
-    # Brightness must be a float or integer between 0.0 and 1.0, where 0.0 is off, and 1.0 is max.
-    for value in secrets.get(BRIGHTNESS_RANGE):
+    def __init__(self, values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+        self.light_min, self.light_max = self.light_range
+        self.brightness_min, self.brightness_max = self.brightness_range
+        # The lookup table maps evenly spaced points of the light range
+        # to brightness. Without the table the light range is mapped
+        # to the brightness range linearly, inverted.
+        if self.brightness_lut:
+            self.lut = self.brightness_lut
+        else:
+            self.lut = (self.brightness_max, self.brightness_min)
+        self.lut_scale = (len(self.lut) - 1) / (self.light_max - self.light_min)
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"configuration is read-only: {name}")
+        object.__setattr__(self, name, value)
+
+
+def load_config():
+    """
+    Check that mandatory tunables are present and of correct type
+    and compile them into Config object.
+    All the errors are reported at once via SecretsException.
+    """
+    values = {}
+    errors = []
+    for name, kind, item_kind, mandatory, default in SCHEMA:
+        value = lookup(name)
         if value is None:
-            bail(f"{BRIGHTNESS_RANGE} value is None")
-        if not isinstance(value, float):
-            bail(f"{value} must be float")
-        if value > 1:
-            bail(f"{value} must be smaller than 1")
+            if mandatory:
+                errors.append(f"{name} is missing")
+            values[name] = default
+            continue
 
-    for value in secrets.get(LIGHT_RANGE):
-        if value is None:
-            bail(f"{LIGHT_RANGE} value is None")
-        if not isinstance(value, int):
-            bail(f"{value} must be int")
-        if value < 0:
-            bail(f"{value} must be positive integer")
+        values[name] = convert(name, value, kind, item_kind, errors)
 
-    for value in secrets.get(HOURS_RANGE):
-        if value is None:
-            bail(f"{HOURS_RANGE} value is None")
-        if not isinstance(value, int):
-            bail(f"{value} must be int")
-        if value < 0 or value > 24:
-            bail(f"{value} must be positive integer and less than 24")
+    check_values(values, errors)
+    if errors:
+        bail(", ".join(errors))
+
+    return Config(values)
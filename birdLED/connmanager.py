@@ -0,0 +1,195 @@
+"""
+WiFi/MQTT connection management with backoff
+"""
+
+import random
+import time
+
+from adafruit_minimqtt.adafruit_minimqtt import MMQTTException
+
+from logutil import get_logger
+
+STATE_DISCONNECTED = "disconnected"
+STATE_WIFI = "wifi"
+STATE_CONNECTED = "connected"
+
+# How long (in seconds) the WiFi connect can block.
+WIFI_CONNECT_TIMEOUT = 10
+
+
+# pylint: disable=too-many-instance-attributes
+class ConnectionManager:
+    """
+    State machine that brings up the WiFi connection and then the MQTT session.
+    Failed attempts are retried with jittered exponential backoff.
+    The socket pool and SSL context are created once (together with the MQTT client)
+    and reused across the reconnects. Only after too many consecutive failures
+    of the WiFi ConnectionError is raised so that the caller can perform hard reset
+    of the radio as the last resort. The MQTT connects are retried indefinitely
+    while the WiFi link is up as resetting does not help with the broker being down.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        radio,
+        ssid,
+        password,
+        mqtt_client,
+        rssi_min=-90,
+        backoff_base=1,
+        backoff_max=300,
+        max_failures=20,
+        monotonic=time.monotonic,
+    ):
+        """
+        :param radio: wifi.radio like object
+        :param ssid: WiFi SSID
+        :param password: WiFi password
+        :param mqtt_client: MQTT client using socket pool created for the radio
+        :param rssi_min: signal strength (in dBm) below which the WiFi is reconnected
+        :param backoff_base: initial backoff time in seconds
+        :param backoff_max: maximum backoff time in seconds
+        :param max_failures: number of consecutive WiFi failures after which
+        ConnectionError is raised
+        :param monotonic: clock function returning seconds
+        """
+        self.radio = radio
+        self.ssid = ssid
+        self.password = password
+        self.mqtt_client = mqtt_client
+        self.rssi_min = rssi_min
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_failures = max_failures
+        self._monotonic = monotonic
+        self.state = STATE_DISCONNECTED
+        self.failures = 0
+        self.wifi_failures = 0
+        self._next_attempt = 0
+        self._mqtt_connected_before = False
+
+    @property
+    def connected(self):
+        """
+        :return: whether the MQTT session is up
+        """
+        return self.state == STATE_CONNECTED
+
+    def delay(self):
+        """
+        :return: the time in seconds until the next connection attempt
+        """
+        return max(0, self._next_attempt - self._monotonic())
+
+    def _link_ok(self):
+        if not self.radio.connected:
+            return False
+
+        ap_info = self.radio.ap_info
+        return ap_info is None or ap_info.rssi >= self.rssi_min
+
+    def _failed(self, exc, wifi_failed):
+        logger = get_logger(__name__)
+
+        self.failures += 1
+        if wifi_failed:
+            self.wifi_failures += 1
+            if self.wifi_failures >= self.max_failures:
+                raise ConnectionError(
+                    f"giving up after {self.wifi_failures} failed WiFi attempts: {exc}"
+                )
+
+        # Full jitter spreads the attempts of multiple devices.
+        backoff = min(self.backoff_max, self.backoff_base * 2**self.failures)
+        backoff *= random.random()
+        self._next_attempt = self._monotonic() + backoff
+        logger.warning(
+            "connection attempt %d failed in state %s: %s, retrying in %d seconds",
+            self.failures,
+            self.state,
+            exc,
+            backoff,
+        )
+
+    def step(self):
+        """
+        Make one connection attempt if due. The WiFi connect and the MQTT connect
+        are done in separate steps, so the call blocks for the duration
+        of either the WiFi connect timeout or the MQTT connect timeout,
+        never for their sum. The MQTT connect is due right after the WiFi
+        is connected.
+        :return: whether the MQTT session is up
+        """
+        logger = get_logger(__name__)
+
+        if self.state == STATE_CONNECTED or self._monotonic() < self._next_attempt:
+            return self.connected
+
+        if self.state == STATE_DISCONNECTED:
+            self.state = STATE_WIFI
+            if not self._link_ok():
+                logger.info("Connecting to wifi %s", self.ssid)
+                try:
+                    self.radio.connect(
+                        self.ssid, self.password, timeout=WIFI_CONNECT_TIMEOUT
+                    )
+                except ConnectionError as wifi_exc:
+                    self.state = STATE_DISCONNECTED
+                    self._failed(wifi_exc, True)
+                    return False
+                logger.info("Connected to %s", self.ssid)
+                self.wifi_failures = 0
+                return False
+
+        logger.info("Connecting to MQTT broker")
+        try:
+            if self._mqtt_connected_before:
+                self.mqtt_client.reconnect()
+            else:
+                self.mqtt_client.connect()
+        except (OSError, MMQTTException) as mqtt_exc:
+            link_lost = not self._link_ok()
+            if link_lost:
+                self.state = STATE_DISCONNECTED
+            self._failed(mqtt_exc, link_lost)
+            return False
+
+        self._mqtt_connected_before = True
+        self.state = STATE_CONNECTED
+        self.failures = 0
+        return True
+
+    def check_link(self):
+        """
+        Check the WiFi link quality. If the link is down or the signal is too weak,
+        reconnect.
+        """
+        if self.state != STATE_DISCONNECTED and not self._link_ok():
+            self.lost("WiFi link down or too weak")
+            self.state = STATE_DISCONNECTED
+
+    def lost(self, reason):
+        """
+        Mark the MQTT session as lost, e.g. after failed publish.
+        """
+        logger = get_logger(__name__)
+
+        if self.state == STATE_CONNECTED:
+            logger.warning("connection lost: %s", reason)
+            self.state = STATE_WIFI
+
+    def disconnect(self):
+        """
+        Disconnect from the MQTT broker, e.g. before sleep.
+        The connection is reestablished on the next step().
+        """
+        logger = get_logger(__name__)
+
+        if self.state == STATE_CONNECTED:
+            try:
+                self.mqtt_client.disconnect()
+            except (OSError, MMQTTException) as disconnect_exc:
+                logger.warning("failed to disconnect: %s", disconnect_exc)
+        self.state = STATE_DISCONNECTED
+        self._next_attempt = 0
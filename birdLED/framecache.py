@@ -0,0 +1,68 @@
+"""
+pixel frames ready to be written to Neopixel strip
+"""
+
+
+# pylint: disable=too-many-instance-attributes
+class FrameCache:
+    """
+    Frames, i.e. byte buffers for all the pixels of the strip filled with single
+    color scaled to given brightness level and gamma corrected.
+    The brightness is quantized into fixed number of levels. The pixel values
+    of all the levels are precomputed into flat table (3 bytes per level)
+    and the frame is assembled in single preallocated buffer by copying
+    the pixel from the table, so getting a frame does not involve any math
+    nor allocate new buffers. Keeping the table per pixel rather than per frame
+    makes it independent of the strip length.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, color, num_pixels, levels=256, gamma=1.0, order=(1, 0, 2)):
+        """
+        :param color: RGB tuple
+        :param num_pixels: number of pixels in the strip
+        :param levels: number of brightness levels
+        :param gamma: gamma correction exponent applied to the brightness
+        :param order: indexes of the RGB components in the pixel, GRB by default
+        """
+        self.color = color
+        self.num_pixels = num_pixels
+        self.levels = levels
+        self.order = order
+        self._table = bytearray(3 * levels)
+        for level in range(levels):
+            scale = int(255 * (level / (levels - 1)) ** gamma + 0.5)
+            for i, component in enumerate(order):
+                self._table[3 * level + i] = (color[component] * scale + 127) // 255
+        self._pixels = memoryview(self._table)
+        self._frame = bytearray(3 * num_pixels)
+        self._view = memoryview(self._frame)
+        self._level = None
+
+    def level(self, brightness):
+        """
+        :param brightness: value between 0.0 and 1.0
+        :return: the brightness quantized to a level
+        """
+        return min(self.levels - 1, max(0, int(brightness * (self.levels - 1) + 0.5)))
+
+    def get(self, level):
+        """
+        :param level: brightness level
+        :return: the frame for given brightness level. The buffer is reused,
+        so it is valid only until the next call.
+        """
+        if level == self._level:
+            return self._frame
+
+        view = self._view
+        view[0:3] = self._pixels[3 * level : 3 * level + 3]
+        # Double the filled part until the whole frame is covered.
+        filled = 3
+        size = len(self._frame)
+        while filled < size:
+            count = min(filled, size - filled)
+            view[filled : filled + count] = view[0:count]
+            filled += count
+        self._level = level
+        return self._frame
@@ -23,8 +23,15 @@ logging utilities
 
 """
 
+import struct
+
 import adafruit_logging as logging
 
+# header of the log tail stored in non-volatile memory: magic and length
+TAIL_MAGIC = b"LT"
+TAIL_HEADER_LAYOUT = "<2sH"
+TAIL_HEADER_SIZE = struct.calcsize(TAIL_HEADER_LAYOUT)
+
 
 def get_log_level(level):
     """
@@ -49,3 +56,213 @@ def get_log_level(level):
         return None
     except AttributeError:
         return None
+
+
+class LazyLogger:
+    """
+    Facade of adafruit_logging Logger that checks the level before
+    the message is formatted. The message should be passed as a format
+    string with arguments (e.g. logger.debug("light: %s", light)) so that
+    disabled messages cost just a comparison rather than formatting.
+    """
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.level = logger.getEffectiveLevel()
+        self._handlers = []
+
+    def setLevel(self, level):  # pylint: disable=invalid-name
+        """
+        Set the level of the underlying logger.
+        """
+        self.logger.setLevel(level)
+        self.level = self.logger.getEffectiveLevel()
+
+    def isEnabledFor(self, level):  # pylint: disable=invalid-name
+        """
+        :return: whether message with given level would be logged
+        """
+        return level >= self.level
+
+    def addHandler(self, handler):  # pylint: disable=invalid-name
+        """
+        Add handler to the underlying logger, unless it was already added.
+        """
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+            self.logger.addHandler(handler)
+
+    def debug(self, msg, *args):
+        """
+        log debug message
+        """
+        if self.level <= logging.DEBUG:
+            self.logger.debug(msg, *args)
+
+    def info(self, msg, *args):
+        """
+        log info message
+        """
+        if self.level <= logging.INFO:
+            self.logger.info(msg, *args)
+
+    def warning(self, msg, *args):
+        """
+        log warning message
+        """
+        if self.level <= logging.WARNING:
+            self.logger.warning(msg, *args)
+
+    def error(self, msg, *args):
+        """
+        log error message
+        """
+        if self.level <= logging.ERROR:
+            self.logger.error(msg, *args)
+
+
+_loggers = {}
+# The level and handlers set by configure(), applied to all the loggers.
+_settings = {"level": None, "handlers": ()}
+
+
+def _apply_settings(logger):
+    if _settings["level"] is not None:
+        logger.setLevel(_settings["level"])
+    for handler in _settings["handlers"]:
+        logger.addHandler(handler)
+
+
+def configure(level, *handlers):
+    """
+    Set the level and add the handlers to all the loggers returned
+    by get_logger(), including the ones created later. The adafruit_logging
+    loggers do not propagate the records to a parent, so this is the way
+    to have the records of all the modules e.g. in the ring buffer.
+    """
+    _settings["level"] = level
+    _settings["handlers"] = handlers
+    for logger in _loggers.values():
+        _apply_settings(logger)
+
+
+def get_logger(name):
+    """
+    :return: LazyLogger for given name. The same object is returned
+    for the same name so that the level is shared.
+    """
+    logger = _loggers.get(name)
+    if logger is None:
+        logger = LazyLogger(logging.getLogger(name))
+        _apply_settings(logger)
+        _loggers[name] = logger
+    return logger
+
+
+class RingBufferHandler(logging.Handler):
+    """
+    Keep last N formatted log records in memory.
+    The records can be dumped e.g. on crash to provide post-mortem context.
+    """
+
+    def __init__(self, capacity=32, level=logging.NOTSET):
+        super().__init__(level)
+        self._records = [None] * capacity
+        self._index = 0
+        self._count = 0
+
+    def emit(self, record):
+        """
+        store the formatted record, overwriting the oldest one if full
+        """
+        self._records[self._index] = self.format(record)
+        self._index = (self._index + 1) % len(self._records)
+        self._count = min(self._count + 1, len(self._records))
+
+    def records(self):
+        """
+        :return: list of the stored records, oldest first
+        """
+        capacity = len(self._records)
+        start = (self._index - self._count) % capacity
+        return [self._records[(start + i) % capacity] for i in range(self._count)]
+
+    def save(self, nvm, offset, size):
+        """
+        Store the newest records that fit into an area of non-volatile memory
+        (e.g. microcontroller.nvm) so that they survive the reset.
+        Unlike a file, this works without remounting the filesystem.
+        The records are stored as UTF-8 text preceded by a header
+        with magic and the text length. Use load_tail() to read them back.
+        :param nvm: bytearray like object
+        :param offset: offset of the area in the NVM
+        :param size: size of the area in bytes
+        """
+        space = size - TAIL_HEADER_SIZE
+        tail = []
+        for record in reversed(self.records()):
+            data = record.encode("utf-8")
+            if len(data) + 1 > space:
+                if not tail:
+                    # Keep at least the beginning of the newest record.
+                    record = record[:space]
+                    while len(record.encode("utf-8")) > space:
+                        record = record[:-1]
+                    tail.append(record.encode("utf-8"))
+                break
+            tail.append(data)
+            space -= len(data) + 1
+        tail.reverse()
+
+        data = b"\n".join(tail)
+        nvm[offset : offset + TAIL_HEADER_SIZE + len(data)] = (
+            struct.pack(TAIL_HEADER_LAYOUT, TAIL_MAGIC, len(data)) + data
+        )
+
+    def dump(self, file_name=None):
+        """
+        Write the records to the file. This works only if the filesystem
+        is writable by CircuitPython (i.e. remounted in boot.py).
+        If the file cannot be written (or the file name is not specified),
+        print the records to the console instead.
+        """
+        records = self.records()
+        if file_name is not None:
+            try:
+                with open(file_name, "w", encoding="utf-8") as file_obj:
+                    for record in records:
+                        file_obj.write(f"{record}\n")
+                return
+            except OSError as os_error:
+                print(f"cannot write log records to {file_name}: {os_error}")
+
+        for record in records:
+            print(record)
+
+
+def load_tail(nvm, offset, size):
+    """
+    :param nvm: bytearray like object
+    :param offset: offset of the area in the NVM
+    :param size: size of the area in bytes
+    :return: list of the records stored by RingBufferHandler.save(), oldest first,
+    empty if there are none
+    """
+    magic, length = struct.unpack(
+        TAIL_HEADER_LAYOUT, nvm[offset : offset + TAIL_HEADER_SIZE]
+    )
+    if magic != TAIL_MAGIC or length == 0 or length > size - TAIL_HEADER_SIZE:
+        return []
+
+    start = offset + TAIL_HEADER_SIZE
+    try:
+        return nvm[start : start + length].decode("utf-8").split("\n")
+    except UnicodeError:
+        return []
+
+
+def clear_tail(nvm, offset):
+    """
+    Mark the records stored in the NVM as consumed.
+    """
+    nvm[offset : offset + TAIL_HEADER_SIZE] = bytes(TAIL_HEADER_SIZE)
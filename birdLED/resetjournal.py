@@ -0,0 +1,137 @@
+"""
+journal of resets stored in non-volatile memory
+
+The journal is a ring buffer of fixed size entries preceded by a header:
+
+  - magic (2 bytes)
+  - version (unsigned char)
+  - index of the next entry to write (unsigned char)
+  - number of valid entries (unsigned char)
+  - number of consecutive failures (unsigned char)
+
+Each entry consists of the reason code (unsigned char), uptime in seconds
+(unsigned int) and the name of the exception class or safe mode reason
+(truncated to 11 bytes).
+"""
+
+import struct
+
+MAGIC = b"RJ"
+VERSION = 1
+HEADER_LAYOUT = "<2sBBBB"
+HEADER_SIZE = struct.calcsize(HEADER_LAYOUT)
+ENTRY_LAYOUT = "<BI11s"
+ENTRY_SIZE = struct.calcsize(ENTRY_LAYOUT)
+SLOTS = 8
+# Size of the NVM area occupied by the journal.
+JOURNAL_SIZE = HEADER_SIZE + SLOTS * ENTRY_SIZE
+
+REASON_SAFEMODE = 1
+REASON_WATCHDOG = 2
+REASON_CONNECTION = 3
+REASON_MEMORY = 4
+REASON_EXCEPTION = 5
+
+REASON_NAMES = {
+    REASON_SAFEMODE: "safemode",
+    REASON_WATCHDOG: "watchdog",
+    REASON_CONNECTION: "connection",
+    REASON_MEMORY: "memory",
+    REASON_EXCEPTION: "exception",
+}
+
+
+def encode_entry(reason, uptime, name):
+    """
+    :return: the entry encoded as bytes
+    """
+    return struct.pack(
+        ENTRY_LAYOUT,
+        reason,
+        min(max(int(uptime), 0), 0xFFFFFFFF),
+        name.encode("utf-8")[:11],
+    )
+
+
+def decode_entry(data):
+    """
+    :return: tuple of reason, uptime and name
+    """
+    reason, uptime, name = struct.unpack(ENTRY_LAYOUT, data)
+    return reason, uptime, name.rstrip(b"\x00").decode("utf-8")
+
+
+class ResetJournal:
+    """
+    Journal of resets kept in non-volatile memory (e.g. microcontroller.nvm).
+    Only the changed bytes are written to limit the wear.
+    """
+
+    def __init__(self, nvm, offset=0):
+        """
+        :param nvm: bytearray like object
+        :param offset: offset of the journal in the NVM
+        """
+        self._nvm = nvm
+        self._offset = offset
+        magic, version, self._head, self._count, self.failures = struct.unpack(
+            HEADER_LAYOUT, nvm[offset : offset + HEADER_SIZE]
+        )
+        if (
+            magic != MAGIC
+            or version != VERSION
+            or self._head >= SLOTS
+            or self._count > SLOTS
+        ):
+            # Uninitialized or corrupted journal.
+            self._head = 0
+            self._count = 0
+            self.failures = 0
+            self._write_header()
+
+    def _write_header(self):
+        self._nvm[self._offset : self._offset + HEADER_SIZE] = struct.pack(
+            HEADER_LAYOUT, MAGIC, VERSION, self._head, self._count, self.failures
+        )
+
+    def record(self, reason, uptime, name=""):
+        """
+        Record a reset and increment the number of consecutive failures.
+        :param reason: one of the REASON_* values
+        :param uptime: uptime in seconds
+        :param name: name of the exception class or safe mode reason
+        """
+        start = self._offset + HEADER_SIZE + self._head * ENTRY_SIZE
+        self._nvm[start : start + ENTRY_SIZE] = encode_entry(reason, uptime, name)
+        self._head = (self._head + 1) % SLOTS
+        self._count = min(self._count + 1, SLOTS)
+        self.failures = min(self.failures + 1, 255)
+        self._write_header()
+
+    def entries(self):
+        """
+        :return: list of the entries (tuples of reason, uptime and name), oldest first
+        """
+        result = []
+        first = (self._head - self._count) % SLOTS
+        for i in range(self._count):
+            start = self._offset + HEADER_SIZE + ((first + i) % SLOTS) * ENTRY_SIZE
+            result.append(decode_entry(self._nvm[start : start + ENTRY_SIZE]))
+        return result
+
+    def clear_failures(self):
+        """
+        Reset the number of consecutive failures, e.g. after successful start.
+        """
+        if self.failures:
+            self.failures = 0
+            self._write_header()
+
+    def backoff(self, base=2, maximum=600):
+        """
+        :return: the time in seconds to wait before retrying, exponentially
+        increasing with the number of consecutive failures, 0 if there are none.
+        """
+        if self.failures == 0:
+            return 0
+        return min(base * 2 ** min(self.failures - 1, 16), maximum)
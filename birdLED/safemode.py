@@ -1,38 +1,21 @@
 """
-safe mode handling with storing the reason to a file
+safe mode handling with recording the reason to the reset journal in NVM
 """
 
-import json
 import time
 
 import microcontroller
 
-# pylint: disable=import-error
-import storage
-
 # pylint: disable=import-error
 import supervisor
 
+from resetjournal import REASON_SAFEMODE, ResetJournal
 
-def precode_file_write(file, data):
-    """
-    remount storage for writing here, write the data, remount for writing elsewhere
-    """
-    storage.remount("/", False)  # writeable by CircuitPython
-    with open(file, "w", encoding="utf-8") as file_obj:
-        file_obj.write(f"{data}\n")
-        file_obj.flush()
-    storage.remount("/", True)  # writeable by USB host
-
-
-# set up the safemode dict
-safemode_dict = {}
-safemode_dict["safemode_reason"] = str(supervisor.runtime.safe_mode_reason)
-safemode_dict["safemode_time"] = time.monotonic()
-safemode_dict["safemode_time_ns"] = time.monotonic_ns()
-
-# write dict as JSON. This will overwrite any pre-existing file.
-precode_file_write("/safemode.json", json.dumps(safemode_dict))  # use storage.remount()
+# Recording to NVM avoids remounting the filesystem and keeps the history
+# of the resets rather than just the last one.
+safemode_reason = str(supervisor.runtime.safe_mode_reason).rsplit(".", 1)[-1]
+journal = ResetJournal(microcontroller.nvm)  # pylint: disable=no-member
+journal.record(REASON_SAFEMODE, time.monotonic(), safemode_reason)
 
 if False:  # check for any safemode conditions where we shouldn't RESET
     # Do nothing. The safe mode reason will be printed in the console,
@@ -0,0 +1,59 @@
+"""
+scheduling of the active hours
+"""
+
+SECONDS_PER_DAY = 24 * 3600
+
+
+def seconds_until_active(seconds_of_day, hours_range):
+    """
+    :param seconds_of_day: local time as number of seconds since midnight
+    :param hours_range: tuple of the start and end hour of the active window.
+    If the start is greater than the end, the window spans midnight.
+    If they are the same, the window covers the whole day.
+    :return: number of seconds until the start of the active window,
+    0 if within the window
+    """
+    start, end = hours_range
+    if start == end:
+        return 0
+
+    start *= 3600
+    end *= 3600
+    if start < end:
+        active = start <= seconds_of_day < end
+    else:
+        active = seconds_of_day >= start or seconds_of_day < end
+
+    if active:
+        return 0
+
+    return (start - seconds_of_day) % SECONDS_PER_DAY
+
+
+class Scheduler:
+    """
+    Decide whether the device should be active based on the local time.
+    """
+
+    def __init__(self, clock, hours_range):
+        """
+        :param clock: object with local_seconds() method returning local time
+        in seconds since the epoch or None if the time is not known,
+        e.g. timeutil.Clock
+        :param hours_range: tuple of the start and end hour of the active window
+        """
+        self.clock = clock
+        self.hours_range = hours_range
+
+    def sleep_duration(self):
+        """
+        :return: number of seconds to sleep until the start of the active window,
+        0 if the device should be active. If the time is not known,
+        the device stays active.
+        """
+        seconds = self.clock.local_seconds()
+        if seconds is None:
+            return 0
+
+        return seconds_until_active(seconds % SECONDS_PER_DAY, self.hours_range)
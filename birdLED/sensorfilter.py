@@ -0,0 +1,115 @@
+"""
+streaming sensor value filtering, adaptive sampling and report-by-exception
+"""
+
+
+class LightFilter:
+    """
+    Median of last 3 values followed by exponential moving average.
+    The median removes single sample spikes (flicker), the average smooths the rest.
+    """
+
+    def __init__(self, alpha=0.3):
+        """
+        :param alpha: smoothing factor of the moving average, between 0 and 1
+        """
+        self.alpha = alpha
+        self._window = [None, None, None]
+        self._index = 0
+        self.value = None
+
+    def update(self, sample):
+        """
+        :param sample: raw value
+        :return: filtered value
+        """
+        window = self._window
+        window[self._index] = sample
+        self._index = (self._index + 1) % 3
+
+        if window[2] is None:
+            # Not enough samples for median yet.
+            median = sample
+        else:
+            low, mid, high = window
+            if low > mid:
+                low, mid = mid, low
+            if mid > high:
+                mid = high
+            median = max(low, mid)
+
+        if self.value is None:
+            self.value = median
+        else:
+            self.value += self.alpha * (median - self.value)
+
+        return self.value
+
+
+class AdaptivePeriod:
+    """
+    Sampling period that backs off exponentially while the value is stable
+    and drops back to the minimum once it changes.
+    """
+
+    def __init__(self, min_period, max_period, threshold):
+        """
+        :param min_period: shortest period in seconds
+        :param max_period: longest period in seconds
+        :param threshold: relative change considered significant
+        """
+        self.min_period = min_period
+        self.max_period = max_period
+        self.threshold = threshold
+        self.period = min_period
+        self._last = None
+
+    def update(self, value):
+        """
+        :param value: current (filtered) value
+        :return: the period to wait before taking next sample
+        """
+        if self._last is not None and abs(value - self._last) > self.threshold * max(
+            abs(self._last), 1
+        ):
+            self.period = self.min_period
+        else:
+            self.period = min(self.period * 2, self.max_period)
+
+        self._last = value
+        return self.period
+
+
+class Deadband:
+    """
+    Report by exception: tell whether a value should be reported because
+    it moved by more than the deadband since last report or because
+    the maximum silence interval elapsed.
+    """
+
+    def __init__(self, deadband, max_silence):
+        """
+        :param deadband: minimal absolute change of the value to report
+        :param max_silence: maximum interval between reports, in seconds
+        """
+        self.deadband = deadband
+        self.max_silence = max_silence
+        self._value = None
+        self._stamp = None
+
+    def check(self, value, now):
+        """
+        :param value: current value
+        :param now: current time in seconds
+        :return: True if the value should be reported
+        """
+        if (
+            self._value is None
+            or abs(value - self._value) > self.deadband
+            or now - self._stamp >= self.max_silence
+        ):
+            self._value = value
+            self._stamp = now
+            return True
+
+        return False
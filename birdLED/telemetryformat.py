@@ -0,0 +1,131 @@
+"""
+telemetry record encoding and decoding
+
+The records can be encoded either as JSON or as fixed layout binary records
+packed with the struct module. The binary layout (little endian) is:
+
+  - schema version (unsigned char)
+  - flags (unsigned char), bit 0 set if light is present, bit 1 if lux is present,
+    bit 2 if timestamp is present
+  - light (unsigned short)
+  - lux (float)
+  - brightness_max (float)
+  - cpu_temp (float)
+  - timestamp (unsigned int), seconds since the epoch (UTC) of the sample
+
+The decode() function works with both formats and can be used on the host.
+It also decodes the records of schema version 1 which lack the timestamp.
+"""
+
+import json
+import struct
+
+FORMAT_JSON = "json"
+FORMAT_STRUCT = "struct"
+FORMATS = (FORMAT_JSON, FORMAT_STRUCT)
+
+SCHEMA_VERSION = 2
+STRUCT_LAYOUT = "<BBHfffI"
+STRUCT_SIZE = struct.calcsize(STRUCT_LAYOUT)
+# layouts of all the supported schema versions
+STRUCT_LAYOUTS = {1: "<BBHfff", SCHEMA_VERSION: STRUCT_LAYOUT}
+
+FLAG_LIGHT = 0x01
+FLAG_LUX = 0x02
+FLAG_TIMESTAMP = 0x04
+
+
+class Encoder:
+    """
+    Encode telemetry records in given format.
+    For the binary format the records are encoded into preallocated buffer
+    which is reused for subsequent records.
+    """
+
+    def __init__(self, fmt=FORMAT_JSON):
+        if fmt not in FORMATS:
+            raise ValueError(f"unknown telemetry format: {fmt}")
+
+        self.format = fmt
+        self._buffer = None
+        if fmt == FORMAT_STRUCT:
+            self._buffer = bytearray(STRUCT_SIZE)
+
+    # pylint: disable=too-many-arguments
+    def encode(self, light, lux, brightness_max, cpu_temp, timestamp=None):
+        """
+        :param timestamp: time of the sample as seconds since the epoch or None
+        if not known
+        :return: encoded record, either as string (JSON) or bytearray.
+        The bytearray is overwritten by the next call.
+        """
+        if self._buffer is None:
+            data = {}
+            if light is not None:
+                data["light"] = light
+            if lux is not None:
+                data["lux"] = lux
+            data["brightness_max"] = brightness_max
+            data["cpu_temp"] = cpu_temp
+            if timestamp is not None:
+                data["timestamp"] = timestamp
+            return json.dumps(data)
+
+        flags = 0
+        if light is not None:
+            flags |= FLAG_LIGHT
+        else:
+            light = 0
+        if lux is not None:
+            flags |= FLAG_LUX
+        else:
+            lux = 0
+        if timestamp is not None:
+            flags |= FLAG_TIMESTAMP
+        else:
+            timestamp = 0
+        struct.pack_into(
+            STRUCT_LAYOUT,
+            self._buffer,
+            0,
+            SCHEMA_VERSION,
+            flags,
+            light,
+            lux,
+            brightness_max,
+            cpu_temp,
+            timestamp,
+        )
+        return self._buffer
+
+
+def decode(payload):
+    """
+    Decode record in either format.
+    :param payload: string or bytes
+    :return: dictionary with the values
+    """
+    if isinstance(payload, str):
+        return json.loads(payload)
+
+    if payload[:1] == b"{":
+        return json.loads(payload.decode("utf-8"))
+
+    layout = STRUCT_LAYOUTS.get(payload[0])
+    if layout is None:
+        raise ValueError(f"unsupported schema version: {payload[0]}")
+    if len(payload) != struct.calcsize(layout):
+        raise ValueError(f"invalid record size: {len(payload)}")
+
+    values = struct.unpack(layout, payload)
+    _, flags, light, lux, brightness_max, cpu_temp = values[:6]
+    data = {}
+    if flags & FLAG_LIGHT:
+        data["light"] = light
+    if flags & FLAG_LUX:
+        data["lux"] = lux
+    data["brightness_max"] = brightness_max
+    data["cpu_temp"] = cpu_temp
+    if flags & FLAG_TIMESTAMP:
+        data["timestamp"] = values[6]
+    return data
@@ -0,0 +1,71 @@
+"""
+bounded store-and-forward queue for telemetry records
+"""
+
+
+class TelemetryQueue:
+    """
+    FIFO of encoded telemetry records constrained by a fixed byte budget.
+    When the budget is exceeded, the oldest records are evicted first.
+    The counters of dropped and replayed records are kept for reporting.
+    """
+
+    def __init__(self, max_bytes):
+        """
+        :param max_bytes: maximum total size of the records in the queue
+        """
+        self.max_bytes = max_bytes
+        self._records = []
+        self._size = 0
+        self.dropped = 0
+        self.replayed = 0
+
+    def __len__(self):
+        return len(self._records)
+
+    @property
+    def size(self):
+        """
+        :return: total size of the queued records in bytes
+        """
+        return self._size
+
+    def put(self, record):
+        """
+        Append the record to the queue, evicting the oldest records
+        if the byte budget would be exceeded. Mutable buffers are copied.
+        """
+        if isinstance(record, bytearray):
+            record = bytes(record)
+
+        if len(record) > self.max_bytes:
+            self.dropped += 1
+            return
+
+        self._records.append(record)
+        self._size += len(record)
+        while self._size > self.max_bytes:
+            self._size -= len(self._records.pop(0))
+            self.dropped += 1
+
+    def drain(self, publish, batch_size):
+        """
+        Publish up to batch_size records, oldest first.
+        A record is removed from the queue only after it was published,
+        so if the publish function raises, the record stays queued
+        and the exception propagates to the caller.
+
+        :param publish: function accepting single record
+        :param batch_size: maximum number of records to publish
+        :return: number of records published
+        """
+        count = 0
+        while self._records and count < batch_size:
+            record = self._records[0]
+            publish(record)
+            self._records.pop(0)
+            self._size -= len(record)
+            self.replayed += 1
+            count += 1
+
+        return count
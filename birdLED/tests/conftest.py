@@ -0,0 +1,131 @@
+"""
+host test setup: the modules of the project are imported from its directory
+and the CircuitPython modules are replaced with fakes
+"""
+
+import importlib.util
+import os
+import sys
+import time
+import types
+
+import pytest
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Appended rather than prepended as code.py would shadow the code module
+# of the standard library.
+sys.path.append(PROJECT_DIR)
+sys.path.append(os.path.join(PROJECT_DIR, "tools"))
+
+
+class FakeWatchdog:
+    """
+    Records the feeds and the longest gap between them while armed.
+    """
+
+    def __init__(self):
+        self.timeout = None
+        self._mode = None
+        self.feeds = 0
+        self.timeouts = []
+        self.starved = []
+        self._stamp = None
+
+    @property
+    def mode(self):
+        return self._mode
+
+    @mode.setter
+    def mode(self, mode):
+        self._mode = mode
+        if mode is not None:
+            self.timeouts.append(self.timeout)
+            self._stamp = time.monotonic()
+
+    def feed(self):
+        self.feeds += 1
+        self.check()
+        self._stamp = time.monotonic()
+
+    def check(self):
+        """
+        Record the gap since the last feed if it exceeds the timeout.
+        """
+        if self._mode is None or self._stamp is None:
+            return
+        gap = time.monotonic() - self._stamp
+        if gap > self.timeout:
+            self.starved.append((gap, self.timeout))
+
+
+class FakeStrip:
+    """
+    Stands for neopixel_write(), records the written frames.
+    """
+
+    def __init__(self):
+        self.frames = []
+
+    def __call__(self, pin, buf):
+        self.frames.append(buf)
+
+
+def _module(name, **attrs):
+    module = types.ModuleType(name)
+    module.__dict__.update(attrs)
+    return module
+
+
+@pytest.fixture
+def fake_watchdog():
+    return FakeWatchdog()
+
+
+@pytest.fixture
+def fake_modules(monkeypatch, fake_watchdog):
+    """
+    Install fakes of the CircuitPython modules imported by code.py.
+    """
+    watchdog_module = _module(
+        "watchdog",
+        WatchDogMode=types.SimpleNamespace(RAISE="raise", RESET="reset"),
+        WatchDogTimeout=type("WatchDogTimeout", (Exception,), {}),
+    )
+    microcontroller = _module(
+        "microcontroller",
+        nvm=bytearray(256),
+        watchdog=fake_watchdog,
+        cpu=types.SimpleNamespace(temperature=42.0),
+        reset=lambda: None,
+    )
+    modules = {
+        "alarm": _module("alarm"),
+        "board": _module("board", A3="A3", STEMMA_I2C=lambda: None),
+        "digitalio": _module("digitalio"),
+        "microcontroller": microcontroller,
+        "socketpool": _module("socketpool"),
+        "supervisor": _module("supervisor"),
+        "wifi": _module(
+            "wifi", radio=types.SimpleNamespace(enabled=True, ipv4_address="10.0.0.2")
+        ),
+        "watchdog": watchdog_module,
+        "neopixel_write": _module("neopixel_write", neopixel_write=FakeStrip()),
+        "adafruit_veml7700": _module("adafruit_veml7700"),
+        "adafruit_ntp": _module("adafruit_ntp"),
+    }
+    for name, module in modules.items():
+        monkeypatch.setitem(sys.modules, name, module)
+    return modules
+
+
+@pytest.fixture
+def birdled(fake_modules):
+    """
+    code.py loaded as module (the name "code" clashes with the standard library)
+    """
+    spec = importlib.util.spec_from_file_location(
+        "birdled_code", os.path.join(PROJECT_DIR, "code.py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,131 @@
+"""
+configuration schema validation
+"""
+
+import pytest
+
+import configutil
+from configutil import Config, SecretsException, load_config
+
+VALID = {
+    "log_level": "info",
+    "ssid": "ssid",
+    "password": "password",
+    "broker": "172.40.0.3",
+    "broker_port": 1883,
+    "mqtt_topic": "devices/test",
+    "brightness_range": (0.1, 0.9),
+    "light_range": (10, 50),
+    "hours_range": (9, 18),
+}
+
+
+@pytest.fixture
+def secrets(monkeypatch):
+    """
+    configuration in secrets.py, settings.toml is empty
+    """
+    values = dict(VALID)
+    monkeypatch.setattr(configutil, "secrets", values)
+    monkeypatch.setattr(configutil, "getenv", lambda name: None)
+    return values
+
+
+def test_valid(secrets):
+    config = load_config()
+
+    assert config.ssid == "ssid"
+    assert config.brightness_min == 0.1
+    assert config.brightness_max == 0.9
+    assert config.light_min == 10
+    assert config.light_max == 50
+    # defaults of the optional tunables
+    assert config.mqtt_keep_alive == 60
+    assert config.telemetry_format == "json"
+    assert config.light_gain is None
+    # without the lookup table the light range maps to inverted brightness range
+    assert config.lut == (0.9, 0.1)
+    assert config.lut_scale == 1 / 40
+
+
+def test_settings_toml(monkeypatch):
+    settings = {
+        name.upper(): (
+            ", ".join(str(item) for item in value)
+            if isinstance(value, tuple)
+            else value
+        )
+        for name, value in VALID.items()
+    }
+    settings["BROKER_PORT"] = "1883"
+    settings["BRIGHTNESS_LUT"] = "0.9, 0.5, 0.2"
+    monkeypatch.setattr(configutil, "secrets", {})
+    monkeypatch.setattr(configutil, "getenv", settings.get)
+
+    config = load_config()
+
+    assert config.broker_port == 1883
+    assert config.brightness_range == (0.1, 0.9)
+    assert config.hours_range == (9, 18)
+    assert config.lut == (0.9, 0.5, 0.2)
+    assert config.lut_scale == 2 / 40
+
+
+def test_secrets_take_precedence(monkeypatch, secrets):
+    monkeypatch.setattr(configutil, "getenv", {"SSID": "other"}.get)
+    assert load_config().ssid == "ssid"
+
+
+def test_all_errors_reported(secrets):
+    del secrets["ssid"]
+    secrets["broker_port"] = "port"
+    secrets["brightness_range"] = (1.5, 0.9)
+    secrets["light_range"] = (50, 10)
+    secrets["light_gain"] = 3
+
+    with pytest.raises(SecretsException) as exc_info:
+        load_config()
+
+    message = str(exc_info.value)
+    assert "ssid is missing" in message
+    assert "not a int value for broker_port" in message
+    assert "brightness_range: 1.5 must be between 0 and 1" in message
+    assert "brightness_range must be ascending" in message
+    assert "light_range must be ascending" in message
+    assert "invalid light_gain value: 3" in message
+
+
+@pytest.mark.parametrize(
+    "name, value, error",
+    [
+        ("brightness_range", (0.1,), "tuple must have 2 items"),
+        ("brightness_range", "0.1, x", "not a tuple of float"),
+        ("brightness_range", [0.1, 0.9], "not a tuple value"),
+        ("light_range", (10.0, 50.0), "must be int"),
+        ("hours_range", (9, 25), "must be positive integer and less than 24"),
+        ("brightness_lut", (0.5,), "must have between 2 and 64 items"),
+        ("brightness_lut", (0.5,) * 65, "must have between 2 and 64 items"),
+        ("brightness_lut", (0.5, 1.5), "1.5 must be between 0 and 1"),
+        ("mqtt_recv_timeout", 11, "must be between 1 and 10"),
+        ("mqtt_keep_alive", 0, "must be positive"),
+        ("telemetry_format", "cbor", "must be one of"),
+    ],
+)
+def test_invalid_value(secrets, name, value, error):
+    secrets[name] = value
+    with pytest.raises(SecretsException, match=error):
+        load_config()
+
+
+def test_config_read_only(secrets):
+    config = load_config()
+    with pytest.raises(AttributeError):
+        config.ssid = "other"
+    with pytest.raises(AttributeError):
+        config.unknown = 1
+
+
+def test_schema_covers_config():
+    names = [entry[0] for entry in configutil.SCHEMA]
+    assert len(names) == len(set(names))
+    assert set(names) <= set(Config.__slots__)
@@ -0,0 +1,134 @@
+"""
+WiFi/MQTT connection state machine
+"""
+
+import types
+
+import adafruit_logging as logging
+import pytest
+from adafruit_minimqtt.adafruit_minimqtt import MMQTTException
+
+import logutil
+from connmanager import WIFI_CONNECT_TIMEOUT, ConnectionManager
+from logutil import configure
+
+
+class FakeRadio:
+    def __init__(self, fail=False):
+        self.connected = False
+        self.ap_info = None
+        self.fail = fail
+        self.timeouts = []
+
+    def connect(self, ssid, password, timeout):
+        self.timeouts.append(timeout)
+        if self.fail:
+            raise ConnectionError("No network with that ssid")
+        self.connected = True
+
+
+class FakeMQTTClient:
+    def __init__(self, fail=False):
+        self.fail = fail
+        self.connects = 0
+
+    def connect(self):
+        self.connects += 1
+        if self.fail:
+            raise MMQTTException("connection refused")
+
+    reconnect = connect
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.msg)
+
+
+@pytest.fixture(autouse=True)
+def reset_settings(monkeypatch):
+    monkeypatch.setattr(logutil, "_loggers", {})
+    monkeypatch.setattr(logutil, "_settings", {"level": None, "handlers": ()})
+
+
+def manager_for(radio, mqtt_client, **kwargs):
+    clock = types.SimpleNamespace(now=0)
+    manager = ConnectionManager(
+        radio, "ssid", "password", mqtt_client, monotonic=lambda: clock.now, **kwargs
+    )
+    return manager, clock
+
+
+def test_wifi_and_mqtt_in_separate_steps():
+    radio = FakeRadio()
+    mqtt_client = FakeMQTTClient()
+    manager, _ = manager_for(radio, mqtt_client)
+
+    assert not manager.step()
+    assert radio.timeouts == [WIFI_CONNECT_TIMEOUT]
+    assert mqtt_client.connects == 0
+    # The MQTT connect is due right away.
+    assert manager.delay() == 0
+
+    assert manager.step()
+    assert mqtt_client.connects == 1
+    assert len(radio.timeouts) == 1
+
+
+def test_wifi_failures_raise():
+    manager, clock = manager_for(FakeRadio(fail=True), FakeMQTTClient(), max_failures=3)
+
+    for _ in range(2):
+        assert not manager.step()
+        clock.now += manager.delay()
+    with pytest.raises(ConnectionError):
+        manager.step()
+
+
+def test_broker_down_backs_off_indefinitely():
+    radio = FakeRadio()
+    mqtt_client = FakeMQTTClient(fail=True)
+    manager, clock = manager_for(radio, mqtt_client, max_failures=3, backoff_max=60)
+
+    assert not manager.step()  # WiFi
+    for _ in range(50):
+        assert not manager.step()
+        assert manager.delay() <= 60
+        clock.now += manager.delay()
+    assert mqtt_client.connects == 50
+    assert manager.failures == 50
+    assert manager.wifi_failures == 0
+
+    mqtt_client.fail = False
+    assert manager.step()
+    assert manager.failures == 0
+
+
+def test_link_lost_during_mqtt_connect_counts_as_wifi_failure():
+    radio = FakeRadio()
+    mqtt_client = FakeMQTTClient(fail=True)
+    manager, clock = manager_for(radio, mqtt_client, max_failures=2)
+    manager.step()
+
+    radio.connected = False
+    manager.step()
+    assert manager.wifi_failures == 1
+    radio.fail = True
+    clock.now += manager.delay()
+    with pytest.raises(ConnectionError):
+        manager.step()
+
+
+def test_logs_with_configured_level_and_handlers():
+    handler = ListHandler()
+    configure(logging.INFO, handler)
+    manager, _ = manager_for(FakeRadio(), FakeMQTTClient(fail=True))
+
+    manager.step()
+    manager.step()
+    assert handler.messages[:2] == ["Connecting to wifi ssid", "Connected to ssid"]
+    assert handler.messages[-1].startswith("connection attempt 1 failed")
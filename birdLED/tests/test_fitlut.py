@@ -0,0 +1,118 @@
+"""
+fitting the brightness lookup table from light/lux histories
+"""
+
+import io
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from fitlut import (  # noqa: E402
+    format_config,
+    light_range_of,
+    load_csv,
+    load_recording,
+    make_lut,
+    validate,
+)
+from ingest import write_recording  # noqa: E402
+
+# pylint: disable=wrong-import-position
+from configutil import Config, check_values  # noqa: E402
+from telemetryformat import FORMAT_STRUCT, Encoder  # noqa: E402
+
+RESOLUTION = 0.0576
+
+
+def samples(count, seed=1):
+    """
+    light values with log-uniform distribution and noisy lux readings
+    """
+    rng = np.random.default_rng(seed)
+    light = np.exp(rng.uniform(np.log(5), np.log(500), count))
+    lux = light * RESOLUTION * rng.lognormal(0, 0.05, count)
+    return light, lux
+
+
+def test_lut_shape():
+    light, lux = samples(1_000_000)
+    lut = make_lut(light, lux, (10, 400), (0.1, 0.9), size=64)
+
+    assert len(lut) == 64
+    assert lut[0] == 0.9
+    assert lut[-1] == 0.1
+    assert all(a >= b for a, b in zip(lut, lut[1:]))
+    # Log shaped: the brightness drops faster at the low end of the light range.
+    # Halfway through log(light), i.e. at light 63, the brightness is halfway.
+    index = (63 - 10) / (390 / 63)
+    brightness = np.interp(index, np.arange(64), lut)
+    assert brightness == pytest.approx(0.5, abs=0.02)
+
+
+def test_lut_passes_config():
+    light, lux = samples(10_000)
+    light_range = light_range_of(light)
+    lut = make_lut(light, lux, light_range, (0.2, 0.8), size=16)
+    validate(lut, light_range, (0.2, 0.8))
+
+    errors = []
+    values = {"brightness_lut": lut, "light_range": light_range}
+    check_values(values, errors)
+    assert not errors
+    config = Config(
+        {
+            "brightness_range": (0.2, 0.8),
+            "light_range": light_range,
+            "brightness_lut": lut,
+        }
+    )
+    assert config.lut == lut
+
+
+def test_validate_rejects_oversized_table():
+    light, lux = samples(1000)
+    lut = make_lut(light, lux, (10, 400), (0.1, 0.9), size=65)
+    with pytest.raises(ValueError, match="between 2 and 64 items"):
+        validate(lut, (10, 400), (0.1, 0.9))
+
+
+def test_flat_response_falls_back_to_linear():
+    light = np.linspace(10, 50, 100)
+    lut = make_lut(light, np.ones(100), (10, 50), (0.1, 0.9), size=5)
+    assert lut == (0.9, 0.7, 0.5, 0.3, 0.1)
+
+
+def test_no_usable_samples():
+    with pytest.raises(ValueError):
+        make_lut(np.array([10.0]), np.array([0.0]), (10, 50), (0.1, 0.9))
+
+
+def test_load_csv(tmp_path):
+    path = tmp_path / "samples.csv"
+    path.write_text("10,0.5\n20,1.1\n")
+    light, lux = load_csv(str(path))
+    assert list(light) == [10, 20]
+    assert list(lux) == [0.5, 1.1]
+
+
+def test_load_recording():
+    encoder = Encoder(FORMAT_STRUCT)
+    recording = io.StringIO()
+    for light in (10, 20):
+        record = encoder.encode(light, light * RESOLUTION, 0.5, 40.0, 0)
+        write_recording(recording, "birdled", bytes(record), 0)
+    # without lux
+    write_recording(recording, "birdled", bytes(encoder.encode(30, None, 0.5, 40)), 0)
+    recording.seek(0)
+
+    light, lux = load_recording(recording)
+    assert list(light) == [10, 20]
+    assert lux == pytest.approx([10 * RESOLUTION, 20 * RESOLUTION])
+
+
+def test_format_config():
+    text = format_config((0.9, 0.5, 0.1), (10, 50))
+    assert '"brightness_lut": (0.9, 0.5, 0.1),' in text
+    assert 'BRIGHTNESS_LUT = "0.9, 0.5, 0.1"' in text
+    assert 'LIGHT_RANGE = "10, 50"' in text
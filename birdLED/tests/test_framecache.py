@@ -0,0 +1,41 @@
+"""
+frame cache
+"""
+
+import pytest
+
+from framecache import FrameCache
+
+
+def render(color, num_pixels, level, levels, gamma, order):
+    scale = int(255 * (level / (levels - 1)) ** gamma + 0.5)
+    pixel = bytes((color[i] * scale + 127) // 255 for i in order)
+    return pixel * num_pixels
+
+
+@pytest.mark.parametrize("num_pixels", [1, 2, 25, 30])
+@pytest.mark.parametrize("gamma", [1.0, 2.2])
+def test_frames_match_rendering(num_pixels, gamma):
+    color = (255, 100, 0)
+    frames = FrameCache(color, num_pixels, levels=256, gamma=gamma)
+    # ramp up and down like display_pixels()
+    for level in list(range(256)) + list(range(255, -1, -1)):
+        assert frames.get(level) == render(
+            color, num_pixels, level, 256, gamma, (1, 0, 2)
+        )
+
+
+def test_levels():
+    frames = FrameCache((255, 255, 255), 1, levels=16)
+    assert frames.level(0) == 0
+    assert frames.level(1) == 15
+    assert frames.level(1.5) == 15
+    assert frames.level(-1) == 0
+    assert frames.get(15) == bytes((255, 255, 255))
+    assert frames.get(0) == bytes(3)
+
+
+def test_buffer_reused():
+    frames = FrameCache((255, 100, 0), 25)
+    first = frames.get(10)
+    assert frames.get(200) is first
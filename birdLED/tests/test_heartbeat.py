@@ -0,0 +1,46 @@
+"""
+task supervision with per-task deadlines (the same module is used by cherry_lamp)
+"""
+
+import time
+
+from heartbeat import TaskSupervisor
+
+
+class FakeWatchdog:
+    def __init__(self):
+        self.feeds = 0
+
+    def feed(self):
+        self.feeds += 1
+
+
+def test_late_task_withholds_feed():
+    watchdog = FakeWatchdog()
+    supervisor = TaskSupervisor()
+    supervisor.register("fast", 0.01)
+    supervisor.register("slow", 1)
+
+    assert supervisor.feed(watchdog) == ()
+    time.sleep(0.02)
+    supervisor.beat("slow")
+    assert supervisor.feed(watchdog) == ("fast",)
+    assert supervisor.late_tasks == ("fast",)
+    assert watchdog.feeds == 1
+
+    supervisor.beat("fast")
+    assert supervisor.feed(watchdog) == ()
+    assert watchdog.feeds == 2
+
+
+def test_last_beaten_task():
+    supervisor = TaskSupervisor()
+    supervisor.register("first", 1)
+    supervisor.register("second", 1)
+    assert supervisor.last is None
+
+    supervisor.beat("second")
+    supervisor.beat("first")
+    # refreshing all the heartbeats around intended blocking keeps the running task
+    supervisor.beat_all()
+    assert supervisor.last == "first"
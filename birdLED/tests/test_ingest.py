@@ -0,0 +1,187 @@
+"""
+host side ingestion into the column store, also against a stand-in broker
+"""
+
+import io
+import json
+import socket
+import time
+from urllib.parse import quote
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+# pylint: disable=wrong-import-position
+import adafruit_minimqtt.adafruit_minimqtt as MQTT  # noqa: E402
+import ingest  # noqa: E402
+from ingest import (  # noqa: E402
+    FIELDS,
+    Ingestor,
+    Store,
+    Subscriber,
+    replay,
+    write_recording,
+)
+from mqttbroker import BrokerThread  # noqa: E402
+
+from telemetryformat import FORMAT_JSON, FORMAT_STRUCT, Encoder  # noqa: E402
+
+START = 1_760_000_400  # on a whole hour
+DEVICE = "birdled/kitchen"
+
+
+def payload(encoder, light, timestamp, lux=1.5):
+    record = encoder.encode(light, lux, 0.5, 40.0, timestamp)
+    return record.encode("utf-8") if isinstance(record, str) else bytes(record)
+
+
+def test_append_and_query(tmp_path):
+    store = Store(str(tmp_path))
+    times = np.arange(START, START + 7200, 10)
+    lights = np.arange(len(times), dtype=float)
+    values = {field: lights for field in FIELDS}
+    store.append(DEVICE, times, values)
+    store.flush()
+
+    # reopened from the files
+    store = Store(str(tmp_path))
+    assert store.devices() == [DEVICE]
+    stamps, light = store.query(DEVICE, "light", START + 60, START + 120)
+    assert list(stamps) == list(range(START + 60, START + 120, 10))
+    assert list(light) == [6, 7, 8, 9, 10, 11]
+
+    stamps, low, high, mean = store.query(DEVICE, "light", START, START + 7200, 3600)
+    assert list(stamps) == [START, START + 3600]
+    assert list(low) == [0, 360]
+    assert list(high) == [359, 719]
+    assert list(mean) == [179.5, 539.5]
+
+
+def test_late_records_are_inserted_in_order(tmp_path):
+    store = Store(str(tmp_path))
+    nan = np.full(2, np.nan)
+    store.append(
+        DEVICE,
+        np.array([START, START + 120]),
+        {field: np.array([1.0, 3.0]) for field in FIELDS},
+    )
+    # queued on the device during an outage, published afterwards
+    store.append(
+        DEVICE,
+        np.array([START + 60, START + 61]),
+        {**{field: np.array([2.0, 4.0]) for field in FIELDS}, "lux": nan},
+    )
+
+    stamps, light = store.query(DEVICE, "light", START, START + 3600)
+    assert list(stamps) == [START, START + 60, START + 61, START + 120]
+    assert list(light) == [1, 2, 4, 3]
+
+    stamps, low, high, mean = store.query(DEVICE, "light", START, START + 3600, 60)
+    assert list(stamps) == [START, START + 60, START + 120]
+    assert list(low) == [1, 2, 3]
+    assert list(high) == [1, 4, 3]
+    assert list(mean) == [1, 3, 3]
+
+    # The missing values do not count.
+    _, low, _, mean = store.query(DEVICE, "lux", START, START + 3600, 3600)
+    assert list(low) == [1]
+    assert list(mean) == [2]
+
+
+def test_columns_grow(tmp_path):
+    store = Store(str(tmp_path))
+    for chunk in range(5):
+        times = START + np.arange(chunk * 1000, (chunk + 1) * 1000)
+        store.append(DEVICE, times, {field: times * 1.0 for field in FIELDS})
+    store.flush()
+
+    store = Store(str(tmp_path))
+    stamps, light = store.query(DEVICE, "cpu_temp", START, START + 10_000)
+    assert len(stamps) == 5000
+    assert np.array_equal(light, stamps.astype(float))
+    _, _, _, mean = store.query(DEVICE, "cpu_temp", START, START + 10_000, 60)
+    assert len(mean) == 84
+    assert mean[0] == START + 29.5
+
+
+@pytest.mark.parametrize("fmt", [FORMAT_JSON, FORMAT_STRUCT])
+def test_ingest_recorded_payloads(tmp_path, fmt):
+    encoder = Encoder(fmt)
+    recording = io.StringIO()
+    for i in range(10):
+        write_recording(recording, DEVICE, payload(encoder, 20 + i, START + i), 0)
+    # no timestamp: placed at the receipt time
+    record = encoder.encode(50, None, 0.5, 40.0)
+    write_recording(
+        recording,
+        DEVICE,
+        record.encode() if fmt == FORMAT_JSON else bytes(record),
+        START + 100,
+    )
+    write_recording(recording, DEVICE, b"\xff garbage", START)
+    write_recording(recording, DEVICE, b"123", START)
+    write_recording(recording, DEVICE + "/journal", b"[]", START)
+    recording.seek(0)
+
+    ingestor = Ingestor(Store(str(tmp_path)), batch_size=4)
+    replay(ingestor, recording)
+    assert ingestor.records == 11
+    assert ingestor.errors == 2
+
+    store = Store(str(tmp_path))
+    assert store.devices() == [DEVICE]
+    stamps, light = store.query(DEVICE, "light", START, START + 3600)
+    assert list(stamps) == list(range(START, START + 10)) + [START + 100]
+    assert list(light) == list(range(20, 30)) + [50]
+    _, lux = store.query(DEVICE, "lux", START + 100, START + 101)
+    assert np.isnan(lux[0])
+
+
+def test_payload_not_object(tmp_path, monkeypatch):
+    # The JSON decoding of a string payload accepts any value.
+    monkeypatch.setattr(ingest, "decode", json.loads)
+    ingestor = Ingestor(Store(str(tmp_path)))
+    ingestor.add(DEVICE, b"123", START)
+    ingestor.add(DEVICE, b'{"light": 20, "timestamp": %d}' % START, START)
+    ingestor.flush()
+    assert ingestor.records == 1
+    assert ingestor.errors == 1
+    # The lengths are written through a temporary file.
+    directory = tmp_path / quote(DEVICE, safe="")
+    assert (directory / "meta.json").exists()
+    assert not (directory / "meta.json.tmp").exists()
+
+
+def test_subscriber(tmp_path):
+    with BrokerThread() as broker:
+        ingestor = Ingestor(Store(str(tmp_path)))
+        recording = io.StringIO()
+        subscriber = Subscriber(
+            ingestor, "127.0.0.1", broker.port, "birdled/#", recording
+        )
+        subscriber.connect()
+
+        device = MQTT.MQTT(
+            broker="127.0.0.1",
+            port=broker.port,
+            socket_pool=socket,
+            client_id="birdled",
+            socket_timeout=0.01,
+            connect_retries=1,
+        )
+        # The connection manager of the socket pool is shared with the subscriber.
+        device.connect(session_id="device")
+        encoder = Encoder(FORMAT_STRUCT)
+        for i in range(5):
+            device.publish(DEVICE, payload(encoder, 20 + i, START + i))
+
+        deadline = time.monotonic() + 5
+        while ingestor.records < 5:
+            assert time.monotonic() < deadline, "timed out"
+            subscriber.poll(0.1)
+        ingestor.flush()
+
+    _, light = Store(str(tmp_path)).query(DEVICE, "light", START, START + 60)
+    assert list(light) == [20, 21, 22, 23, 24]
+    assert len(recording.getvalue().splitlines()) == 5
@@ -0,0 +1,142 @@
+"""
+logging utilities
+"""
+
+import adafruit_logging as logging
+import pytest
+
+import logutil
+from logutil import (
+    TAIL_HEADER_SIZE,
+    RingBufferHandler,
+    clear_tail,
+    configure,
+    get_log_level,
+    get_logger,
+    load_tail,
+)
+
+
+@pytest.fixture(autouse=True)
+def reset_settings(monkeypatch):
+    monkeypatch.setattr(logutil, "_loggers", {})
+    monkeypatch.setattr(logutil, "_settings", {"level": None, "handlers": ()})
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.msg)
+
+
+class Unformattable:
+    """
+    argument that fails the test if the message gets formatted
+    """
+
+    def __str__(self):
+        raise AssertionError("formatted disabled message")
+
+
+@pytest.mark.parametrize(
+    "level, expected",
+    [
+        ("debug", logging.DEBUG),
+        ("INFO", logging.INFO),
+        ("20", 20),
+        (30, 30),
+        ("x", None),
+    ],
+)
+def test_get_log_level(level, expected):
+    assert get_log_level(level) == expected
+
+
+def test_lazy_logger_skips_formatting():
+    logger = get_logger("test_lazy")
+    handler = ListHandler()
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+
+    logger.debug("value: %s", Unformattable())
+    logger.info("value: %s", 1)
+    assert handler.messages == ["value: 1"]
+    assert not logger.isEnabledFor(logging.DEBUG)
+
+
+def test_configure_applies_to_all_loggers():
+    early = get_logger("test_early")
+    handler = ListHandler()
+    configure(logging.DEBUG, handler)
+    late = get_logger("test_late")
+
+    early.debug("early")
+    late.debug("late")
+    assert handler.messages == ["early", "late"]
+
+    # configuring again does not duplicate the handlers
+    configure(logging.INFO, handler)
+    early.info("again")
+    late.debug("disabled")
+    assert handler.messages == ["early", "late", "again"]
+
+
+def test_ring_buffer_keeps_newest():
+    ring = RingBufferHandler(3)
+    logger = get_logger("test_ring")
+    logger.addHandler(ring)
+    logger.setLevel(logging.INFO)
+    for i in range(5):
+        logger.info("record %d", i)
+
+    records = ring.records()
+    assert len(records) == 3
+    assert [record.rsplit(" ", 1)[-1] for record in records] == ["2", "3", "4"]
+
+
+def make_ring(*messages):
+    ring = RingBufferHandler(len(messages))
+    ring.format = lambda record: record.msg
+    logger = get_logger("test_tail")
+    logger.addHandler(ring)
+    logger.setLevel(logging.INFO)
+    for message in messages:
+        logger.info(message)
+    return ring
+
+
+def test_tail_round_trip():
+    nvm = bytearray(b"\xff" * 300)
+    ring = make_ring("first", "second", "třetí")
+
+    assert load_tail(nvm, 100, 64) == []
+    ring.save(nvm, 100, 64)
+    assert load_tail(nvm, 100, 64) == ["first", "second", "třetí"]
+    # the area does not spill over its size
+    assert nvm[:100] == b"\xff" * 100
+    assert nvm[164:] == b"\xff" * 136
+
+    clear_tail(nvm, 100)
+    assert load_tail(nvm, 100, 64) == []
+
+
+def test_tail_keeps_newest_records():
+    ring = make_ring("a" * 20, "b" * 20, "c" * 20)
+    nvm = bytearray(64)
+    ring.save(nvm, 0, TAIL_HEADER_SIZE + 45)
+    assert load_tail(nvm, 0, TAIL_HEADER_SIZE + 45) == ["b" * 20, "c" * 20]
+
+
+def test_tail_truncates_long_record():
+    ring = make_ring("ž" * 30)
+    nvm = bytearray(64)
+    ring.save(nvm, 0, TAIL_HEADER_SIZE + 11)
+    assert load_tail(nvm, 0, TAIL_HEADER_SIZE + 11) == ["ž" * 5]
+
+
+def test_tail_invalid_length():
+    nvm = bytearray(b"LT\xff\xff" + bytes(60))
+    assert load_tail(nvm, 0, 64) == []
@@ -0,0 +1,65 @@
+"""
+scheduling of the active hours
+"""
+
+import pytest
+
+from scheduler import SECONDS_PER_DAY, Scheduler, seconds_until_active
+
+
+def at(hour, minute=0, second=0):
+    return hour * 3600 + minute * 60 + second
+
+
+@pytest.mark.parametrize(
+    "now, hours_range, expected",
+    [
+        # window within the day
+        (at(8, 59, 59), (9, 18), 1),
+        (at(9), (9, 18), 0),
+        (at(17, 59, 59), (9, 18), 0),
+        (at(18), (9, 18), at(15)),
+        (at(0), (9, 18), at(9)),
+        # window spanning midnight
+        (at(21), (22, 6), at(1)),
+        (at(22), (22, 6), 0),
+        (at(0), (22, 6), 0),
+        (at(5, 59), (22, 6), 0),
+        (at(6), (22, 6), at(16)),
+        # whole day
+        (at(3), (7, 7), 0),
+        # window ending at midnight
+        (at(23, 59), (18, 24), 0),
+        (at(0), (18, 24), at(18)),
+    ],
+)
+def test_seconds_until_active(now, hours_range, expected):
+    assert seconds_until_active(now, hours_range) == expected
+
+
+class FakeClock:
+    """
+    clock with settable local time
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def local_seconds(self):
+        return self.seconds
+
+
+def test_sleep_duration():
+    # some day at 20:30 local time
+    day = 19_000 * SECONDS_PER_DAY
+    clock = FakeClock(day + at(20, 30))
+    scheduler = Scheduler(clock, (9, 18))
+
+    assert scheduler.sleep_duration() == at(12, 30)
+    clock.seconds = day + SECONDS_PER_DAY + at(9)
+    assert scheduler.sleep_duration() == 0
+
+
+def test_unknown_time_stays_active():
+    scheduler = Scheduler(FakeClock(None), (9, 18))
+    assert scheduler.sleep_duration() == 0
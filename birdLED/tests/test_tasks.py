@@ -0,0 +1,315 @@
+"""
+cadence of the asyncio tasks of code.py, run with fake hardware
+"""
+
+import asyncio
+import time
+import types
+
+from adafruit_ticks import ticks_add, ticks_ms
+
+
+class FakeSensor:
+    """
+    VEML7700 with constant light
+    """
+
+    light = 30
+
+    @staticmethod
+    def resolution():
+        return 0.0576
+
+
+class RisingSensor(FakeSensor):
+    """
+    VEML7700 with the light rising on each read, so the sampling
+    does not back off
+    """
+
+    def __init__(self):
+        self.reads = 0
+
+    @property
+    def light(self):
+        self.reads += 1
+        return 30 * self.reads
+
+
+class CountingDeadband:
+    """
+    Deadband that lets all the values through, counts the checks
+    """
+
+    def __init__(self):
+        self.checks = 0
+
+    def check(self, value, now):
+        self.checks += 1
+        return True
+
+
+class FakeMQTTClient:
+    """
+    MQTT client whose loop() blocks for the ping delay once the keep alive elapses,
+    like the MiniMQTT client waiting for slow PINGRESP.
+    """
+
+    def __init__(self, keep_alive, ping_delay):
+        self.keep_alive = keep_alive
+        self.ping_delay = ping_delay
+        self.pings = 0
+        self.loops = 0
+        self.published = []
+        self._last_msg_sent_timestamp = ticks_ms()
+
+    def loop(self, timeout):
+        self.loops += 1
+        idle = (ticks_ms() - self._last_msg_sent_timestamp) / 1000
+        if idle >= self.keep_alive:
+            self.pings += 1
+            time.sleep(self.ping_delay)
+            self._last_msg_sent_timestamp = ticks_ms()
+        time.sleep(timeout)
+
+    def publish(self, topic, msg):
+        self.published.append((topic, msg))
+        self._last_msg_sent_timestamp = ticks_ms()
+
+
+def fake_manager(mqtt_client):
+    return types.SimpleNamespace(
+        connected=True,
+        mqtt_client=mqtt_client,
+        lost=lambda reason: None,
+        check_link=lambda: None,
+    )
+
+
+def fake_config():
+    return types.SimpleNamespace(
+        lut=(0.9, 0.1), light_min=10, light_max=50, lut_scale=1 / 40
+    )
+
+
+def run_for(duration, *coroutines):
+    """
+    Run the coroutines as tasks for given time, then cancel them.
+    Exceptions raised by the tasks are propagated.
+    """
+
+    async def runner():
+        tasks = [asyncio.create_task(coroutine) for coroutine in coroutines]
+        await asyncio.sleep(duration)
+        for task in tasks:
+            if task.done():
+                task.result()
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    asyncio.run(runner())
+
+
+def register_tasks(birdled, *names):
+    periods = {
+        birdled.TASK_SENSOR: birdled.SAMPLE_PERIOD_MAX,
+        birdled.TASK_DISPLAY: birdled.FRAME_PERIOD,
+        birdled.TASK_MQTT: birdled.MQTT_LOOP_PERIOD,
+        birdled.TASK_PUBLISH: birdled.PUBLISH_PERIOD,
+    }
+    for name in names:
+        birdled.task_supervisor.register(name, periods[name] + birdled.DEADLINE_SLACK)
+
+
+def test_task_cadence(birdled, fake_modules, fake_watchdog):
+    duration = 2.2
+    strip = fake_modules["neopixel_write"].neopixel_write
+    frames = birdled.FrameCache((255, 100, 0), 25)
+    state = birdled.State(0.1)
+    config = fake_config()
+    mqtt_client = FakeMQTTClient(keep_alive=60, ping_delay=0)
+    manager = fake_manager(mqtt_client)
+    sensor = RisingSensor()
+    deadband = CountingDeadband()
+    clock = types.SimpleNamespace(timestamp=lambda: None)
+    register_tasks(
+        birdled,
+        birdled.TASK_SENSOR,
+        birdled.TASK_DISPLAY,
+        birdled.TASK_MQTT,
+        birdled.TASK_PUBLISH,
+    )
+    birdled.set_watchdog(birdled.WATCHDOG_TIMEOUT)
+
+    run_for(
+        duration,
+        birdled.feed_watchdog(),
+        birdled.sample_light(sensor, state, config),
+        birdled.display_pixels("pin", frames, state, 0.1),
+        birdled.mqtt_loop(manager),
+        birdled.publish_data(
+            manager,
+            "topic",
+            state,
+            clock,
+            birdled.TelemetryQueue(birdled.QUEUE_BYTES),
+            birdled.Encoder(),
+            deadband,
+        ),
+    )
+    fake_watchdog.check()
+
+    # Allow for the scheduling overhead of the host.
+    assert len(strip.frames) >= 0.7 * duration / birdled.FRAME_PERIOD
+    assert len(strip.frames) <= duration / birdled.FRAME_PERIOD + 1
+    assert fake_watchdog.feeds >= duration / birdled.WATCHDOG_PERIOD - 1
+    assert mqtt_client.loops == 1 + int(duration / birdled.MQTT_LOOP_PERIOD)
+    assert mqtt_client.pings == 0
+    # The first sample has nothing to compare to so the period doubles,
+    # after that the rising light is sampled with the shortest period.
+    assert sensor.reads == int(duration / birdled.SAMPLE_PERIOD_MIN)
+    assert state.brightness_max is not None
+    assert deadband.checks == 1 + int(duration / birdled.PUBLISH_PERIOD)
+    assert [topic for topic, _ in mqtt_client.published] == ["topic"] * deadband.checks
+    assert not fake_watchdog.starved
+    assert not birdled.task_supervisor.late_tasks
+
+
+def test_ping_relaxes_watchdog(birdled, fake_watchdog):
+    # The ping blocks for longer than the watchdog timeout.
+    mqtt_client = FakeMQTTClient(keep_alive=1, ping_delay=1.5)
+    mqtt_client._last_msg_sent_timestamp = ticks_add(ticks_ms(), -1000)
+    register_tasks(birdled, birdled.TASK_MQTT)
+    birdled.set_watchdog(birdled.WATCHDOG_TIMEOUT)
+
+    run_for(
+        2,
+        birdled.feed_watchdog(),
+        birdled.mqtt_loop(fake_manager(mqtt_client)),
+    )
+    fake_watchdog.check()
+
+    assert mqtt_client.pings == 1
+    assert not fake_watchdog.starved
+    relaxed = mqtt_client.keep_alive + birdled.DEADLINE_SLACK
+    assert relaxed in fake_watchdog.timeouts
+    assert fake_watchdog.timeouts[-1] == birdled.WATCHDOG_TIMEOUT
+
+
+def test_ping_due(birdled):
+    mqtt_client = FakeMQTTClient(keep_alive=60, ping_delay=0)
+    assert not birdled.ping_due(mqtt_client)
+    mqtt_client._last_msg_sent_timestamp = ticks_add(ticks_ms(), -60_000)
+    assert birdled.ping_due(mqtt_client)
+
+
+class FakeClock:
+    def __init__(self):
+        self.syncs = 0
+
+    def timestamp(self):
+        return None
+
+    def sync(self):
+        self.syncs += 1
+
+
+def connecting_manager(mqtt_client):
+    """
+    fake manager that connects on the first step
+    """
+    manager = fake_manager(mqtt_client)
+    manager.connected = False
+    manager.delay = lambda: 0
+
+    def step():
+        manager.connected = True
+        return True
+
+    manager.step = step
+    return manager
+
+
+def test_journal_uploaded_on_first_connect(birdled, fake_watchdog, monkeypatch):
+    monkeypatch.setattr(birdled, "CONNECTION_CHECK_PERIOD", 0.05)
+    mqtt_client = FakeMQTTClient(keep_alive=60, ping_delay=0)
+    manager = connecting_manager(mqtt_client)
+    connect = manager.step
+    connects = []
+
+    def step():
+        connects.append(time.monotonic())
+        return connect()
+
+    manager.step = step
+    clock = FakeClock()
+
+    async def drop_connection():
+        for _ in range(2):
+            await asyncio.sleep(0.2)
+            manager.connected = False
+
+    run_for(
+        0.6,
+        birdled.maintain_connection(manager, "topic", clock, 0),
+        drop_connection(),
+    )
+    # reconnected within the same task, but uploaded only once
+    assert len(connects) == 3
+    assert manager.connected
+    assert [topic for topic, _ in mqtt_client.published] == ["topic/journal"]
+    assert clock.syncs == 1
+    # relaxed for the connects only
+    assert (
+        fake_watchdog.timeouts
+        == [
+            birdled.RECONNECT_WATCHDOG_TIMEOUT,
+            birdled.WATCHDOG_TIMEOUT,
+        ]
+        * 3
+    )
+
+
+def test_journal_upload_retried(birdled):
+    mqtt_client = FakeMQTTClient(keep_alive=60, ping_delay=0)
+    manager = connecting_manager(mqtt_client)
+    published = mqtt_client.publish
+    failures = []
+
+    def publish(topic, msg):
+        if not failures:
+            failures.append(topic)
+            raise OSError("broken pipe")
+        published(topic, msg)
+
+    def lost(reason):
+        manager.connected = False
+
+    mqtt_client.publish = publish
+    manager.lost = lost
+    run_for(1.5, birdled.maintain_connection(manager, "topic", FakeClock(), 0))
+    assert failures == ["topic/journal"]
+    assert [topic for topic, _ in mqtt_client.published] == ["topic/journal"]
+
+
+def test_failures_cleared_after_stable_time(birdled):
+    birdled.journal.record(birdled.REASON_WATCHDOG, 10, "WatchDogTimeout")
+    mqtt_client = FakeMQTTClient(keep_alive=60, ping_delay=0)
+    manager = connecting_manager(mqtt_client)
+    clock = FakeClock()
+
+    # The upload right after the connect does not clear the failures.
+    run_for(0.1, birdled.maintain_connection(manager, "topic", clock, time.monotonic()))
+    assert mqtt_client.published[0][0] == "topic/journal"
+    assert birdled.journal.failures == 1
+
+    # Neither does running without the connection.
+    manager.connected = False
+    manager.delay = lambda: 1
+    stable = time.monotonic() - birdled.STABLE_TIME - 1
+    run_for(0.1, birdled.maintain_connection(manager, "topic", clock, stable))
+    assert birdled.journal.failures == 1
+
+    manager.connected = True
+    run_for(0.1, birdled.maintain_connection(manager, "topic", clock, stable))
+    assert birdled.journal.failures == 0
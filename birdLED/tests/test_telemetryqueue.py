@@ -0,0 +1,132 @@
+"""
+telemetry queue, also against a stand-in broker
+"""
+
+import socket
+import time
+
+import adafruit_minimqtt.adafruit_minimqtt as MQTT
+import pytest
+from mqttbroker import BrokerThread
+
+from telemetryformat import FORMAT_STRUCT, STRUCT_SIZE, Encoder, decode
+from telemetryqueue import TelemetryQueue
+
+TOPIC = "devices/test"
+
+
+def test_evicts_oldest():
+    queue = TelemetryQueue(10)
+    for record in (b"aaaa", b"bbbb", b"cccc"):
+        queue.put(record)
+
+    assert len(queue) == 2
+    assert queue.size == 8
+    assert queue.dropped == 1
+    published = []
+    assert queue.drain(published.append, 8) == 2
+    assert published == [b"bbbb", b"cccc"]
+    assert queue.replayed == 2
+    assert queue.size == 0
+
+
+def test_oversized_record_dropped():
+    queue = TelemetryQueue(4)
+    queue.put(b"12345")
+    assert len(queue) == 0
+    assert queue.dropped == 1
+
+
+def test_copies_buffer():
+    queue = TelemetryQueue(100)
+    buffer = bytearray(b"abc")
+    queue.put(buffer)
+    buffer[0] = ord("x")
+    published = []
+    queue.drain(published.append, 1)
+    assert published == [b"abc"]
+
+
+def test_failed_publish_keeps_record():
+    queue = TelemetryQueue(100)
+    for record in (b"a", b"b", b"c"):
+        queue.put(record)
+
+    published = []
+
+    def publish(record):
+        if record == b"b":
+            raise OSError("broker gone")
+        published.append(record)
+
+    with pytest.raises(OSError):
+        queue.drain(publish, 8)
+    assert published == [b"a"]
+    assert len(queue) == 2
+    assert queue.replayed == 1
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def broker():
+    with BrokerThread() as broker_thread:
+        yield broker_thread
+
+
+def connect(broker):
+    client = MQTT.MQTT(
+        broker="127.0.0.1",
+        port=broker.port,
+        socket_pool=socket,
+        client_id="birdled",
+        socket_timeout=0.01,
+        connect_retries=1,
+    )
+    client.connect()
+    return client
+
+
+@pytest.mark.parametrize("budget", [4096, 5 * STRUCT_SIZE])
+def test_replay_after_outage(broker, budget):
+    encoder = Encoder(FORMAT_STRUCT)
+    queue = TelemetryQueue(budget)
+    client = connect(broker)
+
+    def publish(record):
+        client.publish(TOPIC, record)
+
+    start = 1_700_000_000
+    publish(bytes(encoder.encode(20, 1.5, 0.5, 40.0, start)))
+    wait_for(lambda: len(broker.messages) == 1)
+
+    # The broker goes down for maintenance, the samples pile up.
+    broker.stop()
+    samples = 20
+    for i in range(1, samples + 1):
+        queue.put(encoder.encode(20 + i, 1.5, 0.5, 40.0, start + i))
+
+    broker.start()
+    client.reconnect()
+    while len(queue):
+        queue.drain(publish, 8)
+
+    kept = min(samples, budget // STRUCT_SIZE)
+    wait_for(lambda: len(broker.messages) == 1 + kept)
+    assert queue.replayed == kept
+    assert queue.dropped == samples - kept
+    records = [decode(payload) for _, _, _, payload in broker.messages]
+    # The newest records survive and arrive in order with the sample times.
+    timestamps = [record["timestamp"] for record in records]
+    assert timestamps == [start] + list(
+        range(start + samples - kept + 1, start + samples + 1)
+    )
+    assert [record["light"] for record in records[1:]] == [
+        timestamp - start + 20 for timestamp in timestamps[1:]
+    ]
+    client.disconnect()
@@ -0,0 +1,218 @@
+"""
+NTP clock service and DST rules
+"""
+
+import time
+
+import pytest
+
+from timeutil import Clock, dst_days_eu, dst_offset_eu
+
+# 2024-06-01 12:00:00 UTC
+SUMMER = 1_717_243_200
+NS = 1_000_000_000
+
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    """
+    CircuitPython has no time zones, time.mktime() and time.localtime()
+    work with UTC there.
+    """
+    with monkeypatch.context() as patch:
+        patch.setenv("TZ", "UTC")
+        time.tzset()
+        yield
+    # The original time zone is in the environment again.
+    time.tzset()
+
+
+class FakeNTP:
+    """
+    NTP server with adjustable time, can be made unreachable.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.reachable = True
+        self.requests = 0
+
+    @property
+    def datetime(self):
+        self.requests += 1
+        if not self.reachable:
+            raise OSError("timed out")
+        return time.localtime(self.seconds)
+
+
+class FakeMonotonic:
+    """
+    monotonic_ns() replacement advanced by the test
+    """
+
+    def __init__(self):
+        self.now_ns = 5 * NS
+
+    def __call__(self):
+        return self.now_ns
+
+    def advance(self, seconds, ntp=None, rate=1.0):
+        """
+        Advance the monotonic clock and the NTP time. The monotonic clock
+        runs at the rate relative to the NTP time.
+        """
+        self.now_ns += int(seconds * NS * rate)
+        if ntp is not None:
+            ntp.seconds += seconds
+
+
+def make_clock(seconds=SUMMER, tz_offset=0, sync_interval=3600):
+    ntp = FakeNTP(seconds)
+    monotonic = FakeMonotonic()
+    clock = Clock(
+        ntp, tz_offset=tz_offset, sync_interval=sync_interval, monotonic_ns=monotonic
+    )
+    return clock, ntp, monotonic
+
+
+@pytest.mark.parametrize(
+    "year, days",
+    [(2023, (26, 29)), (2024, (31, 27)), (2025, (30, 26)), (2026, (29, 25))],
+)
+def test_dst_days(year, days):
+    assert dst_days_eu(year) == days
+
+
+@pytest.mark.parametrize(
+    "date, offset",
+    [
+        ((2024, 1, 15, 12, 0), 0),
+        ((2024, 3, 30, 12, 0), 0),
+        ((2024, 3, 31, 1, 59), 0),
+        ((2024, 3, 31, 2, 0), 1),
+        ((2024, 7, 1, 0, 0), 1),
+        ((2024, 10, 26, 23, 59), 1),
+        ((2024, 10, 27, 0, 59), 1),
+        ((2024, 10, 27, 1, 0), 0),
+        ((2024, 12, 31, 23, 59), 0),
+    ],
+)
+def test_dst_offset(date, offset):
+    year, month, day, hour, minute = date
+    time_struct = time.localtime(
+        time.mktime((year, month, day, hour, minute, 0, 0, -1, -1))
+    )
+    assert dst_offset_eu(time_struct) == offset
+
+
+def test_not_synchronized():
+    clock, ntp, _ = make_clock()
+    ntp.reachable = False
+
+    assert clock.seconds() is None
+    assert clock.local_seconds() is None
+    assert clock.hour_minute() is None
+    assert clock.timestamp() is None
+
+
+def test_interpolates_between_syncs():
+    clock, ntp, monotonic = make_clock()
+
+    assert clock.seconds() == SUMMER
+    monotonic.advance(1800.5, ntp)
+    assert clock.seconds() == SUMMER + 1800
+    assert ntp.requests == 1
+
+    # resynchronized once the interval elapses
+    monotonic.advance(1800, ntp)
+    assert clock.seconds() == SUMMER + 3600
+    assert ntp.requests == 2
+
+
+def test_timestamp_does_not_sync():
+    clock, ntp, monotonic = make_clock()
+    assert clock.timestamp() is None
+    assert ntp.requests == 0
+
+    clock.sync()
+    monotonic.advance(7200, ntp)
+    assert clock.timestamp() == SUMMER + 7200
+    assert ntp.requests == 1
+
+    # stamps of past monotonic times
+    assert clock.timestamp(monotonic.now_ns - 60 * NS) == SUMMER + 7140
+
+
+def test_drift_correction():
+    # The monotonic clock runs 500 ppm slow.
+    clock, ntp, monotonic = make_clock(sync_interval=3600)
+    clock.sync()
+    monotonic.advance(3600, ntp, rate=1 - 500e-6)
+    clock.sync()
+    assert clock.drift_ppm == pytest.approx(500, abs=1)
+
+    ntp.reachable = False
+    monotonic.advance(3600, ntp, rate=1 - 500e-6)
+    assert clock.seconds() == pytest.approx(ntp.seconds, abs=1)
+
+
+def test_drift_clamped_on_time_jump():
+    clock, ntp, monotonic = make_clock()
+    clock.sync()
+    monotonic.advance(60)
+    ntp.seconds += 3600
+    clock.sync()
+    assert clock.drift_ppm == 1000
+
+
+def test_sync_failure_keeps_running():
+    clock, ntp, monotonic = make_clock(sync_interval=60)
+    clock.sync()
+    ntp.reachable = False
+
+    monotonic.advance(120, ntp)
+    assert clock.seconds() == SUMMER + 120
+    assert not clock.sync()
+    # the failed attempt is not retried before the interval elapses
+    requests = ntp.requests
+    monotonic.advance(30, ntp)
+    clock.seconds()
+    assert ntp.requests == requests
+
+
+def test_tz_offset():
+    clock, _, _ = make_clock(SUMMER, tz_offset=1)
+    # UTC 12:00, CET 13:00, CEST 14:00
+    assert clock.seconds() == SUMMER
+    assert clock.hour_minute() == (14, 0)
+
+
+@pytest.mark.parametrize(
+    "date, hour_minute",
+    [
+        # the local standard time of the transitions, see test_dst_offset()
+        ((2024, 3, 31, 1, 59), (1, 59)),
+        ((2024, 3, 31, 2, 0), (3, 0)),
+        ((2024, 10, 27, 0, 59), (1, 59)),
+        ((2024, 10, 27, 1, 0), (1, 0)),
+    ],
+)
+def test_dst_transitions(date, hour_minute):
+    year, month, day, hour, minute = date
+    standard = int(time.mktime((year, month, day, hour, minute, 0, 0, -1, -1)))
+    # UTC time with tz_offset 1 (CET)
+    clock, _, _ = make_clock(standard - 3600, tz_offset=1)
+    assert clock.hour_minute() == hour_minute
+    offset = dst_offset_eu(time.localtime(standard))
+    assert clock.local_seconds() == standard + offset * 3600
+
+
+def test_new_year():
+    # 2024-12-31 23:59:00 UTC
+    clock, ntp, monotonic = make_clock(1_735_689_540)
+    assert clock.hour_minute() == (23, 59)
+    monotonic.advance(60, ntp)
+    assert clock.hour_minute() == (0, 0)
+    # 2025-07-01 is in DST
+    monotonic.advance(181 * 24 * 3600, ntp)
+    assert clock.hour_minute() == (1, 0)
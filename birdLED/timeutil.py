@@ -2,7 +2,16 @@
 DST utilities
 """
 
-import adafruit_logging as logging
+import time
+
+from logutil import get_logger
+
+
+def dst_days_eu(year):
+    """
+    :return: tuple of the days of the DST begin (in March) and end (in October)
+    """
+    return 31 - (5 * year // 4 + 4) % 7, 31 - (5 * year // 4 + 1) % 7
 
 
 def dst_offset_eu(time_struct) -> int:
@@ -21,9 +30,8 @@ def dst_offset_eu(time_struct) -> int:
     year = time_struct.tm_year
 
     begin_dst_month = 3  # March
-    begin_dst_day = 31 - (5 * year // 4 + 4) % 7
     end_dst_month = 10  # October
-    end_dst_day = 31 - (5 * year // 4 + 1) % 7
+    begin_dst_day, end_dst_day = dst_days_eu(year)
 
     # pylint: disable=too-many-boolean-expressions,chained-comparison
     if (
@@ -42,7 +50,7 @@ def get_time(ntp):
     """
     return current time from NTP as tuple hour, minute
     """
-    logger = logging.getLogger(__name__)
+    logger = get_logger(__name__)
 
     current_time = None  # to silence a warning in IDEA
     attempts = 3
@@ -51,13 +59,163 @@ def get_time(ntp):
             current_time = ntp.datetime
             break
         except OSError as os_error:
-            logger.warning(f"got OSError when getting NTP time: {os_error}")
+            logger.warning("got OSError when getting NTP time: %s", os_error)
             if i == attempts - 1:
                 raise os_error
             continue
 
     current_hour = current_time.tm_hour + dst_offset_eu(current_time)
     current_minute = current_time.tm_min
-    logger.debug(f"time: {current_hour:2}:{current_minute:02}")
+    logger.debug("time: %2d:%02d", current_hour, current_minute)
 
     return current_hour, current_minute
+
+
+# pylint: disable=too-many-instance-attributes
+class Clock:
+    """
+    Local time service. Synchronizes with NTP only once in a while and
+    interpolates in between using time.monotonic_ns() corrected for the drift
+    of the monotonic clock measured across the synchronizations.
+    The DST transitions of the current year are cached so that reading
+    the local time does not involve any date arithmetic.
+
+    Integers are used throughout as CircuitPython floats cannot hold
+    the number of seconds since the epoch precisely.
+    """
+
+    def __init__(
+        self, ntp, tz_offset=0, sync_interval=3600, monotonic_ns=time.monotonic_ns
+    ):
+        """
+        :param ntp: object with the datetime property returning UTC time,
+        e.g. adafruit_ntp.NTP with zero tz_offset
+        :param tz_offset: offset of the standard (non-DST) local time from UTC
+        in hours
+        :param sync_interval: how often to synchronize, in seconds
+        :param monotonic_ns: monotonic clock function, in nanoseconds
+        """
+        self._ntp = ntp
+        self._tz_offset = tz_offset * 3600
+        self._sync_interval_ns = sync_interval * 1_000_000_000
+        self._monotonic_ns = monotonic_ns
+        # The time of the first and last synchronization, both as seconds
+        # since the epoch and as monotonic nanoseconds.
+        self._origin = None
+        self._origin_ns = None
+        self._base = None
+        self._base_ns = None
+        self._last_attempt_ns = None
+        self.drift_ppm = 0
+        self._year_start = None
+        self._year_end = None
+        self._dst_begin = None
+        self._dst_end = None
+
+    def sync(self):
+        """
+        Synchronize with NTP. Failures are logged and otherwise ignored,
+        the clock keeps running from the last synchronization.
+        :return: True on success
+        """
+        logger = get_logger(__name__)
+
+        self._last_attempt_ns = self._monotonic_ns()
+        try:
+            seconds = int(time.mktime(self._ntp.datetime))
+        except OSError as os_error:
+            logger.warning("got OSError when getting NTP time: %s", os_error)
+            return False
+        now_ns = self._monotonic_ns()
+
+        if self._origin is None:
+            self._origin = seconds
+            self._origin_ns = now_ns
+        else:
+            # The NTP time has 1 second resolution so measure the drift
+            # over the longest available interval.
+            elapsed_ns = now_ns - self._origin_ns
+            if elapsed_ns > 0:
+                actual_ns = (seconds - self._origin) * 1_000_000_000
+                drift_ppm = (actual_ns - elapsed_ns) * 1_000_000 // elapsed_ns
+                # Clamp to sane values in case of time jump.
+                self.drift_ppm = max(-1000, min(1000, drift_ppm))
+
+        self._base = seconds
+        self._base_ns = now_ns
+        logger.debug("clock synchronized, drift %d ppm", self.drift_ppm)
+        return True
+
+    def seconds(self):
+        """
+        :return: current time as seconds since the epoch (UTC)
+        or None if the clock was never synchronized
+        """
+        now_ns = self._monotonic_ns()
+        if (
+            self._last_attempt_ns is None
+            or now_ns - self._last_attempt_ns >= self._sync_interval_ns
+        ):
+            self.sync()
+            now_ns = self._monotonic_ns()
+
+        return self.timestamp(now_ns)
+
+    def timestamp(self, now_ns=None):
+        """
+        Unlike seconds(), never synchronizes with NTP so it does not block.
+        :param now_ns: monotonic time in nanoseconds, by default the current time
+        :return: the time as seconds since the epoch (UTC)
+        or None if the clock was never synchronized
+        """
+        if self._base is None:
+            return None
+
+        if now_ns is None:
+            now_ns = self._monotonic_ns()
+        elapsed_ns = now_ns - self._base_ns
+        elapsed_ns += elapsed_ns * self.drift_ppm // 1_000_000
+        return self._base + elapsed_ns // 1_000_000_000
+
+    def _update_dst(self, seconds):
+        year = time.localtime(seconds).tm_year
+        begin_day, end_day = dst_days_eu(year)
+        # The transitions match the ones used in dst_offset_eu().
+        self._dst_begin = int(time.mktime((year, 3, begin_day, 2, 0, 0, 0, -1, -1)))
+        self._dst_end = int(time.mktime((year, 10, end_day, 1, 0, 0, 0, -1, -1)))
+        self._year_start = int(time.mktime((year, 1, 1, 0, 0, 0, 0, -1, -1)))
+        self._year_end = int(time.mktime((year + 1, 1, 1, 0, 0, 0, 0, -1, -1)))
+
+    def local_seconds(self):
+        """
+        :return: current local time as seconds since the epoch (with DST applied)
+        or None if the clock was never synchronized
+        """
+        seconds = self.seconds()
+        if seconds is None:
+            return None
+
+        # The DST transitions are expressed in the local standard time.
+        seconds += self._tz_offset
+        if (
+            self._year_start is None
+            or seconds < self._year_start
+            or seconds >= self._year_end
+        ):
+            self._update_dst(seconds)
+
+        if self._dst_begin <= seconds < self._dst_end:
+            return seconds + 3600
+
+        return seconds
+
+    def hour_minute(self):
+        """
+        :return: tuple of current local hour and minute or None
+        if the clock was never synchronized
+        """
+        seconds = self.local_seconds()
+        if seconds is None:
+            return None
+
+        return seconds // 3600 % 24, seconds // 60 % 60
@@ -0,0 +1,246 @@
+"""
+fit the brightness lookup table from recorded light/lux histories
+
+The perceived brightness of the ambient light is roughly proportional
+to the logarithm of the illuminance, so the pixels should dim evenly
+on the log(lux) scale rather than on the raw light scale. The tool fits
+the sensor response, i.e. lux as function of the raw light value, as piecewise
+linear curve through the mean log(lux) of narrow light bins (made monotonic),
+then maps log(lux) across the light range to the brightness range, inverted,
+and samples the result at the evenly spaced light values of the table.
+The table is validated with configutil and printed in the form
+for secrets.py and settings.toml.
+
+The samples can come from the ingestion store, from recorded payloads
+or from CSV file with light,lux columns.
+
+Usage:
+    python fitlut.py --store data --device birdled/kitchen --start 2026-09-01 \\
+        --end 2026-10-01 --brightness-range 0.1,0.9
+    python fitlut.py --recording payloads.jsonl --size 32
+    python fitlut.py --csv samples.csv --light-range 10,50
+"""
+
+import argparse
+import json
+import os
+import sys
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from configutil import (  # noqa: E402
+    BRIGHTNESS_LUT,
+    BRIGHTNESS_RANGE,
+    LIGHT_RANGE,
+    LUT_SIZE_MAX,
+    check_values,
+)
+from telemetryformat import decode  # noqa: E402
+
+# number of the light bins of the response fit
+BINS = 512
+# percentiles of the light values used as the light range if not given
+LIGHT_PERCENTILES = (1, 99)
+# number of decimal places of the table values
+DECIMALS = 3
+
+
+def load_csv(file_name):
+    """
+    :return: tuple of arrays of the light and lux values from CSV file
+    with light,lux rows
+    """
+    data = np.loadtxt(file_name, delimiter=",", ndmin=2, dtype="float64")
+    return data[:, 0], data[:, 1]
+
+
+def load_recording(file_obj):
+    """
+    :return: tuple of arrays of the light and lux values from payloads recorded
+    by ingest.py, the records lacking either of the values are skipped
+    """
+    light = []
+    lux = []
+    for line in file_obj:
+        if not line.strip():
+            continue
+        entry = json.loads(line)
+        try:
+            data = decode(bytes.fromhex(entry["payload"]))
+        except (ValueError, UnicodeDecodeError, IndexError):
+            continue
+        if "light" in data and "lux" in data:
+            light.append(data["light"])
+            lux.append(data["lux"])
+    return np.array(light, dtype="float64"), np.array(lux, dtype="float64")
+
+
+def load_store(root, device, start, end):
+    """
+    :return: tuple of arrays of the light and lux values of the device
+    in the time range from the ingestion store
+    """
+    # pylint: disable=import-outside-toplevel
+    from ingest import Store
+
+    store = Store(root)
+    _, light = store.query(device, "light", start, end)
+    _, lux = store.query(device, "lux", start, end)
+    return np.asarray(light), np.asarray(lux)
+
+
+def light_range_of(light):
+    """
+    :return: light range covering the bulk of the light values
+    """
+    low, high = np.nanpercentile(light, LIGHT_PERCENTILES)
+    low = max(0, int(np.floor(low)))
+    return low, max(low + 1, int(np.ceil(high)))
+
+
+def fit_response(light, lux, light_range, bins=BINS):
+    """
+    Fit lux as function of the light value: the mean of log(lux) in each
+    light bin, forced to be non-decreasing with the light.
+    :return: tuple of arrays of the bin centers and the fitted log(lux),
+    only for the bins with samples
+    """
+    valid = np.isfinite(light) & np.isfinite(lux) & (lux > 0)
+    light = light[valid]
+    log_lux = np.log(lux[valid])
+    if len(light) == 0:
+        raise ValueError("no samples with positive lux")
+
+    low, high = light_range
+    index = ((light - low) * (bins / (high - low))).astype("int64")
+    np.clip(index, 0, bins - 1, out=index)
+    counts = np.bincount(index, minlength=bins)
+    sums = np.bincount(index, weights=log_lux, minlength=bins)
+    filled = counts > 0
+    centers = low + (np.arange(bins) + 0.5) * ((high - low) / bins)
+    fitted = np.maximum.accumulate(sums[filled] / counts[filled])
+    return centers[filled], fitted
+
+
+def make_lut(light, lux, light_range, brightness_range, size=LUT_SIZE_MAX):
+    """
+    :param light: array of the light values
+    :param lux: array of the lux values of the same samples
+    :param light_range: tuple of the minimal and maximal light
+    :param brightness_range: tuple of the minimal and maximal brightness
+    :param size: number of the table entries
+    :return: tuple of the brightness values for evenly spaced light values
+    across the light range, from the maximal brightness down
+    """
+    centers, log_lux = fit_response(light, lux, light_range)
+    points = np.linspace(light_range[0], light_range[1], size)
+    log_lux = np.interp(points, centers, log_lux)
+
+    span = log_lux[-1] - log_lux[0]
+    if span > 0:
+        position = (log_lux - log_lux[0]) / span
+    else:
+        # flat response, fall back to the linear map
+        position = np.linspace(0, 1, size)
+    brightness_min, brightness_max = brightness_range
+    lut = brightness_max - (brightness_max - brightness_min) * position
+    return tuple(round(float(value), DECIMALS) for value in lut)
+
+
+def validate(lut, light_range, brightness_range):
+    """
+    Check the table with the configuration schema.
+    :raise ValueError: on invalid table
+    """
+    errors = []
+    check_values(
+        {
+            BRIGHTNESS_LUT: lut,
+            LIGHT_RANGE: light_range,
+            BRIGHTNESS_RANGE: brightness_range,
+        },
+        errors,
+    )
+    if errors:
+        raise ValueError(", ".join(errors))
+
+
+def format_config(lut, light_range):
+    """
+    :return: the tunables as lines for secrets.py and settings.toml
+    """
+    values = ", ".join(str(value) for value in lut)
+    return "\n".join(
+        (
+            "# secrets.py",
+            f'    "{LIGHT_RANGE}": {tuple(light_range)},',
+            f'    "{BRIGHTNESS_LUT}": ({values}),',
+            "# settings.toml",
+            f'{LIGHT_RANGE.upper()} = "{light_range[0]}, {light_range[1]}"',
+            f'{BRIGHTNESS_LUT.upper()} = "{values}"',
+        )
+    )
+
+
+def parse_pair(kind):
+    """
+    :return: argparse type parsing comma separated pair
+    """
+
+    def parse(value):
+        first, second = value.split(",")
+        return kind(first), kind(second)
+
+    return parse
+
+
+def main():
+    """
+    command line interface
+    """
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--store", help="directory of the ingestion store")
+    source.add_argument("--recording", help="payloads recorded by ingest.py")
+    source.add_argument("--csv", help="CSV file with light,lux rows")
+    parser.add_argument("--device", help="device topic in the store")
+    parser.add_argument("--start", default="0", help="ISO time or seconds")
+    parser.add_argument("--end", default=str(2**62), help="ISO time or seconds")
+    parser.add_argument(
+        "--light-range",
+        type=parse_pair(int),
+        help=f"default is {LIGHT_PERCENTILES} percentiles of the light",
+    )
+    parser.add_argument(
+        "--brightness-range", type=parse_pair(float), default=(0.1, 0.9)
+    )
+    parser.add_argument("--size", type=int, default=LUT_SIZE_MAX)
+    args = parser.parse_args()
+
+    if args.store:
+        # pylint: disable=import-outside-toplevel
+        from ingest import parse_time
+
+        if not args.device:
+            parser.error("--device is needed with --store")
+        light, lux = load_store(
+            args.store, args.device, parse_time(args.start), parse_time(args.end)
+        )
+    elif args.recording:
+        with open(args.recording, encoding="utf-8") as file_obj:
+            light, lux = load_recording(file_obj)
+    else:
+        light, lux = load_csv(args.csv)
+
+    light_range = args.light_range or light_range_of(light)
+    lut = make_lut(light, lux, light_range, args.brightness_range, args.size)
+    validate(lut, light_range, args.brightness_range)
+    print(f"{len(light)} samples")
+    print(format_config(lut, light_range))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,574 @@
+"""
+host side ingestion of the birdLED telemetry
+
+Subscribes to the MQTT topics of the devices, decodes the records and appends
+them to memory-mapped NumPy column files, one directory per device
+(i.e. per mqtt_topic) and one file per field:
+
+    <store>/<device>/meta.json          number of rows of each table
+    <store>/<device>/raw/timestamp      int64 seconds since the epoch (UTC)
+    <store>/<device>/raw/<field>        float64, NaN if missing in the record
+    <store>/<device>/60/timestamp       start of the minute
+    <store>/<device>/60/<field>         min, max, sum and count in the minute
+    <store>/<device>/3600/...           the same per hour
+
+The rows are kept sorted by the timestamp of the sample (records queued
+on the device arrive late, records without timestamp are placed at the time
+of receipt), so range queries are binary searches in the mapped files and only
+the requested range is paged in. The rollups are updated on each flush.
+
+Usage:
+    python ingest.py serve --store data --broker 127.0.0.1 --topic 'birdled/#'
+    python ingest.py serve --store data --broker 127.0.0.1 --record payloads.jsonl
+    python ingest.py replay --store data payloads.jsonl
+    python ingest.py query --store data --device birdled/kitchen --field light \\
+        --start 2026-10-01 --end 2026-11-01 --resolution 3600
+
+The recorded payload files have one JSON object per line with the time
+of receipt, the topic and the payload in hex.
+"""
+
+import argparse
+import json
+import os
+import socket
+import sys
+import time
+from datetime import datetime, timezone
+from urllib.parse import quote, unquote
+
+import adafruit_minimqtt.adafruit_minimqtt as MQTT
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# pylint: disable=wrong-import-position
+from telemetryformat import decode  # noqa: E402
+
+FIELDS = ("light", "lux", "brightness_max", "cpu_temp")
+# rollup bucket sizes in seconds
+RESOLUTIONS = (60, 3600)
+# subtopics of the device topic that do not carry the telemetry records
+SUBTOPICS = ("journal", "crash_log", "profile")
+
+TIMESTAMP = "timestamp"
+TIME_DTYPE = np.dtype("int64")
+VALUE_DTYPE = np.dtype("float64")
+ROLLUP_DTYPE = np.dtype(
+    [("min", "float64"), ("max", "float64"), ("sum", "float64"), ("count", "uint32")]
+)
+INITIAL_CAPACITY = 1024
+
+
+class Column:
+    """
+    Memory-mapped array in a file. The file is preallocated with spare capacity,
+    the number of used items is tracked in the length.
+    """
+
+    def __init__(self, path, dtype, length=0):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.length = length
+        if not os.path.exists(path):
+            with open(path, "wb") as file_obj:
+                file_obj.truncate(INITIAL_CAPACITY * self.dtype.itemsize)
+        self.array = None
+        self._map()
+
+    def _map(self):
+        capacity = os.path.getsize(self.path) // self.dtype.itemsize
+        self.array = np.memmap(self.path, dtype=self.dtype, mode="r+", shape=capacity)
+
+    @property
+    def data(self):
+        """
+        :return: view of the used part of the array
+        """
+        return self.array[: self.length]
+
+    def reserve(self, length):
+        """
+        Grow the file (by doubling) to hold at least given number of items.
+        """
+        if length <= len(self.array):
+            return
+        capacity = max(length, 2 * len(self.array))
+        self.array.flush()
+        with open(self.path, "r+b") as file_obj:
+            file_obj.truncate(capacity * self.dtype.itemsize)
+        self._map()
+
+    def replace_tail(self, start, values):
+        """
+        Replace the items from the start index on with the values.
+        """
+        self.reserve(start + len(values))
+        self.array[start : start + len(values)] = values
+        self.length = start + len(values)
+
+    def flush(self):
+        """
+        Write the changes to the file.
+        """
+        self.array.flush()
+
+
+class Table:
+    """
+    Columns of the same length sorted by the timestamp column.
+    """
+
+    def __init__(self, directory, dtypes, length=0):
+        """
+        :param directory: directory of the column files
+        :param dtypes: dictionary of column name to dtype, besides the timestamp
+        :param length: number of rows
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.times = Column(os.path.join(directory, TIMESTAMP), TIME_DTYPE, length)
+        self.columns = {
+            name: Column(os.path.join(directory, name), dtype, length)
+            for name, dtype in dtypes.items()
+        }
+
+    def __len__(self):
+        return self.times.length
+
+    def insert(self, times, values):
+        """
+        Insert the rows keeping the table sorted. Typically the rows are newer
+        than the existing ones and are merely appended, otherwise only the rows
+        from the oldest inserted one on are rewritten.
+        :param times: sorted array of the timestamps
+        :param values: dictionary of column name to array of the values
+        """
+        if len(times) == 0:
+            return
+        start = int(np.searchsorted(self.times.data, times[0], side="right"))
+        merged = np.concatenate((self.times.data[start:], times))
+        order = np.argsort(merged, kind="stable")
+        self.times.replace_tail(start, merged[order])
+        for name, column in self.columns.items():
+            merged = np.concatenate((column.data[start:], values[name]))
+            column.replace_tail(start, merged[order])
+
+    def range(self, start, end):
+        """
+        :return: slice of the rows with start <= timestamp < end
+        """
+        times = self.times.data
+        return slice(
+            int(np.searchsorted(times, start, side="left")),
+            int(np.searchsorted(times, end, side="left")),
+        )
+
+    def flush(self):
+        """
+        Write the changes to the files.
+        """
+        self.times.flush()
+        for column in self.columns.values():
+            column.flush()
+
+
+def rollup(times, values, resolution):
+    """
+    Compute min, max, sum and count of the values in the time buckets.
+    The missing (NaN) values are skipped.
+    :param times: sorted array of the timestamps
+    :param values: array of the values
+    :param resolution: bucket size in seconds
+    :return: tuple of the array of the bucket starts and array of ROLLUP_DTYPE
+    """
+    buckets = times // resolution * resolution
+    starts = np.flatnonzero(np.concatenate(([True], buckets[1:] != buckets[:-1])))
+    valid = ~np.isnan(values)
+    stats = np.zeros(len(starts), ROLLUP_DTYPE)
+    stats["min"] = np.fmin.reduceat(values, starts)
+    stats["max"] = np.fmax.reduceat(values, starts)
+    stats["sum"] = np.add.reduceat(np.where(valid, values, 0), starts)
+    stats["count"] = np.add.reduceat(valid.astype("uint32"), starts)
+    return buckets[starts], stats
+
+
+def combine(first, second):
+    """
+    :return: rollup stats covering both arrays of rollup stats
+    """
+    stats = np.zeros(len(first), ROLLUP_DTYPE)
+    stats["min"] = np.fmin(first["min"], second["min"])
+    stats["max"] = np.fmax(first["max"], second["max"])
+    stats["sum"] = first["sum"] + second["sum"]
+    stats["count"] = first["count"] + second["count"]
+    return stats
+
+
+class DeviceStore:
+    """
+    The raw records and the rollups of single device.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        lengths = {}
+        meta = os.path.join(directory, "meta.json")
+        if os.path.exists(meta):
+            with open(meta, encoding="utf-8") as file_obj:
+                lengths = json.load(file_obj)
+        self.raw = Table(
+            os.path.join(directory, "raw"),
+            dict.fromkeys(FIELDS, VALUE_DTYPE),
+            lengths.get("raw", 0),
+        )
+        self.rollups = {
+            resolution: Table(
+                os.path.join(directory, str(resolution)),
+                dict.fromkeys(FIELDS, ROLLUP_DTYPE),
+                lengths.get(str(resolution), 0),
+            )
+            for resolution in RESOLUTIONS
+        }
+
+    def append(self, times, values):
+        """
+        Add the records to the raw table and update the rollups.
+        :param times: sorted array of the timestamps
+        :param values: dictionary of field name to array of the values
+        """
+        self.raw.insert(times, values)
+        for resolution, table in self.rollups.items():
+            stats = {}
+            for field in FIELDS:
+                buckets, stats[field] = rollup(times, values[field], resolution)
+
+            # Merge the buckets that already exist, insert the others.
+            existing = table.times.data
+            index = np.searchsorted(existing, buckets)
+            found = index < len(existing)
+            found[found] = existing[index[found]] == buckets[found]
+            for field in FIELDS:
+                column = table.columns[field]
+                column.array[index[found]] = combine(
+                    column.array[index[found]], stats[field][found]
+                )
+            table.insert(
+                buckets[~found], {field: stats[field][~found] for field in FIELDS}
+            )
+
+    def flush(self):
+        """
+        Write the columns and then the lengths, so that the lengths
+        never cover unwritten data. The lengths are replaced atomically
+        so that a crash cannot leave the metadata truncated.
+        """
+        lengths = {"raw": len(self.raw)}
+        self.raw.flush()
+        for resolution, table in self.rollups.items():
+            table.flush()
+            lengths[str(resolution)] = len(table)
+        meta = os.path.join(self.directory, "meta.json")
+        with open(meta + ".tmp", "w", encoding="utf-8") as file_obj:
+            json.dump(lengths, file_obj)
+        os.replace(meta + ".tmp", meta)
+
+
+class Store:
+    """
+    Column store of the records of all the devices.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        self._devices = {}
+
+    def devices(self):
+        """
+        :return: sorted list of the device names (topics)
+        """
+        return sorted(unquote(name) for name in os.listdir(self.root))
+
+    def device(self, name):
+        """
+        :return: DeviceStore of the device, created if needed
+        """
+        store = self._devices.get(name)
+        if store is None:
+            store = DeviceStore(os.path.join(self.root, quote(name, safe="")))
+            self._devices[name] = store
+        return store
+
+    def append(self, name, times, values):
+        """
+        Add the records of the device, see DeviceStore.append()
+        """
+        self.device(name).append(times, values)
+
+    def flush(self):
+        """
+        Write the changes of all the devices.
+        """
+        for store in self._devices.values():
+            store.flush()
+
+    # pylint: disable=too-many-arguments
+    def query(self, name, field, start, end, resolution=None):
+        """
+        :param name: device name
+        :param field: one of FIELDS
+        :param start: start of the time range (inclusive), seconds since the epoch
+        :param end: end of the time range (exclusive)
+        :param resolution: None for the raw records or one of RESOLUTIONS
+        :return: for the raw records tuple of the timestamps and the values,
+        for the rollups tuple of the bucket starts, minimums, maximums and means.
+        The arrays are backed by the mapped files where possible.
+        """
+        store = self.device(name)
+        if resolution is None:
+            rows = store.raw.range(start, end)
+            return (
+                store.raw.times.data[rows],
+                store.raw.columns[field].data[rows],
+            )
+
+        table = store.rollups[resolution]
+        rows = table.range(start, end)
+        stats = table.columns[field].data[rows]
+        count = stats["count"]
+        mean = np.full(len(stats), np.nan)
+        np.divide(stats["sum"], count, out=mean, where=count > 0)
+        return table.times.data[rows], stats["min"], stats["max"], mean
+
+
+class Ingestor:
+    """
+    Decode the payloads and add them to the store in batches.
+    """
+
+    def __init__(self, store, batch_size=1000):
+        self.store = store
+        self.batch_size = batch_size
+        self.records = 0
+        self.errors = 0
+        self._pending = {}
+        self._count = 0
+
+    def add(self, topic, payload, received):
+        """
+        Decode the record and queue it for the store. The payloads that fail
+        to decode are counted and skipped.
+        :param topic: MQTT topic, identifies the device
+        :param payload: bytes
+        :param received: time of the receipt in seconds since the epoch
+        """
+        if topic.rsplit("/", 1)[-1] in SUBTOPICS:
+            return
+        try:
+            data = decode(bytes(payload))
+        except (ValueError, UnicodeDecodeError, IndexError):
+            self.errors += 1
+            return
+        if not isinstance(data, dict):
+            # Valid JSON that is not a record, e.g. a bare number.
+            self.errors += 1
+            return
+
+        row = [data.get(TIMESTAMP, int(received))]
+        row.extend(data.get(field, np.nan) for field in FIELDS)
+        self._pending.setdefault(topic, []).append(row)
+        self.records += 1
+        self._count += 1
+        if self._count >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Write the queued records to the store.
+        """
+        for topic, rows in self._pending.items():
+            array = np.array(rows, dtype=VALUE_DTYPE)
+            order = np.argsort(array[:, 0], kind="stable")
+            array = array[order]
+            self.store.append(
+                topic,
+                array[:, 0].astype(TIME_DTYPE),
+                {field: array[:, i + 1] for i, field in enumerate(FIELDS)},
+            )
+        self.store.flush()
+        self._pending = {}
+        self._count = 0
+
+
+def write_recording(file_obj, topic, payload, received):
+    """
+    Append the payload to the recording (JSON lines).
+    """
+    line = {"received": received, "topic": topic, "payload": bytes(payload).hex()}
+    file_obj.write(json.dumps(line) + "\n")
+
+
+def replay(ingestor, file_obj):
+    """
+    Feed the recorded payloads to the ingestor.
+    """
+    for line in file_obj:
+        if line.strip():
+            entry = json.loads(line)
+            ingestor.add(
+                entry["topic"], bytes.fromhex(entry["payload"]), entry["received"]
+            )
+    ingestor.flush()
+
+
+class Subscriber:
+    """
+    MQTT subscriber feeding the ingestor. The MiniMQTT client is used
+    with the CPython socket module.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, ingestor, broker, port, topic_filter, recording=None):
+        self.ingestor = ingestor
+        self.topic_filter = topic_filter
+        self.recording = recording
+        self.client = MQTT.MQTT(
+            broker=broker,
+            port=port,
+            client_id=f"birdled-ingest-{os.getpid()}",
+            socket_pool=socket,
+            use_binary_mode=True,
+            socket_timeout=0.1,
+            recv_timeout=10,
+        )
+        self.client.on_message = self._on_message
+
+    def _on_message(self, client, topic, payload):
+        received = time.time()
+        if self.recording is not None:
+            write_recording(self.recording, topic, payload, received)
+        self.ingestor.add(topic, payload, received)
+
+    def connect(self):
+        """
+        Connect to the broker and subscribe.
+        """
+        self.client.connect()
+        self.client.subscribe(self.topic_filter)
+
+    def poll(self, timeout=1.0):
+        """
+        Process the incoming messages for up to the timeout.
+        Reconnect if the connection is lost.
+        """
+        try:
+            self.client.loop(timeout)
+        except (OSError, MQTT.MMQTTException):
+            time.sleep(timeout)
+            self.client.reconnect()
+
+
+def parse_time(value):
+    """
+    :return: seconds since the epoch for ISO date/time (UTC if no zone)
+    or number of seconds
+    """
+    try:
+        return int(value)
+    except ValueError:
+        stamp = datetime.fromisoformat(value)
+        if stamp.tzinfo is None:
+            stamp = stamp.replace(tzinfo=timezone.utc)
+        return int(stamp.timestamp())
+
+
+def serve(args):
+    """
+    Ingest the records from the broker until interrupted.
+    """
+    ingestor = Ingestor(Store(args.store), args.batch_size)
+    recording = open(args.record, "a", encoding="utf-8") if args.record else None
+    try:
+        subscriber = Subscriber(ingestor, args.broker, args.port, args.topic, recording)
+        subscriber.connect()
+        flush_stamp = time.monotonic()
+        while True:
+            subscriber.poll()
+            if time.monotonic() - flush_stamp >= args.flush_period:
+                ingestor.flush()
+                flush_stamp = time.monotonic()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        ingestor.flush()
+        if recording is not None:
+            recording.close()
+        print(f"{ingestor.records} records, {ingestor.errors} errors")
+
+
+def query(args):
+    """
+    Print the records or rollups in the time range.
+    """
+    store = Store(args.store)
+    result = store.query(
+        args.device,
+        args.field,
+        parse_time(args.start),
+        parse_time(args.end),
+        args.resolution,
+    )
+    for row in zip(*result):
+        stamp = datetime.fromtimestamp(int(row[0]), timezone.utc).isoformat()
+        print(stamp, *(f"{value:.4f}" for value in row[1:]))
+
+
+def main():
+    """
+    command line interface
+    """
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--store", required=True, help="directory of the store")
+    parser = argparse.ArgumentParser(description="Ingest the birdLED telemetry.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve_parser = commands.add_parser(
+        "serve", parents=[common], help="subscribe and ingest"
+    )
+    serve_parser.add_argument("--broker", default="127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=1883)
+    serve_parser.add_argument("--topic", default="#", help="topic filter")
+    serve_parser.add_argument("--record", help="also append the payloads to file")
+    serve_parser.add_argument("--batch-size", type=int, default=1000)
+    serve_parser.add_argument("--flush-period", type=float, default=10, help="seconds")
+
+    replay_parser = commands.add_parser(
+        "replay", parents=[common], help="ingest recorded payloads"
+    )
+    replay_parser.add_argument("files", nargs="+")
+
+    query_parser = commands.add_parser(
+        "query", parents=[common], help="print records in time range"
+    )
+    query_parser.add_argument("--device", required=True, help="device topic")
+    query_parser.add_argument("--field", choices=FIELDS, default="light")
+    query_parser.add_argument("--start", required=True, help="ISO time or seconds")
+    query_parser.add_argument("--end", required=True, help="ISO time or seconds")
+    query_parser.add_argument("--resolution", type=int, choices=RESOLUTIONS)
+
+    args = parser.parse_args()
+    if args.command == "serve":
+        serve(args)
+    elif args.command == "replay":
+        ingestor = Ingestor(Store(args.store))
+        for file_name in args.files:
+            with open(file_name, encoding="utf-8") as file_obj:
+                replay(ingestor, file_obj)
+        print(f"{ingestor.records} records, {ingestor.errors} errors")
+    else:
+        query(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+"""
+minimal MQTT 3.1.1 broker stand-in for host tests and tools
+
+Implements just enough of the protocol for the MiniMQTT client and simple
+subscribers: CONNECT, PUBLISH (QoS 0 and 1), SUBSCRIBE, PINGREQ and DISCONNECT.
+Retained messages, wills, sessions and QoS 2 are not supported.
+The received messages are recorded and forwarded to the subscribers.
+
+The broker can be stopped and started again to simulate outages and can delay
+its responses to simulate a busy broker. Besides running it in asyncio event
+loop, BrokerThread runs it in background thread for synchronous clients.
+"""
+
+import asyncio
+import struct
+import threading
+import time
+
+CONNECT = 0x10
+CONNACK = 0x20
+PUBLISH = 0x30
+PUBACK = 0x40
+SUBSCRIBE = 0x80
+SUBACK = 0x90
+PINGREQ = 0xC0
+PINGRESP = 0xD0
+DISCONNECT = 0xE0
+
+
+def topic_matches(topic_filter, topic):
+    """
+    :return: whether the topic matches the filter with + and # wildcards
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    for index, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if index >= len(topic_levels):
+            return False
+        if level not in ("+", topic_levels[index]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+def encode_length(length):
+    """
+    :return: the remaining length encoded as variable byte integer
+    """
+    data = bytearray()
+    while True:
+        byte = length % 128
+        length //= 128
+        if length:
+            byte |= 0x80
+        data.append(byte)
+        if not length:
+            return bytes(data)
+
+
+def encode_string(value):
+    """
+    :return: UTF-8 string prefixed with its length
+    """
+    data = value.encode("utf-8")
+    return struct.pack("!H", len(data)) + data
+
+
+def publish_packet(topic, payload):
+    """
+    :return: QoS 0 PUBLISH packet
+    """
+    body = encode_string(topic) + payload
+    return bytes((PUBLISH,)) + encode_length(len(body)) + body
+
+
+async def read_packet(reader):
+    """
+    :return: tuple of the first byte of the fixed header and the rest of the packet
+    """
+    header = (await reader.readexactly(1))[0]
+    length = 0
+    multiplier = 1
+    while True:
+        byte = (await reader.readexactly(1))[0]
+        length += (byte & 0x7F) * multiplier
+        if not byte & 0x80:
+            break
+        multiplier *= 128
+    return header, await reader.readexactly(length)
+
+
+# pylint: disable=too-many-instance-attributes
+class Broker:
+    """
+    MQTT broker serving clients on localhost.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0):
+        """
+        :param host: address to listen on
+        :param port: port to listen on, 0 to pick a free port
+        (the port is kept across restarts)
+        :param latency: delay in seconds before each response
+        """
+        self.host = host
+        self.port = port
+        self.latency = latency
+        # tuples of receipt time (time.time()), client id, topic and payload
+        self.messages = []
+        # tuples of time (time.time()) and client id of the accepted connections
+        self.connections = []
+        self.connects = 0
+        self.pings = 0
+        self._server = None
+        self._writers = set()
+        self._subscriptions = {}
+
+    @property
+    def running(self):
+        """
+        :return: whether the broker accepts connections
+        """
+        return self._server is not None
+
+    async def start(self):
+        """
+        Start listening.
+        """
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        """
+        Stop listening and drop all the connections.
+        """
+        if self._server is None:
+            return
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _respond(self, writer, data):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        writer.write(data)
+        await writer.drain()
+
+    async def _serve(self, reader, writer):
+        self._writers.add(writer)
+        client_id = None
+        try:
+            while True:
+                header, body = await read_packet(reader)
+                kind = header & 0xF0
+                if kind == CONNECT:
+                    client_id = self._connect(body)
+                    await self._respond(writer, bytes((CONNACK, 2, 0, 0)))
+                elif kind == PUBLISH:
+                    packet_id = self._publish(client_id, header, body)
+                    if packet_id is not None:
+                        await self._respond(
+                            writer, struct.pack("!BBH", PUBACK, 2, packet_id)
+                        )
+                elif kind == SUBSCRIBE:
+                    await self._respond(writer, self._subscribe(writer, body))
+                elif kind == PINGREQ:
+                    self.pings += 1
+                    await self._respond(writer, bytes((PINGRESP, 0)))
+                elif kind == DISCONNECT:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            self._subscriptions.pop(writer, None)
+            writer.close()
+
+    def _connect(self, body):
+        (name_length,) = struct.unpack_from("!H", body)
+        # protocol name, level, flags and keep alive precede the client id
+        offset = 2 + name_length + 4
+        (id_length,) = struct.unpack_from("!H", body, offset)
+        client_id = body[offset + 2 : offset + 2 + id_length].decode("utf-8")
+        self.connects += 1
+        self.connections.append((time.time(), client_id))
+        return client_id
+
+    def _publish(self, client_id, header, body):
+        (topic_length,) = struct.unpack_from("!H", body)
+        topic = body[2 : 2 + topic_length].decode("utf-8")
+        offset = 2 + topic_length
+        packet_id = None
+        if header & 0x06:
+            (packet_id,) = struct.unpack_from("!H", body, offset)
+            offset += 2
+        payload = body[offset:]
+        self.messages.append((time.time(), client_id, topic, payload))
+
+        packet = publish_packet(topic, payload)
+        for writer, filters in self._subscriptions.items():
+            if any(topic_matches(topic_filter, topic) for topic_filter in filters):
+                writer.write(packet)
+        return packet_id
+
+    def _subscribe(self, writer, body):
+        (packet_id,) = struct.unpack_from("!H", body)
+        offset = 2
+        granted = bytearray()
+        filters = self._subscriptions.setdefault(writer, [])
+        while offset < len(body):
+            (length,) = struct.unpack_from("!H", body, offset)
+            filters.append(body[offset + 2 : offset + 2 + length].decode("utf-8"))
+            offset += 2 + length + 1
+            granted.append(0)
+        return (
+            bytes((SUBACK,))
+            + encode_length(2 + len(granted))
+            + struct.pack("!H", packet_id)
+            + granted
+        )
+
+
+class BrokerThread:
+    """
+    Run the Broker in its own event loop in background thread,
+    so that it can be used with synchronous clients.
+
+    Usage:
+        with BrokerThread() as broker:
+            client = MQTT.MQTT(broker="127.0.0.1", port=broker.port, ...)
+    """
+
+    def __init__(self, **kwargs):
+        """
+        :param kwargs: arguments of Broker
+        """
+        self.broker = Broker(**kwargs)
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        return getattr(self.broker, name)
+
+    def _call(self, coroutine):
+        return asyncio.run_coroutine_threadsafe(coroutine, self._loop).result()
+
+    def start(self):
+        """
+        Start the broker, e.g. after stop() to end simulated outage.
+        """
+        self._call(self.broker.start())
+
+    def stop(self):
+        """
+        Stop the broker and drop the connections.
+        """
+        self._call(self.broker.stop())
+
+    def close(self):
+        """
+        Stop the broker and the thread.
+        """
+        self.stop()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
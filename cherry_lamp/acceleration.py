@@ -0,0 +1,81 @@
+"""
+velocity dependent acceleration of rotary encoder steps
+
+The module does not depend on hardware so that it can be exercised on the host
+with synthetic encoder traces, i.e. sequences of time stamps and position deltas.
+"""
+
+from adafruit_ticks import ticks_diff
+
+# The acceleration curve: points of detents per second and steps per detent.
+# Slow rotation moves by single steps, fast spin sweeps the whole colorwheel
+# (256 steps) in a fraction of a second.
+DEFAULT_CURVE = ((0, 1), (10, 1), (40, 4), (100, 8))
+
+
+def interpolate(curve, value):
+    """
+    :param curve: sequence of (x, y) points sorted by x
+    :param value: x value
+    :return: the y value, linearly interpolated between the points
+    and clamped to the first/last point outside of the curve
+    """
+    if value <= curve[0][0]:
+        return curve[0][1]
+
+    for (x1, y1), (x2, y2) in zip(curve, curve[1:]):
+        if value <= x2:
+            return y1 + (y2 - y1) * (value - x1) / (x2 - x1)
+
+    return curve[-1][1]
+
+
+class Acceleration:
+    """
+    Convert encoder position deltas to steps using the acceleration curve
+    applied to the rotation velocity. The whole delta is always consumed,
+    the fractional steps are carried over to the next delta.
+    """
+
+    def __init__(self, curve=DEFAULT_CURVE, idle_time=0.2, smoothing=0.5):
+        """
+        :param curve: sequence of (detents per second, steps per detent) points
+        sorted by the velocity
+        :param idle_time: time in seconds after which the rotation is considered
+        to start from standstill
+        :param smoothing: weight (0 to 1) of the latest velocity sample
+        in the velocity estimate
+        """
+        self.curve = curve
+        self.idle_time = int(idle_time * 1000)
+        self.smoothing = smoothing
+        self.velocity = 0
+        self._stamp = None
+        self._remainder = 0
+
+    def steps(self, stamp, delta):
+        """
+        :param stamp: time stamp of the delta in milliseconds (ticks_ms())
+        :param delta: change of the encoder position in detents
+        :return: number of steps to apply, with the sign of the delta
+        """
+        if delta == 0:
+            return 0
+
+        elapsed = None if self._stamp is None else ticks_diff(stamp, self._stamp)
+        self._stamp = stamp
+        if elapsed is None or elapsed > self.idle_time:
+            self.velocity = 0
+            self._remainder = 0
+        else:
+            sample = abs(delta) * 1000 / max(elapsed, 1)
+            self.velocity += self.smoothing * (sample - self.velocity)
+
+        # Do not carry the remainder over change of the direction.
+        if self._remainder * delta < 0:
+            self._remainder = 0
+
+        scaled = delta * interpolate(self.curve, self.velocity) + self._remainder
+        steps = int(scaled)
+        self._remainder = scaled - steps
+        return steps
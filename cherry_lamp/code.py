@@ -12,30 +12,72 @@ import board
 import microcontroller
 import neopixel
 import supervisor
-from adafruit_seesaw import digitalio, rotaryio, seesaw
+from adafruit_seesaw import seesaw
+from adafruit_ticks import ticks_diff, ticks_ms
 
 # pylint: disable=no-name-in-module
 from microcontroller import watchdog
-from rainbowio import colorwheel
 from watchdog import WatchDogMode, WatchDogTimeout
 
+from acceleration import Acceleration
+from heartbeat import TaskSupervisor
+from knobs import PRESS, ROTATE, Knob, Knobs
+from lampstate import LampState
+from profiler import Profiler
+from renderer import Renderer
+from resetjournal import (
+    JOURNAL_SIZE,
+    REASON_CONNECTION,
+    REASON_EXCEPTION,
+    REASON_MEMORY,
+    REASON_WATCHDOG,
+    ResetJournal,
+)
+
 INITIAL_COLOR = 16  # start at warm yellow
 NUMPIXELS = 30  # Update this to match the number of LEDs.
-SPEED = 0.3  # Increase to slow down the rainbow. Decrease to speed it up.
 MIN_BRIGHTNESS = 0.2  # A number between 0.0 and 1.0, where 0.0 is off, and 1.0 is max.
 PIN = board.A3  # This is the default pin on the 5x5 NeoPixel Grid BFF.
+# Pins wired to the interrupt outputs of the seesaws (color, brightness),
+# e.g. (board.D0, board.D1). If None, the seesaws are polled.
+INTERRUPT_PINS = None
+# Period in seconds of polling each seesaw. Reading a seesaw takes about 16 ms
+# of I2C transfers and waits, so polling faster would starve the rendering.
+POLL_PERIOD = 0.1
+DEBOUNCE_TIME = 0.05  # time in seconds the button state has to be stable
+# acceleration of the color knob: points of detents per second and steps per detent
+COLOR_ACCELERATION = ((0, 1), (10, 1), (40, 4), (100, 8))
+BRIGHTNESS_STEP = 0.1  # brightness change per detent of the brightness knob
+FADE_TIME = 0.3  # duration in seconds of the color/brightness crossfades
+FRAME_PERIOD = 0.02  # minimal time in seconds between the frames of the crossfades
 ESTIMATED_RUN_TIME = 1  # maximum time in seconds for the main loop iteration
-
-
-def set_color(pixels, color):
-    """
-    set all pixels to given color.
-    """
-    print(f"Color -> {color}")
-    for pixel in range(len(pixels)):  # pylint: disable=consider-using-enumerate
-        pixels[pixel] = colorwheel(color)
-
-    pixels.show()
+PROFILE_PERIOD = 0  # period in seconds of printing the profile summary, 0 to disable
+STABLE_TIME = 60  # seconds of running after which the failure count is cleared
+STATE_IDLE_TIME = 5  # seconds the knobs have to be idle before the state is saved
+
+# Names of the profiled stages.
+STAGE_INPUT = "encoder poll"
+STAGE_DISPLAY = "display"
+
+# Names of the supervised stages of the main loop. Each stage sends the heartbeat
+# before it runs, so its deadline covers the stage and the rest of the iteration.
+# The deadline is the same for all of them and below the watchdog timeout,
+# so the stages that are slow but finish are reported and the feed is withheld.
+# A stage that stalls never gets to the feed: the watchdog raises within it
+# and the stage that sent the last heartbeat is reported and recorded
+# in the reset journal.
+TASK_INPUT = "knob poll"
+TASK_RENDER = "render"
+TASK_STATE = "state flush"
+STAGE_DEADLINE = ESTIMATED_RUN_TIME / 2
+
+
+# pylint: disable=no-member
+journal = ResetJournal(microcontroller.nvm)
+# The lamp state is stored right after the reset journal.
+lamp_state = LampState(microcontroller.nvm, JOURNAL_SIZE, idle_time=STATE_IDLE_TIME)
+# The watchdog is fed only if all the stages of the main loop are healthy.
+task_supervisor = TaskSupervisor()
 
 
 def main():
@@ -43,35 +85,55 @@ def main():
     main loop to check for potentiometer turns/presses
     """
     color = INITIAL_COLOR
+    brightness = MIN_BRIGHTNESS
 
     on = True  # whether the pixels are on/off
     orig_brightness = None
 
     print("running")
 
+    # Restore the state before the first frame is rendered.
+    saved = lamp_state.load()
+    if saved:
+        color, brightness, on = saved
+        print(f"Restored color {color}, brightness {brightness}, on {on}")
+        if not on:
+            orig_brightness = brightness
+            brightness = 0
+
+    # Avoid draining power in a reset loop.
+    delay = journal.backoff()
+    if delay:
+        print(f"{journal.failures} consecutive failures, waiting {delay} seconds")
+        time.sleep(delay)
+    start_stamp = time.monotonic()
+
     watchdog.timeout = 10
     watchdog.mode = WatchDogMode.RAISE
 
-    pixels = neopixel.NeoPixel(
-        PIN, NUMPIXELS, brightness=MIN_BRIGHTNESS, auto_write=False
+    pixels = neopixel.NeoPixel(PIN, NUMPIXELS, brightness=brightness, auto_write=False)
+    renderer = Renderer(
+        pixels,
+        color,
+        brightness,
+        fade_time=FADE_TIME,
+        frame_period=FRAME_PERIOD,
     )
 
     i2c = board.STEMMA_I2C()
     seesaw1 = seesaw.Seesaw(i2c, addr=0x36)
     seesaw2 = seesaw.Seesaw(i2c, addr=0x37)
 
-    seesaw1.pin_mode(24, seesaw1.INPUT_PULLUP)
-    seesaw2.pin_mode(24, seesaw2.INPUT_PULLUP)
-
-    button1 = digitalio.DigitalIO(seesaw1, 24)
-    button1_held = False
-    button2 = digitalio.DigitalIO(seesaw2, 24)
-    button2_held = False
+    interrupt_pins = INTERRUPT_PINS or (None, None)
+    knobs = Knobs(
+        (Knob(seesaw1, interrupt_pins[0]), Knob(seesaw2, interrupt_pins[1])),
+        poll_period=POLL_PERIOD,
+        debounce=DEBOUNCE_TIME,
+    )
+    color_acceleration = Acceleration(COLOR_ACCELERATION)
 
-    encoder1 = rotaryio.IncrementalEncoder(seesaw1)
-    last_position1 = -1
-    encoder2 = rotaryio.IncrementalEncoder(seesaw2)
-    last_position2 = -1
+    profiler = Profiler((STAGE_INPUT, STAGE_DISPLAY), enabled=PROFILE_PERIOD > 0)
+    profile_stamp = ticks_ms()
 
     watchdog.feed()
 
@@ -80,109 +142,122 @@ def main():
     watchdog.timeout = ESTIMATED_RUN_TIME
     watchdog.mode = WatchDogMode.RAISE
 
+    for name in (TASK_INPUT, TASK_RENDER, TASK_STATE):
+        task_supervisor.register(name, STAGE_DEADLINE)
+    reported = ()
+
     while True:
         # logger.debug("loop")
 
-        # negate the position to make clockwise rotation positive
-        position1 = -encoder1.position
-        position2 = -encoder2.position
-
-        if on and position1 != last_position1:
-            print(f"Position 1: {position1}")
-
-            if position1 > last_position1:  # Advance forward through the colorwheel.
-                color += 1
-            else:
-                color -= 1  # Advance backward through the colorwheel.
-            color = (color + 256) % 256  # wrap around to 0-256
-
-            set_color(pixels, color)
-
-            last_position1 = position1
-
-        if on and position2 != last_position2:
-            print(f"Position 2: {position2}")
-
-            if position2 > last_position2:  # Increase the brightness.
-                new_brightness = min(1.0, pixels.brightness + 0.1)
-            else:  # Decrease the brightness.
-                new_brightness = max(MIN_BRIGHTNESS, pixels.brightness - 0.1)
-
-            print(f"Brightness -> {new_brightness}")
-            pixels.brightness = new_brightness
-            pixels.show()
-
-            last_position2 = position2
-
-        if on and not button1.value and not button1_held:
-            button_held1 = True
-            print("Button 1 pressed")
-            time.sleep(SPEED)
-
-            set_color(pixels, INITIAL_COLOR)
-
-        if not button2.value and not button2_held:
-            button_held2 = True
-            print("Button 2 pressed")
-            time.sleep(SPEED)
-
-            if on:
-                on = False
-                new_brightness = 0
-                orig_brightness = pixels.brightness
-            else:
-                on = True
-                if orig_brightness:
-                    new_brightness = orig_brightness
+        task_supervisor.beat(TASK_INPUT)
+        start = profiler.start()
+        knobs.poll()
+        profiler.stop(STAGE_INPUT, start)
+
+        while len(knobs.events) > 0:
+            stamp, knob, kind, value = knobs.events.popleft()
+            print(f"Knob {knob + 1}: {kind} {value}")
+
+            if knob == 0 and kind == ROTATE and on:
+                # Advance forward/backward through the colorwheel, wrapping around.
+                color = (color + color_acceleration.steps(stamp, value)) % 256
+                print(f"Color -> {color}")
+                renderer.set_color(color)
+            elif knob == 1 and kind == ROTATE and on:
+                new_brightness = renderer.brightness + value * BRIGHTNESS_STEP
+                new_brightness = min(1.0, max(MIN_BRIGHTNESS, new_brightness))
+                print(f"Brightness -> {new_brightness}")
+                renderer.set_brightness(new_brightness)
+            elif knob == 0 and kind == PRESS and on:
+                color = INITIAL_COLOR
+                print(f"Color -> {color}")
+                renderer.set_color(color)
+            elif knob == 1 and kind == PRESS:
+                if on:
+                    on = False
+                    new_brightness = 0
+                    orig_brightness = renderer.brightness
                 else:
-                    new_brightness = MIN_BRIGHTNESS
-
-            print(f"Brightness -> {new_brightness}")
-            pixels.brightness = new_brightness
-            pixels.show()
-
-            # The sleep seems to be necessary to avoid registering multiple
-            # press events for single physical press.
-            time.sleep(SPEED)
-
-        watchdog.feed()
-
-
-def hard_reset(exception):
+                    on = True
+                    if orig_brightness:
+                        new_brightness = orig_brightness
+                    else:
+                        new_brightness = MIN_BRIGHTNESS
+                print(f"Brightness -> {new_brightness}")
+                renderer.set_brightness(new_brightness)
+
+        # Advance the crossfades by one frame, if due.
+        task_supervisor.beat(TASK_RENDER)
+        start = profiler.start()
+        if renderer.update():
+            profiler.stop(STAGE_DISPLAY, start)
+
+        # Save the state once the knobs are idle.
+        task_supervisor.beat(TASK_STATE)
+        lamp_state.update(
+            color, renderer.brightness if on else orig_brightness, on, ticks_ms()
+        )
+        lamp_state.poll(ticks_ms())
+
+        if journal.failures and time.monotonic() - start_stamp > STABLE_TIME:
+            journal.clear_failures()
+
+        if (
+            profiler.enabled
+            and ticks_diff(ticks_ms(), profile_stamp) > PROFILE_PERIOD * 1000
+        ):
+            print(f"Profile: {profiler.summary()}")
+            profiler.reset()
+            profile_stamp = ticks_ms()
+
+        late = task_supervisor.feed(watchdog)
+        if late and late != reported:
+            print(f"Stages missed their deadline: {', '.join(late)}")
+        reported = late
+
+
+def hard_reset(exception, reason, name=None):
     """
     Sometimes soft reset is not enough. Perform hard reset.
+    :param name: name recorded in the reset journal, the exception name by default
     """
     watchdog.mode = None
     print(f"Got exception: {exception}")
+    journal.record(reason, time.monotonic(), name or type(exception).__name__)
     reset_time = 15
     print(f"Performing hard reset in {reset_time} seconds")
     time.sleep(reset_time)
     microcontroller.reset()  # pylint: disable=no-member
 
 
-try:
-    main()
-except ConnectionError as e:
-    # When this happens, it usually means that the microcontroller's wifi/networking is botched.
-    # The only way to recover is to perform hard reset.
-    hard_reset(e)
-except MemoryError as e:
-    # This is usually the case of delayed exception from the 'import wifi' statement,
-    # possibly caused by a bug (resource leak) in CircuitPython that manifests
-    # after a sequence of ConnectionError exceptions thrown from withing the wifi module.
-    # Should not happen given the above 'except ConnectionError',
-    # however adding that here just in case.
-    hard_reset(e)
-except Exception as e:  # pylint: disable=broad-except
-    # This assumes that such exceptions are quite rare.
-    # Otherwise, this would drain the battery quickly by restarting
-    # over and over in a quick succession.
-    watchdog.mode = None
-    print("Code stopped by unhandled exception:")
-    print(traceback.format_exception(None, e, e.__traceback__))
-    RELOAD_TIME = 3
-    print(f"Performing a supervisor reload in {RELOAD_TIME} seconds")
-    time.sleep(RELOAD_TIME)
-    supervisor.reload()
-except WatchDogTimeout as e:
-    hard_reset(e)
+if __name__ == "__main__":
+    try:
+        main()
+    except ConnectionError as e:
+        # When this happens, it usually means that the microcontroller's wifi/networking is botched.
+        # The only way to recover is to perform hard reset.
+        hard_reset(e, REASON_CONNECTION)
+    except MemoryError as e:
+        # This is usually the case of delayed exception from the 'import wifi' statement,
+        # possibly caused by a bug (resource leak) in CircuitPython that manifests
+        # after a sequence of ConnectionError exceptions thrown from withing the wifi module.
+        # Should not happen given the above 'except ConnectionError',
+        # however adding that here just in case.
+        hard_reset(e, REASON_MEMORY)
+    except WatchDogTimeout as e:
+        # Derived from Exception, so it has to be caught first.
+        # The stage that stalled is the one that sent the last heartbeat.
+        print(f"Watchdog fired in stage {task_supervisor.last}")
+        hard_reset(e, REASON_WATCHDOG, task_supervisor.last)
+    except Exception as e:  # pylint: disable=broad-except
+        # This assumes that such exceptions are quite rare.
+        # Otherwise, this would drain the battery quickly by restarting
+        # over and over in a quick succession.
+        watchdog.mode = None
+        print("Code stopped by unhandled exception:")
+        print(traceback.format_exception(None, e, e.__traceback__))
+        journal.record(REASON_EXCEPTION, time.monotonic(), type(e).__name__)
+        RELOAD_TIME = 3
+        print(f"Performing a supervisor reload in {RELOAD_TIME} seconds")
+        time.sleep(RELOAD_TIME)
+        supervisor.reload()
@@ -0,0 +1,88 @@
+"""
+supervision of cooperative tasks with per-task deadlines
+
+Each task registers with its own deadline and sends heartbeats.
+The hardware watchdog is fed only when all the tasks are healthy,
+so a task that stops sending heartbeats while the others keep running
+is detected within its deadline rather than with the watchdog timeout
+that has to cover the slowest task.
+
+A task that blocks cannot be reported this way, as the code feeding
+the watchdog cannot run either. If the tasks send the heartbeat when they
+resume, the task that sent the last one is the task that blocked,
+so it can be reported once the watchdog fires.
+"""
+
+from adafruit_ticks import ticks_diff, ticks_ms
+
+
+class TaskSupervisor:
+    """
+    Keep track of the heartbeats of the tasks and feed the watchdog
+    only if none of them missed its deadline.
+
+    Usage:
+        task_supervisor.register("task", 2)
+        ...
+        # in the task loop
+        task_supervisor.beat("task")
+        ...
+        # in the watchdog feeding loop
+        late = task_supervisor.feed(watchdog)
+    """
+
+    def __init__(self):
+        self._deadlines = {}
+        self._beats = {}
+        self.late_tasks = ()
+        # name of the task that sent the last heartbeat
+        self.last = None
+
+    def register(self, name, deadline):
+        """
+        Register a task. The task is considered healthy until the deadline
+        elapses for the first time.
+        :param name: name of the task
+        :param deadline: maximum time in seconds between the heartbeats
+        """
+        self._deadlines[name] = int(deadline * 1000)
+        self._beats[name] = ticks_ms()
+
+    def beat(self, name):
+        """
+        Record heartbeat of the task.
+        """
+        self._beats[name] = ticks_ms()
+        self.last = name
+
+    def beat_all(self):
+        """
+        Record heartbeat of all the tasks, e.g. after the event loop was blocked
+        on purpose (sleep, reconnect) so that the tasks could not run.
+        """
+        now = ticks_ms()
+        for name in self._beats:
+            self._beats[name] = now
+
+    def late(self):
+        """
+        :return: tuple of names of the tasks that missed their deadline
+        """
+        now = ticks_ms()
+        return tuple(
+            name
+            for name, deadline in self._deadlines.items()
+            if ticks_diff(now, self._beats[name]) > deadline
+        )
+
+    def feed(self, watchdog):
+        """
+        Feed the watchdog if all the tasks are healthy.
+        :param watchdog: watchdog object with feed() method
+        :return: tuple of names of the tasks that missed their deadline,
+        empty if the watchdog was fed
+        """
+        self.late_tasks = self.late()
+        if not self.late_tasks:
+            watchdog.feed()
+        return self.late_tasks
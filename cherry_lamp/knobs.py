@@ -0,0 +1,138 @@
+"""
+input from seesaw rotary encoders with push buttons
+
+The encoders and buttons are read only when the seesaw signals a change
+via its interrupt output or, if the interrupt output is not wired,
+with low rate polling. Each read of the seesaw waits for the conversion
+(8 ms by default), so reading a knob blocks for about 16 ms. The polled knobs
+are therefore read in turn, one at a time, to keep the main loop responsive.
+The changes are put to event queue as tuples of
+time stamp (in milliseconds), knob index, event kind and value.
+"""
+
+from collections import deque
+
+import digitalio
+from adafruit_seesaw import digitalio as seesaw_digitalio
+from adafruit_seesaw import rotaryio
+from adafruit_ticks import ticks_diff, ticks_ms
+
+# the pin of the push button on the seesaw rotary encoder board
+BUTTON_PIN = 24
+
+# event kinds
+ROTATE = "rotate"  # value is the number of steps, positive for clockwise rotation
+PRESS = "press"
+RELEASE = "release"
+
+
+# pylint: disable=too-many-instance-attributes
+class Knob:
+    """
+    Single seesaw rotary encoder with push button.
+    """
+
+    def __init__(self, seesaw, interrupt_pin=None):
+        """
+        :param seesaw: Seesaw object
+        :param interrupt_pin: pin of the microcontroller wired to the interrupt
+        output of the seesaw, None to poll
+        """
+        self.seesaw = seesaw
+        seesaw.pin_mode(BUTTON_PIN, seesaw.INPUT_PULLUP)
+        self.button = seesaw_digitalio.DigitalIO(seesaw, BUTTON_PIN)
+        self.encoder = rotaryio.IncrementalEncoder(seesaw)
+
+        self.interrupt = None
+        if interrupt_pin is not None:
+            # The interrupt output is open drain, active low.
+            self.interrupt = digitalio.DigitalInOut(interrupt_pin)
+            self.interrupt.direction = digitalio.Direction.INPUT
+            self.interrupt.pull = digitalio.Pull.UP
+            seesaw.enable_encoder_interrupt()
+            seesaw.set_GPIO_interrupts(1 << BUTTON_PIN, True)
+
+        self.position = self.encoder.position
+        self.pressed = False
+        # raw state of the button and the time of its last change
+        self._raw_pressed = False
+        self._raw_stamp = ticks_ms()
+
+    @property
+    def debouncing(self):
+        """
+        :return: whether the button state change is waiting to settle
+        """
+        return self._raw_pressed != self.pressed
+
+    def changed(self):
+        """
+        :return: whether the seesaw signals a change via the interrupt output
+        """
+        return not self.interrupt.value
+
+    def read(self, index, now, debounce, queue):
+        """
+        Read the encoder and button and append the changes to the queue.
+        The button state is accepted only after it is stable for the debounce time.
+        """
+        if self.interrupt is not None:
+            # Reading the flags clears the interrupt.
+            self.seesaw.get_GPIO_interrupt_flag()
+
+        position = self.encoder.position
+        if position != self.position:
+            # negate the position to make clockwise rotation positive
+            queue.append((now, index, ROTATE, self.position - position))
+            self.position = position
+
+        raw_pressed = not self.button.value
+        if raw_pressed != self._raw_pressed:
+            self._raw_pressed = raw_pressed
+            self._raw_stamp = now
+        if self.debouncing and ticks_diff(now, self._raw_stamp) >= debounce:
+            self.pressed = raw_pressed
+            event = PRESS if raw_pressed else RELEASE
+            queue.append((self._raw_stamp, index, event, None))
+
+
+class Knobs:
+    """
+    Collect events from multiple knobs into single queue.
+    """
+
+    def __init__(self, knobs, poll_period=0.1, debounce=0.05, queue_size=16):
+        """
+        :param knobs: sequence of Knob objects, the index in the sequence
+        identifies the knob in the events
+        :param poll_period: period in seconds of reading each of the knobs
+        without interrupt output
+        :param debounce: time in seconds the button state has to be stable
+        :param queue_size: maximum number of events in the queue,
+        the oldest events are dropped
+        """
+        self.knobs = knobs
+        self.poll_period = int(poll_period * 1000)
+        self.debounce = int(debounce * 1000)
+        self.events = deque((), queue_size)
+        # The knobs take turns, so one of them is due every this many milliseconds.
+        self._poll_interval = self.poll_period // len(knobs)
+        self._poll_stamp = ticks_ms()
+        self._poll_index = 0
+
+    def poll(self):
+        """
+        Read the knobs that signal a change, are being debounced or are due
+        to be polled. Returns right away.
+        """
+        now = ticks_ms()
+        polled = None
+        if ticks_diff(now, self._poll_stamp) >= self._poll_interval:
+            self._poll_stamp = now
+            polled = self._poll_index
+            self._poll_index = (self._poll_index + 1) % len(self.knobs)
+
+        for index, knob in enumerate(self.knobs):
+            due = index == polled if knob.interrupt is None else knob.changed()
+            if due or knob.debouncing:
+                knob.read(index, now, self.debounce, self.events)
@@ -0,0 +1,161 @@
+"""
+persistence of the lamp state in non-volatile memory
+
+The state is stored as fixed size records in a number of slots which are written
+in round robin fashion to spread the wear. Each record consists of:
+
+  - version (unsigned char)
+  - sequence number (unsigned short)
+  - colorwheel position (unsigned char)
+  - brightness scaled to 0-255 (unsigned char)
+  - on/off flag (unsigned char)
+  - Fletcher-16 checksum of the preceding bytes (unsigned short)
+
+The valid record with the highest sequence number is the current state.
+"""
+
+import struct
+
+from adafruit_ticks import ticks_diff
+
+VERSION = 1
+RECORD_LAYOUT = "<BHBBB"
+DATA_SIZE = struct.calcsize(RECORD_LAYOUT)
+RECORD_SIZE = DATA_SIZE + 2
+SLOTS = 16
+# Size of the NVM area occupied by the records.
+STATE_SIZE = SLOTS * RECORD_SIZE
+
+
+def checksum(data):
+    """
+    :return: Fletcher-16 checksum of the data
+    """
+    sum1 = 0
+    sum2 = 0
+    for byte in data:
+        sum1 = (sum1 + byte) % 255
+        sum2 = (sum2 + sum1) % 255
+    return (sum2 << 8) | sum1
+
+
+def quantize(color, brightness, on):
+    """
+    :return: tuple of the state values as stored in the record
+    """
+    return color % 256, min(max(int(brightness * 255 + 0.5), 0), 255), 1 if on else 0
+
+
+def encode_record(sequence, color, brightness, on):
+    """
+    :return: the state encoded as bytes
+    """
+    data = struct.pack(
+        RECORD_LAYOUT, VERSION, sequence & 0xFFFF, *quantize(color, brightness, on)
+    )
+    return data + struct.pack("<H", checksum(data))
+
+
+def decode_record(data):
+    """
+    :return: tuple of sequence, color, brightness and on/off flag
+    or None if the record is not valid
+    """
+    (expected,) = struct.unpack("<H", data[DATA_SIZE:RECORD_SIZE])
+    if checksum(data[:DATA_SIZE]) != expected:
+        return None
+
+    version, sequence, color, brightness, on = struct.unpack(
+        RECORD_LAYOUT, data[:DATA_SIZE]
+    )
+    if version != VERSION:
+        return None
+
+    return sequence, color, brightness / 255, bool(on)
+
+
+def newer(sequence, other):
+    """
+    :return: whether the sequence number is newer than the other one,
+    accounting for the wraparound
+    """
+    return 0 < ((sequence - other) & 0xFFFF) < 0x8000
+
+
+class LampState:
+    """
+    Lamp state kept in non-volatile memory (e.g. microcontroller.nvm).
+
+    The changes of the state are coalesced: the state is written only after
+    it has not changed for the idle time, so turning the knobs does not
+    wear the memory.
+    """
+
+    def __init__(self, nvm, offset, idle_time=5):
+        """
+        :param nvm: bytearray like object
+        :param offset: offset of the records in the NVM
+        :param idle_time: time in seconds the state has to be unchanged
+        to be written
+        """
+        self._nvm = nvm
+        self._offset = offset
+        self.idle_time = int(idle_time * 1000)
+        self._slot = SLOTS - 1
+        self._sequence = 0
+        self._saved = None
+        self._pending = None
+        self._stamp = None
+
+    def load(self):
+        """
+        Find the current record.
+        :return: tuple of color, brightness and on/off flag or None
+        if there is no valid record
+        """
+        state = None
+        for slot in range(SLOTS):
+            start = self._offset + slot * RECORD_SIZE
+            record = decode_record(self._nvm[start : start + RECORD_SIZE])
+            if record is None:
+                continue
+            if state is None or newer(record[0], self._sequence):
+                self._slot = slot
+                self._sequence = record[0]
+                state = record[1:]
+
+        if state is not None:
+            self._saved = quantize(*state)
+        return state
+
+    def update(self, color, brightness, on, now):
+        """
+        Record the current state. It is written by poll() once idle.
+        :param now: time stamp in milliseconds (ticks_ms())
+        """
+        # Compare the values as stored to avoid rewriting the same record.
+        state = quantize(color, brightness, on)
+        if state != self._pending:
+            self._pending = state
+            self._stamp = now
+
+    def poll(self, now):
+        """
+        Write the state if it changed and has been idle long enough.
+        :param now: time stamp in milliseconds (ticks_ms())
+        :return: whether the state was written
+        """
+        if self._pending is None or self._pending == self._saved:
+            return False
+        if ticks_diff(now, self._stamp) < self.idle_time:
+            return False
+
+        self._slot = (self._slot + 1) % SLOTS
+        self._sequence = (self._sequence + 1) & 0xFFFF
+        start = self._offset + self._slot * RECORD_SIZE
+        color, brightness, on = self._pending
+        self._nvm[start : start + RECORD_SIZE] = encode_record(
+            self._sequence, color, brightness / 255, on
+        )
+        self._saved = self._pending
+        return True
@@ -0,0 +1,121 @@
+"""
+lightweight per-stage profiling of the main loop and heap usage tracking
+"""
+
+import gc
+from array import array
+
+from adafruit_ticks import ticks_diff, ticks_ms
+
+
+# pylint: disable=too-many-instance-attributes
+class Profiler:
+    """
+    Keep duration statistics (min/avg/max/p95) of named stages of the main loop
+    in fixed size arrays, together with heap usage.
+    The p95 is computed from a window of the most recent durations.
+
+    Usage:
+        start = profiler.start()
+        ...
+        profiler.stop("stage", start)
+
+    When disabled, start() and stop() return right away.
+    """
+
+    def __init__(self, stages, window=32, enabled=True):
+        """
+        :param stages: names of the stages
+        :param window: number of the most recent durations to compute p95 from
+        :param enabled: whether to collect the data
+        """
+        self.enabled = enabled
+        self.stages = stages
+        self.window = window
+        self._stage_index = {name: i for i, name in enumerate(stages)}
+        self._samples = [array("L", [0] * window) for _ in stages]
+        count = len(stages)
+        self._pos = array("L", [0] * count)
+        self._count = array("L", [0] * count)
+        self._sum = array("L", [0] * count)
+        self._min = array("L", [0] * count)
+        self._max = array("L", [0] * count)
+        self._mem_free = None
+        self.mem_free_min = None
+        self.collections = 0
+
+    def start(self):
+        """
+        :return: the start stamp to be passed to stop()
+        """
+        if not self.enabled:
+            return 0
+        return ticks_ms()
+
+    def stop(self, stage, start):
+        """
+        Record the duration of the stage since the start stamp.
+        """
+        if not self.enabled:
+            return
+
+        duration = ticks_diff(ticks_ms(), start)
+        i = self._stage_index[stage]
+        self._samples[i][self._pos[i]] = duration
+        self._pos[i] = (self._pos[i] + 1) % self.window
+        if self._count[i] == 0 or duration < self._min[i]:
+            self._min[i] = duration
+        if duration > self._max[i]:
+            self._max[i] = duration
+        self._sum[i] += duration
+        self._count[i] += 1
+
+        self.sample_heap()
+
+    def sample_heap(self):
+        """
+        Sample the free heap. Increase of free memory since the last sample
+        is counted as garbage collection.
+        """
+        mem_free = gc.mem_free()  # pylint: disable=no-member
+        if self._mem_free is not None and mem_free > self._mem_free:
+            self.collections += 1
+        self._mem_free = mem_free
+        if self.mem_free_min is None or mem_free < self.mem_free_min:
+            self.mem_free_min = mem_free
+
+    def summary(self):
+        """
+        :return: dictionary with the statistics of the stages (in milliseconds)
+        and heap usage
+        """
+        stats = {}
+        for i, name in enumerate(self.stages):
+            count = self._count[i]
+            if count == 0:
+                continue
+            samples = sorted(self._samples[i][: min(count, self.window)])
+            stats[name] = {
+                "min": self._min[i],
+                "avg": self._sum[i] / count,
+                "max": self._max[i],
+                "p95": samples[(len(samples) * 95 - 1) // 100],
+                "count": count,
+            }
+        stats["mem_free"] = self._mem_free
+        stats["mem_free_min"] = self.mem_free_min
+        stats["collections"] = self.collections
+        return stats
+
+    def reset(self):
+        """
+        Reset the statistics.
+        """
+        for i in range(len(self.stages)):
+            self._pos[i] = 0
+            self._count[i] = 0
+            self._sum[i] = 0
+            self._min[i] = 0
+            self._max[i] = 0
+        self.mem_free_min = None
+        self.collections = 0
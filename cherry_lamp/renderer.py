@@ -0,0 +1,116 @@
+"""
+rendering of single color on the LED strip with time based crossfades
+"""
+
+from adafruit_ticks import ticks_diff, ticks_ms
+from rainbowio import colorwheel
+
+# The colorwheel computed once, with the colors split into RGB components
+# so that they can be interpolated.
+COLORWHEEL = tuple(
+    ((value >> 16) & 0xFF, (value >> 8) & 0xFF, value & 0xFF)
+    for value in (colorwheel(i) for i in range(256))
+)
+
+
+def mix(start, end, progress):
+    """
+    :return: the value between start and end at given progress (0 to 1)
+    """
+    return start + (end - start) * progress
+
+
+# pylint: disable=too-many-instance-attributes
+class Renderer:
+    """
+    Render single color on all the pixels of the strip.
+
+    Changes of the color and brightness are crossfaded over fade_time.
+    The update() method advances the crossfade by at most one frame
+    and returns right away, so it can be called from the main loop without sleeping.
+    Each frame is a bulk fill of the pixel buffer followed by show(),
+    so there is no per-pixel Python code.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(self, pixels, color, brightness, fade_time=0.3, frame_period=0.02):
+        """
+        The pixels are faded in from black to the initial color and brightness.
+        :param pixels: NeoPixel object with auto_write disabled
+        :param color: initial colorwheel position (0-255)
+        :param brightness: initial brightness (0.0 to 1.0)
+        :param fade_time: duration of the crossfade in seconds
+        :param frame_period: minimal time between the frames in seconds
+        """
+        self.pixels = pixels
+        self.fade_time = int(fade_time * 1000)
+        self.frame_period = int(frame_period * 1000)
+        self.color = color % 256
+        self.brightness = brightness
+        # the displayed values
+        self._rgb = (0, 0, 0)
+        self._brightness = brightness
+        # the values at the start of the crossfade
+        self._start_rgb = self._rgb
+        self._start_brightness = self._brightness
+        self._fade_stamp = None
+        self._frame_stamp = ticks_ms()
+        self._start_fade()
+
+    @property
+    def fading(self):
+        """
+        :return: whether crossfade is in progress
+        """
+        return self._fade_stamp is not None
+
+    def _start_fade(self):
+        self._start_rgb = self._rgb
+        self._start_brightness = self._brightness
+        self._fade_stamp = ticks_ms()
+
+    def set_color(self, color):
+        """
+        Start crossfade from the displayed color to given colorwheel position.
+        """
+        self.color = color % 256
+        self._start_fade()
+
+    def set_brightness(self, brightness):
+        """
+        Start crossfade from the displayed brightness to given brightness.
+        """
+        self.brightness = brightness
+        self._start_fade()
+
+    def update(self):
+        """
+        Render the next frame of the crossfade if it is due.
+        :return: whether a frame was rendered
+        """
+        if self._fade_stamp is None:
+            return False
+
+        now = ticks_ms()
+        if ticks_diff(now, self._frame_stamp) < self.frame_period:
+            return False
+        self._frame_stamp = now
+
+        elapsed = ticks_diff(now, self._fade_stamp)
+        if elapsed >= self.fade_time:
+            progress = 1
+            self._fade_stamp = None
+        else:
+            progress = elapsed / self.fade_time
+
+        target = COLORWHEEL[self.color]
+        self._rgb = tuple(
+            int(mix(start, end, progress) + 0.5)
+            for start, end in zip(self._start_rgb, target)
+        )
+        self._brightness = mix(self._start_brightness, self.brightness, progress)
+
+        self.pixels.brightness = self._brightness
+        self.pixels.fill(self._rgb)
+        self.pixels.show()
+        return True
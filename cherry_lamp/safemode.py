@@ -2,7 +2,18 @@
 safe mode handling
 """
 
+import time
+
 import microcontroller
 
+# pylint: disable=import-error
+import supervisor
+
+from resetjournal import REASON_SAFEMODE, ResetJournal
+
+safemode_reason = str(supervisor.runtime.safe_mode_reason).rsplit(".", 1)[-1]
+journal = ResetJournal(microcontroller.nvm)  # pylint: disable=no-member
+journal.record(REASON_SAFEMODE, time.monotonic(), safemode_reason)
+
 # pylint: disable=no-member
 microcontroller.reset()  # Reset and start over.
@@ -0,0 +1,77 @@
+"""
+velocity acceleration of the encoder steps, driven with synthetic encoder traces
+"""
+
+import pytest
+from adafruit_ticks import ticks_add
+
+from acceleration import DEFAULT_CURVE, Acceleration, interpolate
+
+CONSTANT = ((0, 1.5), (100, 1.5))
+
+
+def run(acceleration, trace):
+    """
+    :param trace: sequence of (time stamp in milliseconds, delta)
+    :return: list of the steps
+    """
+    return [acceleration.steps(stamp, delta) for stamp, delta in trace]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(-5, 1), (0, 1), (10, 1), (25, 2.5), (40, 4), (70, 6), (100, 8), (500, 8)],
+)
+def test_interpolate(value, expected):
+    assert interpolate(DEFAULT_CURVE, value) == expected
+
+
+def test_slow_rotation_moves_single_steps():
+    trace = [(stamp, 1) for stamp in range(0, 5000, 500)]
+    assert run(Acceleration(), trace) == [1] * 10
+
+
+def test_fast_spin_accelerates():
+    acceleration = Acceleration()
+    # 100 detents per second
+    steps = run(acceleration, [(stamp, 1) for stamp in range(0, 320, 10)])
+    assert steps[0] == 1
+    assert steps[-1] == 8
+    assert steps == sorted(steps)
+    # 32 detents sweep the whole colorwheel
+    assert sum(steps) >= 180
+    assert acceleration.velocity == pytest.approx(100, rel=0.01)
+
+
+def test_standstill_resets_velocity():
+    acceleration = Acceleration()
+    run(acceleration, [(stamp, 1) for stamp in range(0, 200, 10)])
+    assert acceleration.velocity > 50
+    assert acceleration.steps(1000, 1) == 1
+    assert acceleration.velocity == 0
+
+
+def test_zero_delta():
+    acceleration = Acceleration(CONSTANT)
+    assert acceleration.steps(0, 1) == 1
+    assert acceleration.steps(10, 0) == 0
+    # the remainder is kept
+    assert acceleration.steps(20, 1) == 2
+
+
+def test_whole_delta_consumed():
+    acceleration = Acceleration(CONSTANT)
+    trace = [(stamp, 3) for stamp in range(0, 1000, 50)]
+    assert sum(run(acceleration, trace)) == int(1.5 * 3 * len(trace))
+
+
+def test_remainder_not_carried_over_direction_change():
+    acceleration = Acceleration(CONSTANT)
+    assert run(acceleration, [(0, 1), (10, -1), (20, -1)]) == [1, -1, -2]
+
+
+def test_ticks_wrap_around():
+    start = ticks_add(0, -15)
+    trace = [(ticks_add(start, offset), 1) for offset in range(0, 300, 10)]
+    steps = run(Acceleration(), trace)
+    assert steps[-1] == 8
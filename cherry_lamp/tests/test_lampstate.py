@@ -0,0 +1,139 @@
+"""
+lamp state records in NVM: codec, sequence wraparound and write coalescing
+"""
+
+import pytest
+
+from lampstate import (
+    RECORD_SIZE,
+    SLOTS,
+    STATE_SIZE,
+    LampState,
+    decode_record,
+    encode_record,
+    newer,
+    quantize,
+)
+
+OFFSET = 8
+
+
+def slots(nvm):
+    """
+    :return: list of the decoded records of all the slots
+    """
+    return [
+        decode_record(nvm[start : start + RECORD_SIZE])
+        for start in range(OFFSET, OFFSET + STATE_SIZE, RECORD_SIZE)
+    ]
+
+
+@pytest.mark.parametrize(
+    "state, expected",
+    [
+        ((16, 0.2, True), (16, 51, 1)),
+        ((300, 1.5, False), (44, 255, 0)),
+        ((-1, -0.1, True), (255, 0, 1)),
+    ],
+)
+def test_quantize(state, expected):
+    assert quantize(*state) == expected
+
+
+def test_record_round_trip():
+    data = encode_record(0x12345, 200, 0.4, False)
+    assert len(data) == RECORD_SIZE
+    sequence, color, brightness, on = decode_record(data)
+    assert (sequence, color, on) == (0x2345, 200, False)
+    assert brightness == pytest.approx(0.4, abs=1 / 255)
+
+
+@pytest.mark.parametrize("index", range(RECORD_SIZE))
+def test_corrupted_record(index):
+    data = bytearray(encode_record(7, 16, 0.5, True))
+    data[index] ^= 0x10
+    assert decode_record(data) is None
+
+
+@pytest.mark.parametrize("fill", [0x00, 0xFF])
+def test_blank_memory(fill):
+    nvm = bytearray([fill] * (OFFSET + STATE_SIZE))
+    assert LampState(nvm, OFFSET).load() is None
+
+
+@pytest.mark.parametrize(
+    "sequence, other, expected",
+    [(1, 0, True), (0, 1, False), (0, 0xFFFF, True), (0xFFFF, 0, False), (5, 5, False)],
+)
+def test_newer(sequence, other, expected):
+    assert newer(sequence, other) == expected
+
+
+def test_writes_coalesced_until_idle():
+    nvm = bytearray(OFFSET + STATE_SIZE)
+    state = LampState(nvm, OFFSET, idle_time=5)
+
+    # turning the knob
+    for now in range(0, 3000, 100):
+        state.update(now // 100, 0.5, True, now)
+        assert not state.poll(now)
+    assert not state.poll(7000)
+    assert state.poll(8000)
+    assert not state.poll(20000)
+
+    # The same values as stored are not written again.
+    state.update(29, 0.501, True, 21000)
+    assert not state.poll(30000)
+    assert sum(record is not None for record in slots(nvm)) == 1
+
+    reloaded = LampState(nvm, OFFSET)
+    color, brightness, on = reloaded.load()
+    assert (color, on) == (29, True)
+    assert brightness == pytest.approx(0.5, abs=1 / 255)
+
+
+def test_not_written_back_after_load():
+    nvm = bytearray(OFFSET + STATE_SIZE)
+    state = LampState(nvm, OFFSET, idle_time=0)
+    state.update(10, 0.6, False, 0)
+    state.poll(0)
+
+    state = LampState(nvm, OFFSET, idle_time=0)
+    state.update(*state.load(), 100)
+    assert not state.poll(100)
+
+
+def test_slots_written_round_robin():
+    nvm = bytearray(OFFSET + STATE_SIZE + 4)
+    state = LampState(nvm, OFFSET, idle_time=0)
+    for color in range(SLOTS + 3):
+        state.update(color, 0.5, True, color)
+        assert state.poll(color)
+
+    records = slots(nvm)
+    assert all(record is not None for record in records)
+    assert sorted(record[1] for record in records) == list(range(3, SLOTS + 3))
+    # nothing written outside of the area
+    assert nvm[:OFFSET] == bytes(OFFSET)
+    assert nvm[OFFSET + STATE_SIZE :] == bytes(4)
+    assert LampState(nvm, OFFSET).load()[0] == SLOTS + 2
+
+
+def test_sequence_wraparound():
+    nvm = bytearray(OFFSET + STATE_SIZE)
+    # The sequence wrapped around a few writes ago, the newest record
+    # is in the middle slot.
+    newest = SLOTS // 2
+    for slot in range(SLOTS):
+        start = OFFSET + slot * RECORD_SIZE
+        sequence = 3 - (newest - slot) % SLOTS
+        nvm[start : start + RECORD_SIZE] = encode_record(sequence, slot, 0.5, True)
+
+    state = LampState(nvm, OFFSET, idle_time=0)
+    assert state.load()[0] == newest
+    # across the wraparound
+    for color in range(100, 100 + SLOTS):
+        state.update(color, 0.5, True, color)
+        state.poll(color)
+        assert LampState(nvm, OFFSET).load()[0] == color
+    assert {record[1] for record in slots(nvm)} == set(range(100, 100 + SLOTS))
@@ -0,0 +1,118 @@
+"""
+reset journal stored in NVM (the same module is used by birdLED)
+"""
+
+import pytest
+
+from resetjournal import (
+    ENTRY_SIZE,
+    HEADER_SIZE,
+    JOURNAL_SIZE,
+    REASON_EXCEPTION,
+    REASON_WATCHDOG,
+    SLOTS,
+    ResetJournal,
+    decode_entry,
+    encode_entry,
+)
+
+
+@pytest.mark.parametrize(
+    "entry, expected",
+    [
+        ((REASON_WATCHDOG, 123.7, "WatchDogTimeout"), (2, 123, "WatchDogTim")),
+        ((REASON_EXCEPTION, -5, "OSError"), (5, 0, "OSError")),
+        ((REASON_EXCEPTION, 2**40, ""), (5, 0xFFFFFFFF, "")),
+    ],
+)
+def test_entry_codec(entry, expected):
+    data = encode_entry(*entry)
+    assert len(data) == ENTRY_SIZE
+    assert decode_entry(data) == expected
+
+
+def test_fresh_nvm_is_initialized():
+    nvm = bytearray(b"\xff" * JOURNAL_SIZE)
+    journal = ResetJournal(nvm)
+    assert journal.failures == 0
+    assert journal.entries() == []
+    assert nvm[:2] == b"RJ"
+
+
+def test_survives_reload():
+    nvm = bytearray(JOURNAL_SIZE + 16)
+    journal = ResetJournal(nvm, offset=16)
+    journal.record(REASON_WATCHDOG, 10, "WatchDogTimeout")
+    journal.record(REASON_EXCEPTION, 20, "ValueError")
+
+    journal = ResetJournal(nvm, offset=16)
+    assert journal.failures == 2
+    assert journal.entries() == [
+        (REASON_WATCHDOG, 10, "WatchDogTim"),
+        (REASON_EXCEPTION, 20, "ValueError"),
+    ]
+    # nothing written before the offset
+    assert nvm[:16] == bytes(16)
+
+
+def test_ring_keeps_newest_entries():
+    nvm = bytearray(JOURNAL_SIZE)
+    journal = ResetJournal(nvm)
+    for uptime in range(SLOTS + 3):
+        journal.record(REASON_EXCEPTION, uptime, "E")
+
+    journal = ResetJournal(nvm)
+    assert [uptime for _, uptime, _ in journal.entries()] == list(range(3, SLOTS + 3))
+    assert journal.failures == SLOTS + 3
+
+
+def test_failures_saturate():
+    journal = ResetJournal(bytearray(JOURNAL_SIZE))
+    for _ in range(300):
+        journal.record(REASON_EXCEPTION, 0, "E")
+    assert journal.failures == 255
+
+
+def test_corrupted_header_resets_journal():
+    nvm = bytearray(JOURNAL_SIZE)
+    journal = ResetJournal(nvm)
+    journal.record(REASON_EXCEPTION, 1, "E")
+    nvm[3] = SLOTS  # head out of range
+
+    journal = ResetJournal(nvm)
+    assert journal.failures == 0
+    assert journal.entries() == []
+
+
+def test_clear_failures_keeps_entries():
+    nvm = bytearray(JOURNAL_SIZE)
+    journal = ResetJournal(nvm)
+    journal.record(REASON_EXCEPTION, 1, "E")
+    journal.clear_failures()
+
+    journal = ResetJournal(nvm)
+    assert journal.failures == 0
+    assert journal.entries() == [(REASON_EXCEPTION, 1, "E")]
+
+
+def test_clear_failures_does_not_write_if_clear():
+    nvm = bytearray(JOURNAL_SIZE)
+    journal = ResetJournal(nvm)
+    before = bytes(nvm)
+    journal.clear_failures()
+    assert nvm == before
+
+
+def test_backoff():
+    journal = ResetJournal(bytearray(JOURNAL_SIZE))
+    assert journal.backoff() == 0
+    delays = []
+    for _ in range(12):
+        journal.record(REASON_EXCEPTION, 0, "E")
+        delays.append(journal.backoff())
+    assert delays[:4] == [2, 4, 8, 16]
+    assert delays[-1] == 600
+
+
+def test_layout():
+    assert JOURNAL_SIZE == HEADER_SIZE + SLOTS * ENTRY_SIZE
@@ -13,15 +13,6 @@ import usb_hid
 from adafruit_hid.keyboard import Keyboard
 from adafruit_hid.keycode import Keycode
 
-# use STEMMA I2C bus on RP2040 QT Py
-i2c_bus = busio.I2C(board.SCL1, board.SDA1)
-
-neokey = NeoKey1x4(i2c_bus, addr=0x30)
-keyboard = Keyboard(usb_hid.devices)
-
-# states for key presses
-key_states = [False, False, False, False]
-
 
 def map_key(key):
     """
@@ -90,27 +81,45 @@ switches = [
     ([KeyAction(True, [Keycode.CONTROL, map_key("x")])], 0x00FFFF),
 ]
 
-while True:
-    # switch debouncing (TODO: use the debouncer library ?)
-    #  also turns off NeoPixel on release
-    for i, _ in enumerate(key_states):
-        if not neokey[i] and key_states[i]:
-            key_states[i] = False
-            neokey.pixels[i] = 0x0
-
-    #
-    # It would be nice to be able to call keyboard.send(*vals)
-    # however that attempts to send all the values at once results in
-    # arbitrary key ordering.
-    #
-    for i, _ in enumerate(key_states):
-        if neokey[i] and not key_states[i]:
-            neokey.pixels[i] = switches[i][1]
-            for action in switches[i][0]:
-                if action.atonce:
-                    keyboard.send(*action.vals)
-                else:
-                    for val in action.vals:
-                        keyboard.send(val)
-                        time.sleep(0.01)
-            key_states[i] = True
+
+def main():
+    """
+    main loop to check for key presses
+    """
+    # use STEMMA I2C bus on RP2040 QT Py
+    i2c_bus = busio.I2C(board.SCL1, board.SDA1)
+
+    neokey = NeoKey1x4(i2c_bus, addr=0x30)
+    keyboard = Keyboard(usb_hid.devices)
+
+    # states for key presses
+    key_states = [False, False, False, False]
+
+    while True:
+        # switch debouncing (TODO: use the debouncer library ?)
+        #  also turns off NeoPixel on release
+        for i, _ in enumerate(key_states):
+            if not neokey[i] and key_states[i]:
+                key_states[i] = False
+                neokey.pixels[i] = 0x0
+
+        #
+        # It would be nice to be able to call keyboard.send(*vals)
+        # however that attempts to send all the values at once results in
+        # arbitrary key ordering.
+        #
+        for i, _ in enumerate(key_states):
+            if neokey[i] and not key_states[i]:
+                neokey.pixels[i] = switches[i][1]
+                for action in switches[i][0]:
+                    if action.atonce:
+                        keyboard.send(*action.vals)
+                    else:
+                        for val in action.vals:
+                            keyboard.send(val)
+                            time.sleep(0.01)
+                key_states[i] = True
+
+
+if __name__ == "__main__":
+    main()
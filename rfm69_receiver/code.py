@@ -9,27 +9,35 @@ import digitalio
 import adafruit_rfm69
 
 
-# Assumes certain witing of the Radio FeatherWing.
-CS = digitalio.DigitalInOut(board.D5)
-RESET = digitalio.DigitalInOut(board.D6)
-
-spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
-
-rfm69 = adafruit_rfm69.RFM69(spi, CS, RESET, 433)  # Europe
-
-# Print out some chip state:
-print("Temperature: {0}C".format(rfm69.temperature))
-print("Frequency: {0}mhz".format(rfm69.frequency_mhz))
-print("Bit rate: {0}kbit/s".format(rfm69.bitrate / 1000))
-print("Frequency deviation: {0}hz".format(rfm69.frequency_deviation))
-
-# Wait to receive packets.  Note that this library can't receive data at a fast
-# rate, in fact it can only receive and process one 60 byte packet at a time.
-# This means you should only use this for low bandwidth scenarios, like sending
-# and receiving a single message at a time.
-print("Waiting for packets...")
-while True:
-    packet = rfm69.receive(timeout=0.5)
-    if packet:
-        # TODO: print bytes that are ASCII printable, others in hex
-        print("Received ({len(packet)} bytes): {0}".format(packet))
+def main():
+    """
+    print the packets received over the radio
+    """
+    # Assumes certain witing of the Radio FeatherWing.
+    cs = digitalio.DigitalInOut(board.D5)
+    reset = digitalio.DigitalInOut(board.D6)
+
+    spi = busio.SPI(board.SCK, MOSI=board.MOSI, MISO=board.MISO)
+
+    rfm69 = adafruit_rfm69.RFM69(spi, cs, reset, 433)  # Europe
+
+    # Print out some chip state:
+    print("Temperature: {0}C".format(rfm69.temperature))
+    print("Frequency: {0}mhz".format(rfm69.frequency_mhz))
+    print("Bit rate: {0}kbit/s".format(rfm69.bitrate / 1000))
+    print("Frequency deviation: {0}hz".format(rfm69.frequency_deviation))
+
+    # Wait to receive packets.  Note that this library can't receive data at a fast
+    # rate, in fact it can only receive and process one 60 byte packet at a time.
+    # This means you should only use this for low bandwidth scenarios, like sending
+    # and receiving a single message at a time.
+    print("Waiting for packets...")
+    while True:
+        packet = rfm69.receive(timeout=0.5)
+        if packet:
+            # TODO: print bytes that are ASCII printable, others in hex
+            print(f"Received ({len(packet)} bytes): {packet}")
+
+
+if __name__ == "__main__":
+    main()
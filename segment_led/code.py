@@ -2,19 +2,12 @@
 rolling text on multisegment LED display
 """
 
+import time
+
 import adafruit_ht16k33.segments
 
 import board
-import sys
-
-i2c = board.I2C()
 
-display = adafruit_ht16k33.segments.Seg14x4(i2c)
-
-display.fill(0)
-display.show()
-
-import time
 
 def get_rolling_slice(text : str, idx : int, length : int):
     """
@@ -32,14 +25,28 @@ def get_rolling_slice(text : str, idx : int, length : int):
         # print(f"{idx}")
         return text[idx :] + text[:(length - (len(text) - idx))]
 
-text = "green and vegetables for the best price".upper()
-text += " "
-# TODO: pad the text to length if shorter
-while True:
-    for i in range(0, len(text)):
-        text_slice = get_rolling_slice(text, i, 4)
-        display.print(text_slice)
-        display.show()
-        time.sleep(0.3)
+
+def main():
+    """
+    roll the text on the display forever
+    """
+    i2c = board.I2C()
+
+    display = adafruit_ht16k33.segments.Seg14x4(i2c)
+
+    display.fill(0)
+    display.show()
+
+    text = "green and vegetables for the best price".upper()
+    text += " "
+    # TODO: pad the text to length if shorter
+    while True:
+        for i in range(0, len(text)):
+            text_slice = get_rolling_slice(text, i, 4)
+            display.print(text_slice)
+            display.show()
+            time.sleep(0.3)
 
 
+if __name__ == "__main__":
+    main()
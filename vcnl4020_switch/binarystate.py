@@ -26,19 +26,22 @@ class BinaryState:
         self.state_duration = 0
         self.stamp = time.monotonic_ns()  # use _ns() to avoid losing precision
 
-    def update(self, cur_state) -> float:
+    def update(self, cur_state, stamp=None) -> float:
         """
         :param cur_state: current state
+        :param stamp: time stamp of the state in nanoseconds,
+        by default time.monotonic_ns(). Useful for replaying recorded values.
         :return: duration of the state in miliseconds
         """
         logger = logging.getLogger(__name__)
 
+        if stamp is None:
+            stamp = time.monotonic_ns()
+
         # Record the duration.
         if self.prev_state is not None:
             if self.prev_state == cur_state:
-                self.state_duration += (
-                    time.monotonic_ns() - self.stamp
-                ) // 1_000_000
+                self.state_duration += (stamp - self.stamp) // 1_000_000
                 logger.debug(
                     f"state '{cur_state}' preserved (for {self.state_duration} msec)"
                 )
@@ -47,7 +50,7 @@ class BinaryState:
                 self.state_duration = 0
 
         self.prev_state = cur_state
-        self.stamp = time.monotonic_ns()
+        self.stamp = stamp
 
         return self.state_duration
 
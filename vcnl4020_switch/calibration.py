@@ -0,0 +1,191 @@
+"""
+self-calibration of the proximity thresholds
+
+The baseline (the proximity reading with no hand present) and its noise
+are tracked with streaming statistics: Welford's algorithm during the warmup,
+then exponentially weighted mean and variance so that the baseline slowly
+follows the drift caused by temperature or ambient conditions.
+The readings too far above the baseline (i.e. the hand) are rejected; the hand
+can only increase the proximity, so the readings below the baseline are accepted.
+The thresholds are derived as baseline + k * sigma.
+
+The baseline is established again after a long run of rejected readings
+that stay below the on threshold, e.g. after the sensor was moved. The readings
+above the on threshold (with hysteresis down to the off threshold) are taken
+as the hand and never lead to the rebaseline, so holding the hand over the sensor
+for a long time is not learned as the baseline.
+"""
+
+import time
+
+# maximum proximity reading
+PROXIMITY_MAX = 65535
+
+
+# pylint: disable=too-many-instance-attributes
+class Baseline:
+    """
+    Track the proximity baseline and derive the thresholds for GestureRecognizer.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        k_on=10,
+        k_off=5,
+        min_margin=200,
+        warmup=32,
+        alpha=0.01,
+        rebaseline=1500,
+    ):
+        """
+        :param k_on: multiple of sigma above the baseline for the on threshold
+        :param k_off: multiple of sigma above the baseline for the off threshold,
+        has to be lower than k_on
+        :param min_margin: minimum distance of the on threshold from the baseline,
+        guards against too sensitive threshold if the noise is very low
+        :param warmup: number of readings to establish the baseline
+        :param alpha: weight of new reading after the warmup, the lower the slower
+        the baseline adapts to the drift
+        :param rebaseline: number of consecutive rejected readings without
+        the hand present after which the baseline is established again
+        """
+        if k_off >= k_on:
+            raise ValueError(f"k_off {k_off} must be lower than k_on {k_on}")
+        self.k_on = k_on
+        self.k_off = k_off
+        self.min_margin = min_margin
+        self.warmup = warmup
+        self.alpha = alpha
+        self.rebaseline = rebaseline
+        self.reset()
+
+    def reset(self):
+        """
+        Start establishing the baseline from scratch.
+        """
+        self.count = 0
+        self.mean = 0
+        self._m2 = 0
+        self.rejected = 0
+        self.present = False
+
+    @property
+    def ready(self):
+        """
+        :return: whether the warmup is complete
+        """
+        return self.count >= self.warmup
+
+    @property
+    def variance(self):
+        """
+        :return: variance of the baseline readings
+        """
+        if self.ready:
+            return self._m2
+        if self.count < 2:
+            return 0
+        return self._m2 / (self.count - 1)
+
+    @property
+    def sigma(self):
+        """
+        :return: standard deviation of the baseline readings
+        """
+        return self.variance**0.5
+
+    @property
+    def on_margin(self):
+        """
+        :return: distance of the on threshold from the baseline
+        """
+        return max(self.k_on * self.sigma, self.min_margin)
+
+    @property
+    def on_threshold(self):
+        """
+        :return: proximity value above which the hand is present
+        """
+        return min(int(self.mean + self.on_margin), PROXIMITY_MAX)
+
+    @property
+    def off_threshold(self):
+        """
+        :return: proximity value below which the hand is absent
+        """
+        off_margin = self.on_margin * self.k_off / self.k_on
+        return min(int(self.mean + off_margin), PROXIMITY_MAX)
+
+    def update(self, value):
+        """
+        Fold the reading into the statistics unless it is above the baseline
+        by more than the off margin or the hand is present.
+        :return: whether the reading was accepted
+        """
+        if not self.ready:
+            # Welford's algorithm
+            self.count += 1
+            delta = value - self.mean
+            self.mean += delta / self.count
+            self._m2 += delta * (value - self.mean)
+            if self.ready:
+                # From now on, _m2 holds the variance.
+                self._m2 = self._m2 / (self.count - 1)
+            return True
+
+        if self.present:
+            if value >= self.off_threshold:
+                return False
+            self.present = False
+        elif value > self.on_threshold:
+            self.present = True
+            self.rejected = 0
+            return False
+
+        if value - self.mean > self.on_margin * self.k_off / self.k_on:
+            self.rejected += 1
+            if self.rejected >= self.rebaseline:
+                self.reset()
+            return False
+
+        self.rejected = 0
+        delta = value - self.mean
+        increment = self.alpha * delta
+        self.mean += increment
+        self._m2 = (1 - self.alpha) * (self._m2 + delta * increment)
+        return True
+
+
+def choose_led_current(sensor, currents=(50, 100, 150, 200), samples=16, period=0.01):
+    """
+    Set the LED current with the best signal-to-noise ratio, assuming the signal
+    of a hand scales with the current. Should be called with no hand present.
+    The currents at which the readings would saturate are skipped.
+    :param sensor: Adafruit_VCNL4020 object
+    :param currents: candidate currents in mA
+    :param samples: number of readings per current
+    :param period: time in seconds between the readings
+    :return: the chosen current
+    """
+    best_current = None
+    best_ratio = 0
+    for current in currents:
+        sensor.led_current = current
+        stats = Baseline(warmup=samples)
+        time.sleep(period)
+        while not stats.ready:
+            stats.update(sensor.proximity)
+            time.sleep(period)
+
+        if stats.on_threshold >= PROXIMITY_MAX:
+            continue
+        ratio = current / max(stats.sigma, 1)
+        if ratio > best_ratio:
+            best_current = current
+            best_ratio = ratio
+
+    if best_current is None:
+        best_current = currents[0]
+    sensor.led_current = best_current
+    return best_current
@@ -1,6 +1,7 @@
 """
-Use the VCNL4020 proximity reading above certain threshold as a way to turn
-the QtPy Neopixel on/off, basically simulating a switch.
+Use the VCNL4020 proximity readings to recognize hand gestures as a way to turn
+the QtPy Neopixel on/off, basically simulating a switch, or to dim a strip
+of Neopixels according to the hand distance.
 """
 
 import time
@@ -11,11 +12,38 @@ import neopixel
 
 from adafruit_ticks import ticks_ms, ticks_diff
 
-from binarystate import BinaryState
-
-
-PROXIMITY_THRESHOLD = 3000
-DURATION_THRESHOLD_MS = 500        # duration in miliseconds
+from dimmer import Dimmer
+from gesture import GestureRecognizer, TAP, DOUBLE_TAP, HOLD, HOLD_RELEASE
+from proximity import ProximityMonitor
+from calibration import Baseline, choose_led_current
+
+
+# The hand is present above the on threshold and gone below the off threshold.
+# With auto calibration, these are used only until the baseline is established.
+PROXIMITY_ON_THRESHOLD = 3000
+PROXIMITY_OFF_THRESHOLD = 2500
+AUTO_CALIBRATION = True
+CHOOSE_LED_CURRENT = False  # pick the LED current at boot, keep the hand away
+CALIBRATION_PERIOD = 10  # in seconds, how often to sample the baseline when idle
+TAP_MAX_MS = 300        # maximum duration of tap in miliseconds
+HOLD_MS = 500           # duration of hold in miliseconds
+DOUBLE_TAP_GAP_MS = 300 # maximum gap between the taps of double tap in miliseconds
+SAMPLE_PERIOD = 0.02    # in seconds, while the hand is present
+# Pin wired to the INT output of the sensor, e.g. board.A0.
+# If None, the proximity is polled while waiting for the hand.
+INTERRUPT_PIN = None
+COLORS = ((0, 0, 255), (255, 100, 0), (255, 255, 255))
+
+# In the switch mode, the on-board Neopixel is switched on/off by tap or hold.
+# In the dimmer mode, tap switches the strip on/off, holding the hand over
+# the sensor sets the brightness according to the distance
+# and withdrawing the hand keeps the brightness.
+MODE_SWITCH = "switch"
+MODE_DIMMER = "dimmer"
+MODE = MODE_SWITCH
+STRIP_PIN = board.A3
+STRIP_PIXELS = 60
+PROXIMITY_NEAR = 20000  # proximity of the hand mapped to the maximum brightness
 
 def led_on(pixel, color=(0, 0, 255), brightness=0.3):
     """
@@ -48,48 +76,91 @@ def main():
 
     pixel = neopixel.NeoPixel(board.NEOPIXEL, 1)
     led_off(pixel)
+    dimmer = None
+    if MODE == MODE_DIMMER:
+        strip = neopixel.NeoPixel(STRIP_PIN, STRIP_PIXELS, auto_write=False)
+        dimmer = Dimmer(strip, COLORS[0], near=PROXIMITY_NEAR)
+    dimming = False
     sensor = adafruit_vcnl4020.Adafruit_VCNL4020(i2c)
 
     # Tuning experiments:
     # print(f"LED current: {sensor.led_current}")
-    # sensor.low_threshold = (3000,)
-    # sensor.low_threshold_interrupt = True
 
     # According to the datasheet (https://cdn-learn.adafruit.com/assets/assets/000/124/959/original/vcnl4020.pdf?1696620539)
     # the current range is (10, 200) mA, settable in 10 mA increments.
     # Higher current values means bigger sensitivity for longer (> 100 mm) distances,
     # however the range of values shifts with the current increase.
     # sensor.led_current = 200
-
-    proximity_state = BinaryState()
-
-    flipped = False
+    # Alternatively, the current can be chosen automatically:
+    if CHOOSE_LED_CURRENT:
+        print(f"LED current: {choose_led_current(sensor)} mA")
+
+    recognizer = GestureRecognizer(
+        PROXIMITY_ON_THRESHOLD,
+        PROXIMITY_OFF_THRESHOLD,
+        tap_max_ms=TAP_MAX_MS,
+        hold_ms=HOLD_MS,
+        double_tap_gap_ms=DOUBLE_TAP_GAP_MS,
+    )
+    monitor = ProximityMonitor(sensor, PROXIMITY_ON_THRESHOLD, INTERRUPT_PIN)
+    baseline = Baseline()
+    color_index = 0
 
     while True:
+        # Sleep until the hand comes, then sample in bursts until the gesture is over.
+        # Keep sampling until the baseline is established. With auto calibration
+        # the sleep is interrupted periodically to follow the baseline drift.
+        if (
+            recognizer.idle
+            and (baseline.ready or not AUTO_CALIBRATION)
+            and not (dimmer and dimmer.busy)
+        ):
+            monitor.wait(CALIBRATION_PERIOD if AUTO_CALIBRATION else None)
+
+        frame_start = ticks_ms()
         proximity = sensor.proximity
-        # print(f"High threshold: {sensor.high_threshold}")
-        # print(f"Low threshold: {sensor.low_threshold}")
-
-        if proximity > PROXIMITY_THRESHOLD:
-            state = "up"
-        else:
-            state = "down"
-
-        print(f"Proximity is: {proximity} ({state})")
-
-        duration = proximity_state.update(state)
-        print(f"Duration of {state}: {duration} ms")
-        if state == "up" and not flipped and duration > DURATION_THRESHOLD_MS:
-            flipped = True
+        if AUTO_CALIBRATION and baseline.update(proximity) and baseline.ready:
+            recognizer.on_threshold = baseline.on_threshold
+            recognizer.off_threshold = baseline.off_threshold
+            monitor.threshold = baseline.on_threshold
+
+        gesture = recognizer.update(proximity)
+        if gesture:
+            print(f"Gesture: {gesture}")
+
+        if dimmer:
+            # Tap switches the strip, hold starts the dimming. Double tap changes
+            # the color and turns the strip on as the preceding tap might have
+            # turned it off.
+            if gesture == TAP:
+                dimmer.toggle()
+            elif gesture == HOLD:
+                dimming = True
+            elif gesture == HOLD_RELEASE:
+                dimming = False
+                dimmer.freeze()
+            elif gesture == DOUBLE_TAP:
+                color_index = (color_index + 1) % len(COLORS)
+                dimmer.set_color(COLORS[color_index])
+                dimmer.on = True
+
+            if dimming:
+                dimmer.follow(proximity, recognizer.on_threshold)
+            dimmer.render()
+        # Tap or hold flips the switch. Double tap changes the color
+        # and turns the pixel on as the preceding tap might have turned it off.
+        elif gesture in (TAP, HOLD):
             if led_is_on(pixel):
                 led_off(pixel)
             else:
-                led_on(pixel)
-
-        if state == "down":
-            flipped = False
-
-        time.sleep(0.1)
+                led_on(pixel, COLORS[color_index])
+        elif gesture == DOUBLE_TAP:
+            color_index = (color_index + 1) % len(COLORS)
+            led_on(pixel, COLORS[color_index])
+
+        # Keep steady frame rate, i.e. the sampling period.
+        elapsed = ticks_diff(ticks_ms(), frame_start) / 1000
+        time.sleep(max(SAMPLE_PERIOD - elapsed, 0))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+"""
+proximity controlled dimming of a NeoPixel strip
+
+The hand distance (proximity reading) is mapped to the target brightness
+which the displayed brightness follows through a smoothing filter
+and a rate limiter, one step per frame.
+"""
+
+from adafruit_ticks import ticks_diff, ticks_ms
+
+# Longer time in seconds since the last frame, e.g. the sleep while waiting
+# for the hand, counts as this much so that the rate limiter does not allow
+# the level to jump.
+FRAME_TIME_MAX = 0.05
+
+
+# pylint: disable=too-many-instance-attributes
+class Dimmer:
+    """
+    Dim the strip according to the hand distance. When the hand is withdrawn,
+    the level is frozen at the value from before the withdrawal started,
+    so that the drop of the proximity while the hand moves away does not count.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        pixels,
+        color,
+        near=20000,
+        min_brightness=0.05,
+        smoothing=0.3,
+        max_rate=2,
+        history=5,
+    ):
+        """
+        :param pixels: NeoPixel object with auto_write disabled
+        :param color: color of the pixels
+        :param near: proximity reading mapped to the maximum brightness
+        :param min_brightness: brightness for the most distant hand
+        :param smoothing: weight (0 to 1) of the target in each frame
+        :param max_rate: maximum change of the brightness per second
+        :param history: number of frames to go back on withdrawal
+        """
+        self.pixels = pixels
+        self.near = near
+        self.min_brightness = min_brightness
+        self.smoothing = smoothing
+        self.max_rate = max_rate
+        self.on = False
+        self.target = min_brightness
+        self.level = 0
+        self._history_size = history
+        self._history = []
+        self._stamp = ticks_ms()
+
+        pixels.brightness = 0
+        pixels.fill(color)
+        pixels.show()
+
+    @property
+    def busy(self):
+        """
+        :return: whether the level is still moving towards the target
+        """
+        return self.level != self._goal()
+
+    def _goal(self):
+        return self.target if self.on else 0
+
+    def set_color(self, color):
+        """
+        Change the color of the pixels, shown with the next frame.
+        """
+        self.pixels.fill(color)
+        self.pixels.show()
+
+    def toggle(self):
+        """
+        Switch the strip on/off. The level fades to the target or to zero.
+        """
+        self.on = not self.on
+
+    def follow(self, proximity, far):
+        """
+        Set the target brightness according to the hand distance.
+        :param proximity: proximity reading
+        :param far: proximity reading mapped to the minimum brightness,
+        e.g. the threshold of hand presence
+        """
+        if self.near <= far:
+            position = 1
+        else:
+            position = min(max((proximity - far) / (self.near - far), 0), 1)
+        self.target = self.min_brightness + (1 - self.min_brightness) * position
+        self.on = True
+
+    def freeze(self):
+        """
+        The hand was withdrawn: go back to the level from before the withdrawal.
+        """
+        if self._history:
+            self.target = self._history[0]
+        self._history = []
+
+    def render(self):
+        """
+        Move the level one frame towards the target and show it if it changed.
+        :return: whether the pixels were updated
+        """
+        now = ticks_ms()
+        elapsed = min(ticks_diff(now, self._stamp) / 1000, FRAME_TIME_MAX)
+        self._stamp = now
+
+        goal = self._goal()
+        level = self.level + self.smoothing * (goal - self.level)
+        if abs(goal - level) < 1 / 255:
+            level = goal
+        max_step = self.max_rate * elapsed
+        level = min(max(level, self.level - max_step), self.level + max_step)
+        self._history.append(level)
+        if len(self._history) > self._history_size:
+            self._history.pop(0)
+
+        if level == self.level:
+            return False
+
+        self.level = level
+        self.pixels.brightness = level
+        self.pixels.show()
+        return True
@@ -0,0 +1,131 @@
+"""
+streaming recognition of hand gestures from proximity readings
+
+The proximity readings are converted to hand presence using hysteresis,
+i.e. separate thresholds for the hand coming and going, to avoid chatter
+around single threshold. The durations of the presence/absence are tracked
+with BinaryState and the following gestures are recognized:
+
+  - tap: the hand is present for short time, reported as soon as it is withdrawn
+  - double tap: second tap shortly after a tap, reported instead of the second tap
+  - hold: the hand is present for long time, reported while still present
+  - hold release: the hand is withdrawn after hold
+"""
+
+import time
+
+from binarystate import BinaryState
+
+TAP = "tap"
+DOUBLE_TAP = "double tap"
+HOLD = "hold"
+HOLD_RELEASE = "hold release"
+
+PRESENT = "present"
+ABSENT = "absent"
+
+
+# pylint: disable=too-many-instance-attributes
+class GestureRecognizer:
+    """
+    Recognize gestures from a stream of proximity readings.
+    The time stamps can be supplied, so that recorded traces can be replayed.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        on_threshold,
+        off_threshold,
+        tap_max_ms=300,
+        hold_ms=500,
+        double_tap_gap_ms=300,
+    ):
+        """
+        :param on_threshold: proximity value above which the hand is present
+        :param off_threshold: proximity value below which the hand is absent,
+        has to be lower than on_threshold
+        :param tap_max_ms: maximum duration of the presence to be considered a tap
+        :param hold_ms: duration of the presence after which hold is reported
+        :param double_tap_gap_ms: maximum duration of the absence between two taps
+        to be considered a double tap
+        """
+        if off_threshold >= on_threshold:
+            raise ValueError(
+                f"off threshold {off_threshold} must be lower "
+                f"than on threshold {on_threshold}"
+            )
+        self.on_threshold = on_threshold
+        self.off_threshold = off_threshold
+        self.tap_max_ms = tap_max_ms
+        self.hold_ms = hold_ms
+        self.double_tap_gap_ms = double_tap_gap_ms
+
+        self.present = False
+        self._state = BinaryState()
+        self._duration = 0
+        self._held = False
+        self._tapped = False
+        self._double = False
+
+    @property
+    def idle(self):
+        """
+        :return: whether the hand is gone and no gesture is in progress,
+        i.e. the next reading can only start a new gesture
+        """
+        return not self.present and not self._tapped
+
+    def update(self, proximity, stamp=None):
+        """
+        :param proximity: proximity reading
+        :param stamp: time stamp of the reading in nanoseconds,
+        by default time.monotonic_ns()
+        :return: the recognized gesture or None
+        """
+        if stamp is None:
+            stamp = time.monotonic_ns()
+
+        if self.present and proximity < self.off_threshold:
+            self.present = False
+        elif not self.present and proximity > self.on_threshold:
+            self.present = True
+
+        if self.present:
+            return self._update_present(stamp)
+
+        return self._update_absent(stamp)
+
+    def _update_present(self, stamp):
+        if self._state.prev_state == ABSENT:
+            # The hand came. It is a double tap if shortly after a tap.
+            self._double = self._tapped and self._duration <= self.double_tap_gap_ms
+            self._tapped = False
+            self._held = False
+
+        self._duration = self._state.update(PRESENT, stamp)
+        if not self._held and self._duration >= self.hold_ms:
+            self._held = True
+            return HOLD
+
+        return None
+
+    def _update_absent(self, stamp):
+        gesture = None
+        if self._state.prev_state == PRESENT:
+            # The hand is gone.
+            if self._held:
+                gesture = HOLD_RELEASE
+            elif self._duration <= self.tap_max_ms:
+                if self._double:
+                    gesture = DOUBLE_TAP
+                else:
+                    gesture = TAP
+                    self._tapped = True
+            self._double = False
+
+        self._duration = self._state.update(ABSENT, stamp)
+        if self._duration > self.double_tap_gap_ms:
+            self._tapped = False
+
+        return gesture
@@ -0,0 +1,91 @@
+"""
+waiting for the hand using the VCNL4020 threshold interrupt
+
+While there is no hand, the sensor measures on its own at low rate and compares
+the proximity with the high threshold. Once it is exceeded, the sensor pulls
+its interrupt output low, which wakes up the microcontroller from light sleep.
+Without the interrupt output wired, the proximity is polled at low rate instead.
+"""
+
+import time
+
+import alarm
+
+
+class ProximityMonitor:
+    """
+    Put the microcontroller to sleep until the hand comes over the sensor.
+    """
+
+    # pylint: disable=too-many-arguments
+    def __init__(
+        self,
+        sensor,
+        threshold,
+        interrupt_pin=None,
+        interrupt_count=2,
+        idle_rate=31.2,
+        burst_rate=125,
+        poll_period=0.1,
+    ):
+        """
+        :param sensor: Adafruit_VCNL4020 object
+        :param threshold: proximity value that wakes up the microcontroller,
+        can be changed between the waits
+        :param interrupt_pin: pin wired to the interrupt output of the sensor,
+        None to poll
+        :param interrupt_count: number of consecutive measurements above
+        the threshold needed to trigger the interrupt (1, 2, 4, ..., 128)
+        :param idle_rate: proximity measurements per second while waiting
+        :param burst_rate: proximity measurements per second while the hand is present
+        :param poll_period: period in seconds of polling if there is
+        no interrupt pin
+        """
+        self.sensor = sensor
+        self.threshold = threshold
+        self.interrupt_pin = interrupt_pin
+        self.idle_rate = idle_rate
+        self.burst_rate = burst_rate
+        self.poll_period = poll_period
+
+        if interrupt_pin is not None:
+            sensor.interrupt_count = interrupt_count
+            # Only the high threshold matters.
+            sensor.low_threshold = (0,)
+            # Note that the naming in the driver does not match the datasheet:
+            # bit 1 of the interrupt control register enables the threshold
+            # interrupt and bit 0 selects the threshold source (0 = proximity).
+            sensor.low_threshold_interrupt = False
+            sensor.high_threshold_interrupt = True
+
+    def wait(self, timeout=None):
+        """
+        Return once the proximity is above the threshold or the timeout expires.
+        The sensor is switched to the idle measurement rate for the wait
+        and to the burst rate afterwards.
+        :param timeout: maximum time to wait in seconds, None to wait indefinitely
+        """
+        self.sensor.proximity_rate = self.idle_rate
+        try:
+            self._wait(timeout)
+        finally:
+            self.sensor.proximity_rate = self.burst_rate
+
+    def _wait(self, timeout):
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        if self.interrupt_pin is None:
+            while self.sensor.proximity <= self.threshold:
+                if deadline is not None and time.monotonic() > deadline:
+                    return
+                time.sleep(self.poll_period)
+            return
+
+        self.sensor.high_threshold = (self.threshold,)
+        # Clear the flags so that the interrupt output is released.
+        _ = self.sensor.clear_interrupts
+        alarms = [alarm.pin.PinAlarm(self.interrupt_pin, value=False, pull=True)]
+        if deadline is not None:
+            alarms.append(alarm.time.TimeAlarm(monotonic_time=deadline))
+        alarm.light_sleep_until_alarms(*alarms)
+        _ = self.sensor.clear_interrupts
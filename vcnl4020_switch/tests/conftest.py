@@ -0,0 +1,11 @@
+"""
+host test setup: the modules of the project are imported from its directory
+"""
+
+import os
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Appended rather than prepended as code.py would shadow the code module
+# of the standard library.
+sys.path.append(PROJECT_DIR)
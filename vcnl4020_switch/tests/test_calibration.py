@@ -0,0 +1,120 @@
+"""
+baseline tracking, replayed from synthetic proximity traces
+"""
+
+import pytest
+
+from calibration import Baseline
+from gesture import HOLD, HOLD_RELEASE, GestureRecognizer
+
+BASELINE = 2000
+HAND = 8000
+RATE = 50  # readings per second, i.e. SAMPLE_PERIOD of code.py
+
+
+def noise(index):
+    """
+    :return: deterministic noise in the range of -10 to 10
+    """
+    return (index * 7919) % 21 - 10
+
+
+def trace(*segments):
+    """
+    :param segments: sequence of (duration in seconds, level)
+    :return: list of readings with noise
+    """
+    readings = []
+    for duration, level in segments:
+        readings.extend(level for _ in range(int(duration * RATE)))
+    return [reading + noise(index) for index, reading in enumerate(readings)]
+
+
+def replay(baseline, readings, recognizer=None):
+    """
+    Feed the readings like the main loop of code.py does.
+    :return: list of the recognized gestures
+    """
+    gestures = []
+    for index, reading in enumerate(readings):
+        if baseline.update(reading) and baseline.ready and recognizer:
+            recognizer.on_threshold = baseline.on_threshold
+            recognizer.off_threshold = baseline.off_threshold
+        if recognizer:
+            gesture = recognizer.update(reading, index * 1_000_000_000 // RATE)
+            if gesture:
+                gestures.append(gesture)
+    return gestures
+
+
+def warm(**kwargs):
+    baseline = Baseline(**kwargs)
+    replay(baseline, trace((1, BASELINE)))
+    assert baseline.ready
+    return baseline
+
+
+def test_warmup():
+    baseline = Baseline(warmup=32)
+    assert all(baseline.update(reading) for reading in trace((0.64, BASELINE)))
+    assert baseline.ready
+    assert baseline.mean == pytest.approx(BASELINE, abs=5)
+    assert 0 < baseline.sigma < 10
+    # the noise is low, so the margin is the minimum
+    assert baseline.on_threshold == int(baseline.mean + baseline.min_margin)
+    assert baseline.off_threshold == int(baseline.mean + baseline.min_margin / 2)
+
+
+def test_thresholds_ordered():
+    with pytest.raises(ValueError):
+        Baseline(k_on=5, k_off=5)
+
+
+def test_long_hold_not_learned():
+    baseline = warm()
+    mean = baseline.mean
+    on_threshold = baseline.on_threshold
+    recognizer = GestureRecognizer(baseline.on_threshold, baseline.off_threshold)
+
+    # 60 seconds is well over the rebaseline count of readings
+    gestures = replay(
+        baseline, trace((1, BASELINE), (60, HAND), (1, BASELINE)), recognizer
+    )
+    assert gestures == [HOLD, HOLD_RELEASE]
+    assert baseline.mean == pytest.approx(mean, abs=5)
+    assert baseline.on_threshold == pytest.approx(on_threshold, abs=5)
+    assert not baseline.present
+
+
+def test_readings_below_baseline_accepted():
+    baseline = warm()
+    readings = trace((20, BASELINE - 500))
+    assert all(baseline.update(reading) for reading in readings)
+    # follows the drift down
+    assert baseline.mean == pytest.approx(BASELINE - 500, abs=20)
+
+
+def test_slow_drift_up_followed():
+    baseline = warm()
+    readings = [BASELINE + index // 10 + noise(index) for index in range(RATE * 60)]
+    assert all(baseline.update(reading) for reading in readings)
+    assert baseline.mean == pytest.approx(BASELINE + RATE * 6, abs=30)
+
+
+def test_rebaseline_after_shift():
+    baseline = warm(rebaseline=100)
+    # above the off threshold but not the on threshold, e.g. the sensor moved
+    shifted = BASELINE + 150
+    readings = trace((2, shifted), (2, shifted))
+    assert not any(baseline.update(reading) for reading in readings[:99])
+    replay(baseline, readings[99:])
+    assert baseline.ready
+    assert baseline.mean == pytest.approx(shifted, abs=10)
+
+
+def test_hand_interrupts_rebaseline_count():
+    baseline = warm(rebaseline=100)
+    shifted = BASELINE + 150
+    replay(baseline, trace((1.5, shifted), (1, HAND), (0.2, BASELINE), (1.5, shifted)))
+    assert baseline.rejected == 75
+    assert baseline.mean == pytest.approx(BASELINE, abs=5)
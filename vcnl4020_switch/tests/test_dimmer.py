@@ -0,0 +1,102 @@
+"""
+brightness following the hand, with fake strip and clock
+"""
+
+import pytest
+
+import dimmer as dimmer_module
+from dimmer import FRAME_TIME_MAX, Dimmer
+
+FRAME_MS = 20
+
+
+class FakeStrip:
+    def __init__(self):
+        self.brightness = 1.0
+        self.color = None
+        self.shows = 0
+
+    def fill(self, color):
+        self.color = color
+
+    def show(self):
+        self.shows += 1
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    milliseconds of the fake ticks_ms()
+    """
+    now = [1000]
+    monkeypatch.setattr(dimmer_module, "ticks_ms", lambda: now[0])
+    return now
+
+
+def frames(dimmer, clock, count, proximity=None, far=3000):
+    """
+    :return: list of the levels after each frame
+    """
+    levels = []
+    for _ in range(count):
+        clock[0] += FRAME_MS
+        if proximity is not None:
+            dimmer.follow(proximity, far)
+        dimmer.render()
+        levels.append(dimmer.level)
+    return levels
+
+
+def test_follow_maps_distance():
+    dimmer = Dimmer(FakeStrip(), (255, 0, 0), near=20000, min_brightness=0.1)
+    dimmer.follow(3000, 3000)
+    assert dimmer.target == pytest.approx(0.1)
+    dimmer.follow(11500, 3000)
+    assert dimmer.target == pytest.approx(0.55)
+    dimmer.follow(30000, 3000)
+    assert dimmer.target == 1
+    assert dimmer.on
+
+
+def test_rate_limited(clock):
+    strip = FakeStrip()
+    dimmer = Dimmer(strip, (255, 0, 0), max_rate=2)
+    levels = frames(dimmer, clock, 50, proximity=20000)
+    steps = [later - earlier for earlier, later in zip([0] + levels, levels)]
+    assert max(steps) <= 2 * FRAME_MS / 1000 + 1e-9
+    assert levels[-1] == 1
+    assert strip.brightness == 1
+    assert not dimmer.busy
+
+
+def test_long_pause_does_not_jump(clock):
+    dimmer = Dimmer(FakeStrip(), (255, 0, 0), max_rate=2)
+    # e.g. sleeping while waiting for the hand
+    clock[0] += 10_000
+    dimmer.follow(20000, 3000)
+    dimmer.render()
+    assert dimmer.level == pytest.approx(2 * FRAME_TIME_MAX)
+
+
+def test_freeze_goes_back(clock):
+    dimmer = Dimmer(FakeStrip(), (255, 0, 0), history=5)
+    frames(dimmer, clock, 100, proximity=15000)
+    held = dimmer.level
+    # the hand moving away lowers the target for a few frames
+    frames(dimmer, clock, 3, proximity=5000)
+    dimmer.freeze()
+    frames(dimmer, clock, 50)
+    assert dimmer.level == pytest.approx(held, abs=1 / 255)
+
+
+def test_toggle_off_and_idle(clock):
+    strip = FakeStrip()
+    dimmer = Dimmer(strip, (255, 0, 0))
+    frames(dimmer, clock, 50, proximity=20000)
+    dimmer.toggle()
+    frames(dimmer, clock, 50)
+    assert dimmer.level == 0
+    shows = strip.shows
+    # nothing to do, the strip is not written
+    frames(dimmer, clock, 5)
+    assert strip.shows == shows
@@ -0,0 +1,101 @@
+"""
+gesture recognition, replayed from synthetic proximity traces
+"""
+
+import pytest
+
+from gesture import DOUBLE_TAP, HOLD, HOLD_RELEASE, TAP, GestureRecognizer
+
+ON = 100
+OFF = 50
+PERIOD_MS = 20
+
+
+def replay(recognizer, segments):
+    """
+    Feed the recognizer with readings every PERIOD_MS.
+    :param segments: sequence of (duration in milliseconds, proximity)
+    :return: list of (time in milliseconds, gesture)
+    """
+    gestures = []
+    now = 0
+    for duration, proximity in segments:
+        for _ in range(duration // PERIOD_MS):
+            gesture = recognizer.update(proximity, now * 1_000_000)
+            if gesture:
+                gestures.append((now, gesture))
+            now += PERIOD_MS
+    return gestures
+
+
+def kinds(gestures):
+    return [gesture for _, gesture in gestures]
+
+
+def test_thresholds_ordered():
+    with pytest.raises(ValueError):
+        GestureRecognizer(OFF, ON)
+
+
+def test_tap():
+    gestures = replay(GestureRecognizer(ON, OFF), [(100, 0), (200, 500), (500, 0)])
+    # reported as soon as the hand is withdrawn
+    assert gestures == [(300, TAP)]
+
+
+def test_presence_between_tap_and_hold():
+    recognizer = GestureRecognizer(ON, OFF, tap_max_ms=300, hold_ms=500)
+    assert replay(recognizer, [(100, 0), (420, 500), (500, 0)]) == []
+    assert recognizer.idle
+
+
+def test_hold():
+    gestures = replay(GestureRecognizer(ON, OFF), [(100, 0), (2000, 500), (200, 0)])
+    # reported once, while the hand is still present
+    assert gestures == [(600, HOLD), (2100, HOLD_RELEASE)]
+
+
+def test_double_tap():
+    gestures = replay(
+        GestureRecognizer(ON, OFF),
+        [(100, 0), (100, 500), (200, 0), (100, 500), (500, 0)],
+    )
+    assert kinds(gestures) == [TAP, DOUBLE_TAP]
+
+
+def test_taps_too_far_apart():
+    gestures = replay(
+        GestureRecognizer(ON, OFF),
+        [(100, 0), (100, 500), (400, 0), (100, 500), (500, 0)],
+    )
+    assert kinds(gestures) == [TAP, TAP]
+
+
+def test_triple_tap():
+    gestures = replay(
+        GestureRecognizer(ON, OFF),
+        [(100, 0)] + [(100, 500), (100, 0)] * 3 + [(500, 0)],
+    )
+    assert kinds(gestures) == [TAP, DOUBLE_TAP, TAP]
+
+
+def test_hysteresis_avoids_chatter():
+    # hovering between the thresholds keeps the state
+    noisy = [(20, 90), (20, 60)] * 20
+    gestures = replay(GestureRecognizer(ON, OFF), [(100, 0), (100, 500)] + noisy)
+    assert kinds(gestures) == [HOLD]
+
+    recognizer = GestureRecognizer(ON, OFF)
+    assert replay(recognizer, [(100, 0)] + noisy) == []
+    assert not recognizer.present
+
+
+def test_idle():
+    recognizer = GestureRecognizer(ON, OFF)
+    replay(recognizer, [(100, 0), (100, 500)])
+    assert not recognizer.idle
+    # waiting for possible double tap
+    replay(recognizer, [(100, 0)])
+    assert not recognizer.idle
+    replay(recognizer, [(400, 0)])
+    assert recognizer.idle
@@ -0,0 +1,168 @@
+"""
+waiting for the hand, with fake sensor, alarm module and clock
+"""
+
+import importlib
+import sys
+import types
+
+import pytest
+
+
+class FakeSensor:
+    """
+    VCNL4020 returning scripted proximity readings, the last one repeated
+    """
+
+    def __init__(self, readings=(0,)):
+        self.readings = list(readings)
+        self.reads = 0
+        self.rates = []
+        self.clears = 0
+        self.interrupt_count = 1
+        self.low_threshold = None
+        self.high_threshold = None
+        self.low_threshold_interrupt = None
+        self.high_threshold_interrupt = None
+
+    @property
+    def proximity(self):
+        reading = self.readings[min(self.reads, len(self.readings) - 1)]
+        self.reads += 1
+        return reading
+
+    @property
+    def proximity_rate(self):
+        return self.rates[-1]
+
+    @proximity_rate.setter
+    def proximity_rate(self, rate):
+        self.rates.append(rate)
+
+    @property
+    def clear_interrupts(self):
+        self.clears += 1
+        return 0
+
+
+class FakeClock:
+    """
+    time module replacement, the sleep advances the clock
+    """
+
+    def __init__(self):
+        self.now = 0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class FakeAlarm(types.ModuleType):
+    """
+    alarm module recording the light sleeps
+    """
+
+    def __init__(self):
+        super().__init__("alarm")
+        self.sleeps = []
+        self.pin = types.SimpleNamespace(
+            PinAlarm=lambda pin, value, pull: ("pin", pin, value, pull)
+        )
+        self.time = types.SimpleNamespace(
+            TimeAlarm=lambda monotonic_time: ("time", monotonic_time)
+        )
+        self.fail = None
+
+    def light_sleep_until_alarms(self, *alarms):
+        self.sleeps.append(alarms)
+        if self.fail:
+            raise self.fail
+
+
+@pytest.fixture
+def fake_alarm(monkeypatch):
+    module = FakeAlarm()
+    monkeypatch.setitem(sys.modules, "alarm", module)
+    return module
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+@pytest.fixture
+def proximity(fake_alarm, clock, monkeypatch):
+    """
+    the proximity module imported with the fake alarm module
+    """
+    monkeypatch.delitem(sys.modules, "proximity", raising=False)
+    module = importlib.import_module("proximity")
+    monkeypatch.setattr(module, "time", clock)
+    return module
+
+
+def test_poll_until_hand(proximity, clock):
+    sensor = FakeSensor([10, 20, 30, 600, 20])
+    monitor = proximity.ProximityMonitor(sensor, 500, poll_period=0.1)
+
+    monitor.wait()
+    assert sensor.reads == 4
+    assert clock.sleeps == [0.1] * 3
+    # idle rate for the wait, burst rate afterwards
+    assert sensor.rates == [monitor.idle_rate, monitor.burst_rate]
+
+
+def test_poll_timeout(proximity, clock):
+    sensor = FakeSensor([10])
+    monitor = proximity.ProximityMonitor(sensor, 500, poll_period=0.1)
+
+    monitor.wait(timeout=1)
+    assert 1 < clock.now < 1.3
+    assert sensor.proximity_rate == monitor.burst_rate
+
+
+def test_interrupt_setup(proximity):
+    sensor = FakeSensor()
+    proximity.ProximityMonitor(sensor, 500, interrupt_pin="D1", interrupt_count=4)
+    assert sensor.interrupt_count == 4
+    assert sensor.low_threshold == (0,)
+    assert sensor.high_threshold_interrupt
+    assert not sensor.low_threshold_interrupt
+
+
+def test_interrupt_wait(proximity, fake_alarm, clock):
+    sensor = FakeSensor()
+    monitor = proximity.ProximityMonitor(sensor, 500, interrupt_pin="D1")
+
+    monitor.wait()
+    # the threshold can change between the waits
+    monitor.threshold = 700
+    clock.now = 10
+    monitor.wait(timeout=5)
+
+    assert sensor.high_threshold == (700,)
+    assert fake_alarm.sleeps == [
+        (("pin", "D1", False, True),),
+        (("pin", "D1", False, True), ("time", 15)),
+    ]
+    # cleared before and after each sleep
+    assert sensor.clears == 4
+    # The sensor is not read, the microcontroller sleeps instead.
+    assert sensor.reads == 0
+    assert sensor.rates == [monitor.idle_rate, monitor.burst_rate] * 2
+
+
+def test_burst_rate_restored_on_error(proximity, fake_alarm):
+    sensor = FakeSensor()
+    monitor = proximity.ProximityMonitor(sensor, 500, interrupt_pin="D1")
+    fake_alarm.fail = OSError("I2C error")
+
+    with pytest.raises(OSError):
+        monitor.wait()
+    assert sensor.proximity_rate == monitor.burst_rate